@@ -7,18 +7,40 @@ Name: Kenneth Xiong + Toby Mallon
 Class: SoftDes SP 24
 """
 
-import warnings
-import pandas as pd
-import matplotlib.pyplot as plt
-import geopandas as gpd
-from shapely.geometry import Point
+import cache
+import downloads
+import exposure
 import helpers
-
-
+import intersections
+import lane_index
+import streets
+import tracing
+
+# the crash columns used by the analysis, the rest is never read from disk
+ACCIDENT_COLUMNS = [
+    "_id",
+    "dispatch_ts",
+    "mode_type",
+    "location_type",
+    "street",
+    "xstreet1",
+    "xstreet2",
+    "lat",
+    "long",
+]
+ROAD_URL = (
+    "https://data.boston.gov/api/3/action/datastore_search?resource_id="
+    + "6fa7932b-7bc8-42bc-9250-168d5f5dc1ad&limit=49000"
+)
+
+
+@tracing.traced
 def load_data(bike_accidents_url, bike_lane_url):
     """
     Loads data from API into two json files and converts them
-    into Pandas Dataframs
+    into Pandas Dataframs. Files are served from the local cache while they
+    are current, see cache.pull_cached, and read from the typed Parquet
+    files written by helpers.ingest_data.
 
     Parameters:
         bike_accidents_url: URL for bike accident data.
@@ -28,15 +50,48 @@ def load_data(bike_accidents_url, bike_lane_url):
         bike_accident_df: Pandas Dataframe for bike accidents data
         bike_lane_df: Pandas Dataframe for bike lane data
     """
-    bike_accidents_path = helpers.pull_data(
-        bike_accidents_url, "bike_accident_df.json"
+    bike_accidents_path = cache.pull_cached(bike_accidents_url)
+    bike_lane_path = cache.pull_cached(bike_lane_url)
+    bike_accident_df = helpers.get_bike_data(
+        helpers.ingest_data(bike_accidents_path), ACCIDENT_COLUMNS
     )
-    bike_lane_path = helpers.pull_data(bike_lane_url, "bike_lane_df.json")
-    bike_accident_df = helpers.get_bike_data(bike_accidents_path)
-    bike_lane_df = pd.DataFrame(helpers.load_data(bike_lane_path)["records"])
+    bike_lane_df = helpers.load_records(helpers.ingest_data(bike_lane_path))
     return bike_accident_df, bike_lane_df
 
 
+def load_data_concurrently(
+    bike_accidents_url, bike_lane_url, road_url=ROAD_URL
+):
+    """
+    Downloads the bike accident, bike lane and road tables at the same time,
+    see downloads.load_urls, so a run waits for the slowest table instead of
+    all three in turn.
+
+    Parameters:
+        bike_accidents_url: URL for bike accident data.
+        bike_lane_url: URL for bike lane data
+        road_url: URL for road segment data
+
+    Returns:
+        bike_accident_df: Pandas Dataframe for bike accidents data
+        bike_lane_df: Pandas Dataframe for bike lane data
+        road_data: Pandas Dataframe for road segment data
+    """
+    tables = downloads.load_urls(
+        {
+            "accidents": bike_accidents_url,
+            "lanes": bike_lane_url,
+            "roads": road_url,
+        }
+    )
+    bike_accident_df = tables["accidents"]
+    bike_accident_df = bike_accident_df[
+        bike_accident_df["mode_type"] == "bike"
+    ].reset_index()
+    return bike_accident_df, tables["lanes"], tables["roads"]
+
+
+@tracing.traced(rows=lambda result: len(result[0]))
 def abbreviate_street_names(bike_accident_df, bike_lane_df):
     """
     Abbreviates street names in two datasets for consistency.
@@ -51,48 +106,47 @@ def abbreviate_street_names(bike_accident_df, bike_lane_df):
         bike_lane_df (pandas.DataFrame): Data with abbreviated street names.
 
     """
-    bike_lane_df["STREET_NAM"] = bike_lane_df["STREET_NAM"].str.upper()
-    bike_lane_df.head()
-    abbreviations = {
-        "NORTH": "N",
-        "SOUTH": "S",
-        "EAST": "E",
-        "WEST": "W",
-        "STREET": "ST",
-        "ROAD": "RD",
-        "AVENUE": "AVE",
-        "PARKWAY": "PKWY",
-        "BOULEVARD": "BLVD",
-        "DRIVE": "DR",
-    }
-    # abbreviating street names in dataset to make them match
-    for row_index in range(len(bike_lane_df["STREET_NAM"])):
-        street_list = bike_lane_df["STREET_NAM"][row_index].split()
-        for street_index, word in enumerate(street_list):
-            if word in abbreviations:
-                street_list[street_index] = abbreviations[word]
-        bike_lane_df.at[row_index, "STREET_NAM"] = " ".join(street_list)
     # abbreviating street names in dataset to make them match
-    for row_index in range(len(bike_accident_df["street"])):
-        column_names = ["street", "xstreet1", "xstreet2"]
-        for column in column_names:
-            if bike_accident_df[column][row_index] is not None:
-                street_list = bike_accident_df[column][row_index].split()
-                for street_index, word in enumerate(street_list):
-                    if word in abbreviations:
-                        street_list[street_index] = abbreviations[word]
-                bike_accident_df.at[row_index, column] = " ".join(street_list)
+    bike_lane_df["STREET_NAM"] = streets.canonicalize_streets(
+        bike_lane_df["STREET_NAM"]
+    )
+    bike_accident_df = abbreviate_accident_streets(bike_accident_df)
 
     return bike_accident_df, bike_lane_df
 
 
-def find_non_street_accidents(lane_type_dict, bike_accident_df):
+def abbreviate_accident_streets(bike_accident_df):
+    """
+    Abbreviates the street names of bike accidents only, for when the bike
+    lane names were already abbreviated, such as for each chunk of a large
+    crash table.
+
+    Parameters:
+        bike_accident_df (pandas.DataFrame): Bike accident data.
+
+    Returns:
+        pandas.DataFrame: The data with abbreviated street names.
+    """
+    for column in ["street", "xstreet1", "xstreet2"]:
+        bike_accident_df[column] = streets.canonicalize_streets(
+            bike_accident_df[column], upper=False
+        )
+    return bike_accident_df
+
+
+def find_non_street_accidents(
+    lane_type_dict, bike_accident_df, intersection_index=None
+):
     """
     Finds accidents not occurring on streeets(i.e intersections).
 
     Parameters:
         lane_type_dict (dict): A dictionary to store accident counts.
         bike_accident_df (pandas.DataFrame): DataFrame with bike accident data.
+        intersection_index (dict): If given, intersection accidents where
+        bike lanes meet are counted under their lane types instead, split
+        evenly when several types meet, see
+        intersections.build_intersection_index.
 
     Returns:
         None
@@ -106,9 +160,44 @@ def find_non_street_accidents(lane_type_dict, bike_accident_df):
     ]
     lane_type_dict["intersection"] = intersection_crash_df.shape[0]
     lane_type_dict["other"] = other_crash_df.shape[0]
+    if intersection_index is None:
+        return
+    facilities = intersections.intersection_facilities(
+        intersection_crash_df, intersection_index
+    )
+    facilities = facilities[facilities.map(len) > 0]
+    lane_type_dict["intersection"] -= len(facilities)
+    # each accident counts once, shared between the lane types that meet
+    for lane_types in facilities:
+        share = 1 / len(lane_types)
+        for lane_type in lane_types:
+            lane_type_dict[lane_type] = lane_type_dict.get(lane_type, 0) + share
+
+
+def build_street_index(bike_lane_df):
+    """
+    Builds a hash index of the streets that have a bike lane.
 
+    Parameters:
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data,
+        with street names already abbreviated.
 
-def find_street_accidents(lane_type_dict, bike_accident_df, bike_lane_df):
+    Returns:
+        frozenset: The abbreviated names of streets with a bike lane.
+    """
+    return frozenset(bike_lane_df["STREET_NAM"].dropna())
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+@tracing.traced(rows=len)
+def find_street_accidents(
+    lane_type_dict,
+    bike_accident_df,
+    bike_lane_df,
+    street_index=None,
+    lane_path=lane_index.BIKE_NETWORK_PATH,
+    workers=None,
+):
     """
     Categorizes accidents that happened on streets
 
@@ -116,58 +205,62 @@ def find_street_accidents(lane_type_dict, bike_accident_df, bike_lane_df):
         lane_type_dict (dict): A dictionary to store accident counts.
         bike_accident_df (pandas.DataFrame): DataFrame with bike accident data.
         bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        street_index (frozenset): The index built by build_street_index,
+        built from bike_lane_df if not given.
+        lane_path (str): The bike network GeoJSON file to match against.
+        workers (int): If given, match crashes on this many processes, see
+        lane_index.match_crashes_parallel.
 
     Returns:
-        None
+        pandas.DataFrame: The nearest lane segment and its distance for each
+        matched crash, indexed like bike_accident_df, see
+        lane_index.match_crashes.
     """
-    warnings.simplefilter(action="ignore", category=UserWarning)
-    # read in geojson file of bike lanes
-    bike_lanes = gpd.read_file("data/Existing_Bike_Network_2023.geojson")
+    # spatial index of bike lanes, built once per process
+    index = lane_index.load_lane_index(lane_path)
     street_crash_df = bike_accident_df[  # sort by street accidents
         bike_accident_df["location_type"] == "Street"
-    ].reset_index()
-    # find indices of accidents on streets w/o bike lanes to remove
-    remove_index_list = []
-    for row_index in range(len(street_crash_df["street"])):
-        if (
-            street_crash_df["street"][row_index]
-            not in bike_lane_df["STREET_NAM"].values
-        ):
-            lane_type_dict["none"] += 1
-            remove_index_list.append(row_index)
-    # remove those points
-    filtered_street_crash_df = street_crash_df.drop(remove_index_list)
-    # convert to geojson points/geopandas DF
-    geometry = [
-        Point(xy)
-        for xy in zip(
-            filtered_street_crash_df["long"], filtered_street_crash_df["lat"]
-        )
     ]
-    bike_crash_gdf = gpd.GeoDataFrame(
-        filtered_street_crash_df, crs="EPSG:4326", geometry=geometry
-    )
-    # add a buffer to points to account for error
-    bike_crash_gdf["geometry"] = bike_crash_gdf.geometry.buffer(0.000127)
-    # overlap accidents with our  bike lanes data to find where they occured
-    street_crash_gdf = gpd.sjoin(
-        bike_lanes, bike_crash_gdf, how="inner", predicate="intersects"
-    )
-    # remove duplicates
-    street_crash_gdf.drop_duplicates(subset=["STREET_NAM", "ExisFacil", "_id"])
+    # accidents on streets w/o bike lanes count as none
+    if street_index is None:
+        street_index = build_street_index(bike_lane_df)
+    on_lane_street = street_crash_df["street"].isin(street_index)
+    lane_type_dict["none"] += int((~on_lane_street).sum())
+    filtered_street_crash_df = street_crash_df[on_lane_street]
+    # match each accident to the nearest bike lane within a few meters
+    if workers is None:
+        matches = lane_index.match_crashes(filtered_street_crash_df, index)
+    else:
+        matches = lane_index.match_crashes_parallel(
+            filtered_street_crash_df, index, workers=workers
+        )
     # count how many in each type of bike lane
-    accident_occurences = street_crash_gdf["ExisFacil"].value_counts()
-    for index, accident in enumerate(accident_occurences):
-        lane_type_dict[accident_occurences.index[index]] = accident
-
-
-def organize_by_lane(bike_accident_df, bike_lane_df):
+    accident_occurences = matches["ExisFacil"].value_counts()
+    for position, accident in enumerate(accident_occurences):
+        lane_type = accident_occurences.index[position]
+        lane_type_dict[lane_type] = lane_type_dict.get(lane_type, 0) + accident
+    return matches
+
+
+@tracing.traced
+def organize_by_lane(
+    bike_accident_df,
+    bike_lane_df,
+    lane_path=lane_index.BIKE_NETWORK_PATH,
+    workers=None,
+    intersection_index=None,
+):
     """
     Organizes crashes by where they occured.
 
     Parameters:
         bike_accident_df (pandas.DataFrame): DataFrame with bike accident data.
         bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        lane_path (str): The bike network GeoJSON file to match against.
+        workers (int): If given, match crashes on this many processes. The
+        result is the same as without.
+        intersection_index (dict): If given, attribute intersection crashes
+        to the lane types meeting there, see find_non_street_accidents.
 
     Returns:
         A dictionary organizing crashes by bike lane presence.
@@ -179,53 +272,69 @@ def organize_by_lane(bike_accident_df, bike_lane_df):
     bike_accident_df, bike_lane_df = abbreviate_street_names(
         bike_accident_df, bike_lane_df
     )
-    find_non_street_accidents(lane_type_dict, bike_accident_df)
-    find_street_accidents(lane_type_dict, bike_accident_df, bike_lane_df)
+    find_non_street_accidents(
+        lane_type_dict, bike_accident_df, intersection_index
+    )
+    find_street_accidents(
+        lane_type_dict,
+        bike_accident_df,
+        bike_lane_df,
+        lane_path=lane_path,
+        workers=workers,
+    )
     return lane_type_dict
 
 
-def lanes_by_percent(bike_lane_df):
+def lanes_by_percent(bike_lane_df, road_data=None):
     """
     Calculates the percentage of each bike lane based on the len compared
-    to the total length of all roads in Boston.
+    to the total length of all roads in Boston. Both lengths are memoized,
+    see the exposure module.
 
     Parameters:
         bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        road_data (pandas.DataFrame): Road segment data, pulled from the API
+        if not given.
 
     Returns:
         a dictionary breaking down bike lanes by percent.
     """
-    url = (
-        "https://data.boston.gov/api/3/action/datastore_search?resource_id="
-        + "6fa7932b-7bc8-42bc-9250-168d5f5dc1ad&limit=49000"
-    )
-    helpers.pull_data(url, "road_data.json")  # get all boston roads
-    road_data = pd.DataFrame(helpers.load_data("road_data.json")["records"])
-    # find the total length
-    total_length = road_data["SHAPESTLength"].astype(float).sum()
+    if road_data is None:
+        # get all boston roads, only read when the cached file changed
+        total_length = exposure.road_length(cache.pull_cached(ROAD_URL))
+    else:
+        # find the total length
+        total_length = road_data["SHAPESTLength"].astype(float).sum()
     # find total length of bike lanes by type
-    bike_lane_df["Shape_Leng"] = bike_lane_df["Shape_Leng"].astype(float)
-    bike_lane_lengths = bike_lane_df.groupby("ExisFacil")["Shape_Leng"].sum()
+    bike_lane_lengths = exposure.lane_lengths(bike_lane_df)
     # convert to percentages
     bike_lane_percents = bike_lane_lengths / total_length
 
     return bike_lane_percents
 
 
-def normalize_data(lane_type_dict, bike_lane_df):
+@tracing.traced
+def normalize_data(
+    lane_type_dict, bike_lane_df, road_data=None, bike_lane_percents=None
+):
     """
     Normalize accidents data to be percentages summing to one
 
     Parameters:
         lane_type_dict (dict): Dictionary with accident counts by lane type.
         bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        road_data (pandas.DataFrame): Road segment data, pulled from the API
+        if not given.
+        bike_lane_percents (pandas.Series): The result of lanes_by_percent,
+        to skip recomputing it when normalizing many what-if scenarios.
 
     Returns:
     Tuple (lane_distr_dict, accident_percent_dict):
         lane_distr_dict (dict): A dictionary with normalized accident counts.
         accident_percent_dict (dict): A dictionary with percents of each lane.
     """
-    bike_lane_percents = lanes_by_percent(bike_lane_df)
+    if bike_lane_percents is None:
+        bike_lane_percents = lanes_by_percent(bike_lane_df, road_data)
     lane_distr_dict = {}
     # calculate distribution of bike lanes in boston
     for index in bike_lane_percents.index:
@@ -267,24 +376,70 @@ def normalize_data(lane_type_dict, bike_lane_df):
     return lane_distr_dict, accident_percent_dict
 
 
-def visualize_data(bike_accidents_url, bike_lane_url):
+def visualize_data(
+    bike_accidents_url, bike_lane_url, concurrent=False, output_dir=None
+):
     """
     Creates two bar graphs which break down bike accidents by percent and number
 
     Parameters:
         bike_accidents_url: The url to load bike accident data from api.
         bike_lane_path: The url to load bike lane data from api.
+        concurrent (bool): Download all tables at once with
+        load_data_concurrently instead of through the cache.
+        output_dir (str): If given, save the graphs as PNG files in this
+        directory instead of showing them, see charts.render_batch.
 
     Returns:
         None
     """
-    bike_accident_df, bike_lane_df = load_data(
-        bike_accidents_url, bike_lane_url
-    )
+    road_data = None
+    if concurrent:
+        bike_accident_df, bike_lane_df, road_data = load_data_concurrently(
+            bike_accidents_url, bike_lane_url
+        )
+    else:
+        bike_accident_df, bike_lane_df = load_data(
+            bike_accidents_url, bike_lane_url
+        )
     lane_type_dict = organize_by_lane(bike_accident_df, bike_lane_df)
     lane_distr_dict, accident_percent_dict = normalize_data(
-        lane_type_dict, bike_lane_df
+        lane_type_dict, bike_lane_df, road_data
     )
+    if output_dir is not None:
+        # matplotlib is only imported once a graph is drawn
+        import charts  # pylint: disable=import-outside-toplevel
+
+        charts.render_batch(
+            {
+                "boston": (
+                    lane_type_dict,
+                    lane_distr_dict,
+                    accident_percent_dict,
+                )
+            },
+            output_dir,
+            workers=1,
+        )
+        return
+    plot_data(lane_type_dict, lane_distr_dict, accident_percent_dict)
+
+
+@tracing.traced
+def plot_data(lane_type_dict, lane_distr_dict, accident_percent_dict):
+    """
+    Shows the two bar graphs for already organized and normalized data.
+
+    Parameters:
+        lane_type_dict (dict): Dictionary with accident counts by lane type.
+        lane_distr_dict (dict): A dictionary with normalized accident counts.
+        accident_percent_dict (dict): A dictionary with percents of each lane.
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+
     # plot all the data
     plt.figure(figsize=(15, 15))
     accident_percents = plt.bar(
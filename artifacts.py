@@ -0,0 +1,423 @@
+"""
+Module for compiling GeoJSON layers into binary artifacts.
+
+Parsing GeoJSON text is the slowest part of starting the analysis and the
+maps. Each layer is therefore compiled once into a GeoParquet file with WKB
+geometry under `data/build/`, next to a small metadata file holding the hash
+of its source, its CRS and its bounds. Artifact names carry a hash of the
+source path, so sources sharing a file name get their own artifacts.
+Features are stored in Hilbert curve order with their bounding boxes as
+plain columns, so nearby features sit in the same row groups, the bounding
+boxes serve as a spatial index that the Parquet reader can filter on, and an
+STRtree over the loaded geometries is cheap to build. An artifact is rebuilt
+when the hash of its source changes, and the variants derived from the old
+source are deleted.
+
+For maps, prepare_layer also derives display variants of a layer, simplified
+to a tolerance that depends on the zoom level and with coordinates rounded
+to a few decimal places, since neither is visible at city zoom but both
+dominate the size of the map page.
+
+Dependencies:
+    - functools: Module for keeping prepared layers in memory.
+    - hashlib: Module for hashing source files.
+    - json: Module for reading and writing artifact metadata.
+    - os: Module for file handling.
+    - Geopandas: Extends pandas to allow spatial operations on geometric types.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+    - Shapely: Library for geometric objects.
+
+Functions:
+    - compile_layer(path, build_dir=None): Compiles a GeoJSON file into
+    an artifact and returns its metadata.
+    - load_layer(path, bbox=None, build_dir=None): Loads a GeoJSON layer
+    from its artifact, compiling it first if it is missing or out of date.
+    - layer_bounds(path, build_dir=None): Returns the bounds of a layer
+    without loading its geometry.
+    - layer_hash(path, build_dir=None): Returns the hash of a layer's
+    source, for invalidating results derived from it.
+    - build_artifacts(paths=None, build_dir=None): Compiles every
+    layer that is out of date.
+    - zoom_tolerance(zoom): Returns the simplification tolerance for a zoom
+    level.
+    - prepare_layer(path, zoom, precision=COORDINATE_PRECISION,
+    build_dir=None): Loads a layer simplified and rounded for display
+    at a zoom level.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+BUILD_DIR = "data/build"
+ARTIFACT_VERSION = 1
+LAYER_PATHS = [
+    "data/Existing_Bike_Network_2023.geojson",
+    "data/City_of_Boston_Boundary_(Water_Excluded).geojson",
+]
+BBOX_COLUMNS = ["minx", "miny", "maxx", "maxy"]
+# simplification tolerance in meters, by the lowest zoom level it applies to
+ZOOM_TOLERANCES = {0: 40.0, 12: 10.0, 14: 3.0, 16: 1.0, 18: 0.0}
+# decimal places of a degree kept for display, about 1 m
+COORDINATE_PRECISION = 5
+# hex digits of the source path hash in artifact names
+PATH_HASH_LENGTH = 8
+
+
+def _artifact_paths(path, build_dir):
+    """
+    Returns where the artifact of a layer and its metadata are stored. The
+    name holds a hash of the absolute source path, so layers with the same
+    file name in different directories do not overwrite each other.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        build_dir (str): The directory holding the artifacts.
+
+    Returns:
+        Tuple (artifact_path, meta_path): The paths of the GeoParquet file
+        and of its metadata.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    source = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+    stem = f"{stem}.{source[:PATH_HASH_LENGTH]}"
+    return (
+        os.path.join(build_dir, f"{stem}.parquet"),
+        os.path.join(build_dir, f"{stem}.meta.json"),
+    )
+
+
+def _file_hash(path):
+    """
+    Hashes the content of a file.
+
+    Parameters:
+        path (str): The path of the file.
+
+    Returns:
+        str: The SHA-256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(meta_path):
+    """
+    Reads the metadata of an artifact.
+
+    Parameters:
+        meta_path (str): The path of the metadata file.
+
+    Returns:
+        dict or None: The metadata, or None if there is none.
+    """
+    try:
+        with open(meta_path, encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_meta(meta, meta_path):
+    """
+    Writes the metadata of an artifact.
+
+    Parameters:
+        meta (dict): The metadata.
+        meta_path (str): The path of the metadata file.
+
+    Returns:
+        None
+    """
+    with open(meta_path, "w", encoding="utf-8") as file:
+        json.dump(meta, file, indent=1)
+
+
+def _is_current(meta, path, build_dir):
+    """
+    Checks whether an artifact was compiled from the current source. The
+    source is only hashed when its size or modification time changed.
+
+    Parameters:
+        meta (dict or None): The metadata of the artifact.
+        path (str): The path of the GeoJSON source.
+        build_dir (str): The directory holding the artifacts.
+
+    Returns:
+        bool: True if the artifact can be used.
+    """
+    artifact_path, meta_path = _artifact_paths(path, build_dir)
+    if (
+        meta is None
+        or meta.get("version") != ARTIFACT_VERSION
+        or not os.path.exists(artifact_path)
+    ):
+        return False
+    stat = os.stat(path)
+    if meta["size"] == stat.st_size and meta["mtime"] == stat.st_mtime:
+        return True
+    if meta["size"] != stat.st_size or meta["sha256"] != _file_hash(path):
+        return False
+    # same content, e.g. after a fresh checkout, so remember the new mtime
+    meta["mtime"] = stat.st_mtime
+    _write_meta(meta, meta_path)
+    return True
+
+
+def _remove_superseded(path, build_dir, sha256):
+    """
+    Deletes the prepared variants of a layer that were derived from an
+    earlier version of its source.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        build_dir (str): The directory holding the artifacts.
+        sha256 (str): The hash of the current source.
+
+    Returns:
+        None
+    """
+    artifact_path = _artifact_paths(path, build_dir)[0]
+    prefix = os.path.basename(artifact_path).replace(".parquet", ".t")
+    for name in os.listdir(build_dir):
+        if name.startswith(prefix) and not name.endswith(
+            f".{sha256[:12]}.parquet"
+        ):
+            os.remove(os.path.join(build_dir, name))
+
+
+def compile_layer(path, build_dir=None):
+    """
+    Compiles a GeoJSON file into a GeoParquet artifact, replacing the
+    artifacts of the previous version of the source.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        build_dir (str): The directory holding the artifacts, defaults to
+        BUILD_DIR.
+
+    Returns:
+        dict: The metadata of the artifact.
+    """
+    build_dir = build_dir or BUILD_DIR
+    os.makedirs(build_dir, exist_ok=True)
+    artifact_path, meta_path = _artifact_paths(path, build_dir)
+    stat = os.stat(path)
+    layer = gpd.read_file(path)
+    # features without geometry cannot be placed on the curve, keep them last
+    located = layer[~(layer.geometry.isna() | layer.geometry.is_empty)]
+    layer = pd.concat(
+        [
+            located.iloc[located.geometry.hilbert_distance().argsort()],
+            layer.drop(located.index),
+        ]
+    )
+    layer[BBOX_COLUMNS] = layer.geometry.bounds.to_numpy()
+    layer.to_parquet(artifact_path, index=False, row_group_size=1024)
+    meta = {
+        "version": ARTIFACT_VERSION,
+        "source": path,
+        "sha256": _file_hash(path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "crs": layer.crs.to_string() if layer.crs else None,
+        "bounds": list(layer.total_bounds) if len(layer) else None,
+        "features": len(layer),
+    }
+    _write_meta(meta, meta_path)
+    _remove_superseded(path, build_dir, meta["sha256"])
+    return meta
+
+
+def _current_meta(path, build_dir):
+    """
+    Returns the metadata of an up to date artifact, compiling it if needed.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        build_dir (str): The directory holding the artifacts, defaults to
+        BUILD_DIR.
+
+    Returns:
+        dict: The metadata of the artifact.
+    """
+    build_dir = build_dir or BUILD_DIR
+    meta = _read_meta(_artifact_paths(path, build_dir)[1])
+    if not _is_current(meta, path, build_dir):
+        meta = compile_layer(path, build_dir)
+    return meta
+
+
+def load_layer(path, bbox=None, build_dir=None):
+    """
+    Loads a GeoJSON layer from its artifact, compiling it first if it is
+    missing or out of date.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        bbox (tuple): Only load features whose bounding box intersects
+        (minx, miny, maxx, maxy), given in the CRS of the layer.
+        build_dir (str): The directory holding the artifacts, defaults to
+        BUILD_DIR.
+
+    Returns:
+        geopandas.GeoDataFrame: The features of the layer.
+    """
+    build_dir = build_dir or BUILD_DIR
+    _current_meta(path, build_dir)
+    filters = None
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        filters = [
+            ("maxx", ">=", minx),
+            ("minx", "<=", maxx),
+            ("maxy", ">=", miny),
+            ("miny", "<=", maxy),
+        ]
+    layer = gpd.read_parquet(
+        _artifact_paths(path, build_dir)[0], filters=filters
+    )
+    return layer.drop(columns=BBOX_COLUMNS)
+
+
+def layer_bounds(path, build_dir=None):
+    """
+    Returns the bounds of a layer without loading its geometry.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        build_dir (str): The directory holding the artifacts, defaults to
+        BUILD_DIR.
+
+    Returns:
+        list: [minx, miny, maxx, maxy] in the CRS of the layer.
+    """
+    return _current_meta(path, build_dir)["bounds"]
+
+
+def layer_hash(path, build_dir=None):
+    """
+    Returns the hash of a layer's source, for invalidating results derived
+    from it.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        build_dir (str): The directory holding the artifacts, defaults to
+        BUILD_DIR.
+
+    Returns:
+        str: The SHA-256 hex digest of the source.
+    """
+    return _current_meta(path, build_dir)["sha256"]
+
+
+def build_artifacts(paths=None, build_dir=None):
+    """
+    Compiles every layer whose artifact is missing or out of date.
+
+    Parameters:
+        paths (list): The GeoJSON sources, defaults to LAYER_PATHS.
+        build_dir (str): The directory holding the artifacts, defaults to
+        BUILD_DIR.
+
+    Returns:
+        dict: The metadata of each artifact by source path.
+    """
+    return {
+        path: _current_meta(path, build_dir) for path in paths or LAYER_PATHS
+    }
+
+
+def zoom_tolerance(zoom):
+    """
+    Returns the simplification tolerance for a zoom level.
+
+    Parameters:
+        zoom (int): The zoom level of the map.
+
+    Returns:
+        float: The tolerance in meters, from ZOOM_TOLERANCES.
+    """
+    return ZOOM_TOLERANCES[max(key for key in ZOOM_TOLERANCES if key <= zoom)]
+
+
+def _simplify(layer, tolerance, precision):
+    """
+    Simplifies the geometry of a layer and rounds its coordinates.
+
+    Parameters:
+        layer (geopandas.GeoDataFrame): The layer, in a geographic CRS.
+        tolerance (float): The simplification tolerance in meters.
+        precision (int): The decimal places to round coordinates to.
+
+    Returns:
+        geopandas.GeoDataFrame: The simplified layer, in the CRS of layer.
+    """
+    if tolerance > 0 and len(layer):
+        metric_crs = layer.estimate_utm_crs()
+        simplified = layer.geometry.to_crs(metric_crs).simplify(
+            tolerance, preserve_topology=True
+        )
+        layer = layer.set_geometry(simplified.to_crs(layer.crs))
+    rounded = shapely.transform(
+        layer.geometry.values, lambda coords: np.round(coords, precision)
+    )
+    return layer.set_geometry(gpd.GeoSeries(rounded, index=layer.index))
+
+
+@functools.lru_cache(maxsize=32)
+def _prepared(path, tolerance, precision, build_dir, sha256):
+    """
+    Loads a simplified variant of a layer, writing it to the build
+    directory the first time. The source hash is part of the key so a
+    changed source never serves an old variant.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        tolerance (float): The simplification tolerance in meters.
+        precision (int): The decimal places to round coordinates to.
+        build_dir (str): The directory holding the artifacts.
+        sha256 (str): The hash of the current source.
+
+    Returns:
+        geopandas.GeoDataFrame: The simplified layer.
+    """
+    artifact_path = _artifact_paths(path, build_dir)[0].replace(
+        ".parquet", f".t{tolerance:g}.p{precision}.{sha256[:12]}.parquet"
+    )
+    if os.path.exists(artifact_path):
+        return gpd.read_parquet(artifact_path)
+    layer = _simplify(
+        load_layer(path, build_dir=build_dir), tolerance, precision
+    )
+    layer.to_parquet(artifact_path, index=False)
+    return layer
+
+
+def prepare_layer(path, zoom, precision=COORDINATE_PRECISION, build_dir=None):
+    """
+    Loads a layer simplified and rounded for display at a zoom level.
+    Prepared layers are cached on disk and in memory.
+
+    Parameters:
+        path (str): The path of the GeoJSON source.
+        zoom (int): The zoom level of the map, see ZOOM_TOLERANCES.
+        precision (int): The decimal places to round coordinates to.
+        build_dir (str): The directory holding the artifacts, defaults to
+        BUILD_DIR.
+
+    Returns:
+        geopandas.GeoDataFrame: The prepared layer.
+    """
+    build_dir = build_dir or BUILD_DIR
+    sha256 = _current_meta(path, build_dir)["sha256"]
+    return _prepared(path, zoom_tolerance(zoom), precision, build_dir, sha256)
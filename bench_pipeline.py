@@ -0,0 +1,240 @@
+"""
+Module for benchmarking the analysis and map pipeline on synthetic data.
+
+Each stage of the pipeline (abbreviate_street_names, find_street_accidents,
+normalize_data, get_heat_map and get_street_data) is timed on its own with a
+fresh copy of its inputs, so a change to one stage shows up in its own row.
+Nothing is built before the stages run, so the first run of a stage includes
+any index or artifact it builds, such as the lane index and the network
+artifact in find_street_accidents; later runs show the warm time. Peak
+memory is measured in a separate traced run, since tracing slows the stage
+down. Everything runs offline on tables from the synthetic module. The
+import time of the command line interface is measured in fresh interpreters,
+where it is not hidden by modules the benchmark has already imported.
+
+Run `python bench_pipeline.py 10000 100000` to benchmark those scales and
+`--output results.json` to keep the results for comparison.
+
+Dependencies:
+    - argparse: Module for the command line interface.
+    - functools: Module for counting the crashes normalize_data needs once.
+    - json: Module for writing the results.
+    - subprocess: Module for importing modules in a fresh interpreter.
+    - sys: Module for the path of the interpreter.
+    - tempfile: Module for the directory holding the synthetic files.
+    - time: Module for the wall clock timer.
+    - tracemalloc: Module for tracking peak memory.
+    - Folium: Library for the maps the heat map stages draw on.
+    - accidents_by_lane: Module with the analysis stages.
+    - heatmap: Module with the map stages.
+    - synthetic: Module for generating the benchmark data.
+
+Functions:
+    - measure(func, setup, repeat=3): Times a function and measures its
+    peak memory.
+    - pipeline_stages(crash_df, bike_lane_df, road_data, network_path):
+    Returns the setup and function of each stage.
+    - run_benchmarks(scales, work_dir, repeat=3): Benchmarks every stage at
+    each scale.
+    - import_time(module, repeat=3): Times the import of a module in fresh
+    interpreters.
+"""
+
+import argparse
+import functools
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import folium
+import accidents_by_lane
+import heatmap
+import synthetic
+
+DEFAULT_SCALES = (10_000, 100_000, 1_000_000, 10_000_000)
+MAP_CENTER = (42.3601, -71.0589)
+# seconds the command line interface may take to import, far above its
+# usual few milliseconds so timer noise never trips it, and far below the
+# half second a pandas import costs
+IMPORT_BUDGET = 0.25
+
+
+def measure(func, setup, repeat=3):
+    """
+    Times a function and measures its peak memory.
+
+    Parameters:
+        func (function): The function to benchmark.
+        setup (function): Returns a fresh tuple of arguments for func, so
+        functions which change their inputs always start from the same
+        state. Setup is not timed.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: The time of the first run, the best time over all runs in
+        seconds and the peak memory allocated by the function in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    args = setup()
+    tracemalloc.start()
+    try:
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"first": times[0], "best": min(times), "peak_bytes": peak}
+
+
+def pipeline_stages(crash_df, bike_lane_df, road_data, network_path):
+    """
+    Returns the setup and function of each stage of the pipeline.
+
+    Parameters:
+        crash_df (pandas.DataFrame): The crash table.
+        bike_lane_df (pandas.DataFrame): The bike lane records.
+        road_data (pandas.DataFrame): The road segment table, so
+        normalize_data does not pull roads from the API.
+        network_path (str): The path of the bike network GeoJSON file.
+
+    Returns:
+        dict: Maps each stage name to a (setup, func) tuple for measure.
+    """
+    abbreviated = accidents_by_lane.abbreviate_street_names(
+        crash_df.copy(), bike_lane_df.copy()
+    )
+
+    # counted once normalize_data needs it, so find_street_accidents is the
+    # first to build the lane index and the network artifact
+    @functools.cache
+    def lane_type_dict():
+        counts = {"intersection": 0, "none": 0}
+        accidents_by_lane.find_non_street_accidents(counts, abbreviated[0])
+        accidents_by_lane.find_street_accidents(
+            counts, *abbreviated, lane_path=network_path
+        )
+        return counts
+
+    return {
+        "abbreviate_street_names": (
+            lambda: (crash_df.copy(), bike_lane_df.copy()),
+            accidents_by_lane.abbreviate_street_names,
+        ),
+        "find_street_accidents": (
+            lambda: ({"intersection": 0, "none": 0}, *abbreviated),
+            lambda counts, crashes, lanes: (
+                accidents_by_lane.find_street_accidents(
+                    counts, crashes, lanes, lane_path=network_path
+                )
+            ),
+        ),
+        "normalize_data": (
+            lambda: (dict(lane_type_dict()), abbreviated[1], road_data),
+            accidents_by_lane.normalize_data,
+        ),
+        "get_heat_map": (
+            lambda: (crash_df, folium.Map(location=MAP_CENTER, zoom_start=12)),
+            heatmap.get_heat_map,
+        ),
+        "get_heat_map_binned": (
+            lambda: (
+                crash_df,
+                folium.Map(location=MAP_CENTER, zoom_start=12),
+                heatmap.BIN_SIZE,
+            ),
+            heatmap.get_heat_map,
+        ),
+        "get_street_data": (
+            lambda: (
+                network_path,
+                folium.Map(location=MAP_CENTER, zoom_start=12),
+            ),
+            heatmap.get_street_data,
+        ),
+    }
+
+
+def run_benchmarks(scales, work_dir, repeat=3):
+    """
+    Benchmarks every stage of the pipeline at each scale.
+
+    Parameters:
+        scales (iterable): The numbers of crashes to benchmark.
+        work_dir (str): The directory to write the synthetic files to.
+        repeat (int): The number of timed runs of each stage.
+
+    Returns:
+        list: One dict per scale and stage with the scale, the stage name
+        and the results of measure.
+    """
+    results = []
+    for scale in scales:
+        tables = synthetic.write_dataset(scale, f"{work_dir}/{scale}")
+        for stage, (setup, func) in pipeline_stages(*tables).items():
+            results.append(
+                {"scale": scale, "stage": stage, **measure(func, setup, repeat)}
+            )
+    return results
+
+
+def import_time(module, repeat=3):
+    """
+    Times the import of a module, each time in a new interpreter.
+
+    Parameters:
+        module (str): The module to import.
+        repeat (int): The number of interpreters to start.
+
+    Returns:
+        dict: The time of the first import and the best time over all
+        imports in seconds, as reported by python -X importtime.
+    """
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timing = [
+            line
+            for line in result.stderr.splitlines()
+            if line.rstrip().endswith(f"| {module}")
+        ]
+        times.append(int(timing[-1].split("|")[1]) / 1e6)
+    return {"first": times[0], "best": min(times)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "scales", nargs="*", type=int, default=list(DEFAULT_SCALES)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to a JSON file")
+    arguments = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        rows = run_benchmarks(arguments.scales, directory, arguments.repeat)
+    for row in rows:
+        print(
+            f"{row['scale']:>10} {row['stage']:<24} "
+            f"first {row['first']:9.3f}s  best {row['best']:9.3f}s  "
+            f"peak {row['peak_bytes'] / 2**20:9.1f} MiB"
+        )
+    cli_import = import_time("boston_bike", arguments.repeat)
+    print(
+        f"{'':>10} {'import boston_bike':<24} "
+        f"first {cli_import['first']:9.3f}s  best {cli_import['best']:9.3f}s"
+        + ("" if cli_import["best"] < IMPORT_BUDGET else "  over budget")
+    )
+    rows.append({"stage": "import boston_bike", **cli_import})
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            json.dump(rows, file, indent=2)
@@ -0,0 +1,240 @@
+"""
+Command line interface for the Boston bike accident pipeline.
+
+Each subcommand only imports the modules it needs when it runs, so starting
+the program and printing help costs no pandas, geopandas or matplotlib
+import, and a job that only counts never imports matplotlib or folium.
+Datasets are read through the cache and the typed Parquet files, and map
+layers from their compiled artifacts, which fetch prepares ahead of time.
+
+Usage:
+    python boston_bike.py fetch
+    python boston_bike.py classify
+    python boston_bike.py report --output charts
+    python boston_bike.py heatmap --output heatmap.html
+
+Dependencies:
+    - argparse: Module for parsing the command line.
+    - json: Module for printing results.
+    - sys: Module for the exit status.
+
+Functions:
+    - fetch(arguments): Downloads the datasets and compiles the map layers.
+    - classify(arguments): Prints the accident counts by lane type.
+    - report(arguments): Prints or renders the normalized accident shares.
+    - heatmap_command(arguments): Writes the heat map as a page or tiles.
+    - build_parser(): Builds the argument parser.
+    - main(argv=None): Runs the command line interface.
+"""
+
+# pylint: disable=import-outside-toplevel
+import argparse
+import json
+import sys
+
+ACCIDENTS_URL = (
+    "https://data.boston.gov/api/3/action/datastore_search?resource_id="
+    + "e4bfe397-6bfc-49c5-9367-c879fac7401d&limit=49000"
+)
+BIKE_LANE_URL = (
+    "https://data.boston.gov/api/3/action/datastore_search?resource_id="
+    + "14e7e1a7-ffe0-4ae7-a6b4-3975fa32e879&limit=49000"
+)
+BOUNDARY_PATH = "data/City_of_Boston_Boundary_(Water_Excluded).geojson"
+MAP_CENTER = (42.3601, -71.0589)
+
+
+def fetch(arguments):
+    """
+    Downloads the crash, bike lane and road tables through the cache,
+    converts them to Parquet and compiles the map layers.
+
+    Parameters:
+        arguments (argparse.Namespace): The parsed command line.
+    """
+    import accidents_by_lane
+    import artifacts
+    import cache
+    import helpers
+
+    for url in (arguments.accidents_url, arguments.lanes_url):
+        print(helpers.ingest_data(cache.pull_cached(url)))
+    print(cache.pull_cached(accidents_by_lane.ROAD_URL))
+    for path, meta in artifacts.build_artifacts().items():
+        print(f"{path}: {meta['sha256'][:12]}")
+
+
+def _lane_type_dict(arguments):
+    """
+    Loads the data and counts accidents by lane type.
+
+    Parameters:
+        arguments (argparse.Namespace): The parsed command line.
+
+    Returns:
+    Tuple (lane_type_dict, bike_lane_df): The counts and the bike lane data.
+    """
+    import accidents_by_lane
+
+    bike_accident_df, bike_lane_df = accidents_by_lane.load_data(
+        arguments.accidents_url, arguments.lanes_url
+    )
+    intersection_index = None
+    if arguments.intersections:
+        import intersections
+
+        intersection_index = intersections.load_intersection_index()
+    lane_type_dict = accidents_by_lane.organize_by_lane(
+        bike_accident_df,
+        bike_lane_df,
+        workers=arguments.workers,
+        intersection_index=intersection_index,
+    )
+    return lane_type_dict, bike_lane_df
+
+
+def classify(arguments):
+    """
+    Prints the accident counts by lane type as JSON.
+
+    Parameters:
+        arguments (argparse.Namespace): The parsed command line.
+    """
+    lane_type_dict = _lane_type_dict(arguments)[0]
+    print(
+        json.dumps({key: float(value) for key, value in lane_type_dict.items()})
+    )
+
+
+def report(arguments):
+    """
+    Prints the normalized shares of accidents and lanes by lane type as
+    JSON, or renders the two bar graphs to a directory.
+
+    Parameters:
+        arguments (argparse.Namespace): The parsed command line.
+    """
+    import accidents_by_lane
+
+    lane_type_dict, bike_lane_df = _lane_type_dict(arguments)
+    lane_distr_dict, accident_percent_dict = accidents_by_lane.normalize_data(
+        lane_type_dict, bike_lane_df
+    )
+    if arguments.output is None:
+        print(
+            json.dumps(
+                {
+                    "lanes": lane_distr_dict,
+                    "accidents": accident_percent_dict,
+                }
+            )
+        )
+        return
+    import charts
+
+    for path in charts.render_batch(
+        {"boston": (lane_type_dict, lane_distr_dict, accident_percent_dict)},
+        arguments.output,
+        formats=tuple(arguments.formats.split(",")),
+        workers=1,
+    ):
+        print(path)
+
+
+def heatmap_command(arguments):
+    """
+    Writes the crash heat map as a Folium page or as map tiles.
+
+    Parameters:
+        arguments (argparse.Namespace): The parsed command line.
+    """
+    import cache
+    import helpers
+
+    bike_data = helpers.get_bike_data(
+        helpers.ingest_data(cache.pull_cached(arguments.accidents_url)),
+        ["lat", "long"],
+    )
+    if arguments.tiles is not None:
+        import tiles
+
+        print(tiles.export_tiles(bike_data, arguments.tiles, BOUNDARY_PATH))
+        return
+    import heatmap
+
+    folium_map = heatmap.get_map(BOUNDARY_PATH, *MAP_CENTER, arguments.zoom)
+    heatmap.get_heat_map(bike_data, folium_map, cell_size=heatmap.BIN_SIZE)
+    folium_map.save(arguments.output)
+    print(arguments.output)
+
+
+def build_parser():
+    """
+    Builds the argument parser with one subparser per subcommand.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="boston-bike",
+        description="Boston bike accidents by bike lane type.",
+    )
+    parser.add_argument("--accidents-url", default=ACCIDENTS_URL)
+    parser.add_argument("--lanes-url", default=BIKE_LANE_URL)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "fetch", help="download the datasets and compile the map layers"
+    ).set_defaults(run=fetch)
+
+    for name, run, help_text in (
+        ("classify", classify, "print accident counts by lane type"),
+        ("report", report, "print or render the normalized shares"),
+    ):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument(
+            "--workers", type=int, help="match crashes on this many processes"
+        )
+        subparser.add_argument(
+            "--intersections",
+            action="store_true",
+            help="attribute intersection crashes to the lanes meeting there",
+        )
+        subparser.set_defaults(run=run)
+    report_parser = subparsers.choices["report"]
+    report_parser.add_argument(
+        "--output", help="render the bar graphs to this directory"
+    )
+    report_parser.add_argument(
+        "--formats", default="png", help="comma separated, e.g. png,svg"
+    )
+
+    heatmap_parser = subparsers.add_parser(
+        "heatmap", help="write the crash heat map"
+    )
+    heatmap_parser.add_argument("--output", default="heatmap.html")
+    heatmap_parser.add_argument("--zoom", type=int, default=12)
+    heatmap_parser.add_argument(
+        "--tiles", help="export map tiles to this directory instead"
+    )
+    heatmap_parser.set_defaults(run=heatmap_command)
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the command line interface.
+
+    Parameters:
+        argv (list): The arguments, defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status.
+    """
+    arguments = build_parser().parse_args(argv)
+    arguments.run(arguments)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
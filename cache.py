@@ -0,0 +1,223 @@
+"""
+Module for caching downloaded datasets on disk.
+
+Datasets pulled from the data.boston.gov API are saved under `data/cache/`,
+keyed by their resource_id and query. A cached copy is served without any
+network traffic while it is younger than its dataset's TTL. Once it expires it
+is revalidated with a conditional GET (ETag/Last-Modified), so an unchanged
+table costs a single empty 304 response instead of a full download. The cache
+is capped in size and evicts the least recently used datasets first. In
+offline mode, or when the API cannot be reached, the last good copy is served.
+
+Dependencies:
+    - glob: Module for finding the files of an evicted dataset.
+    - hashlib: Module for hashing the query of a cached URL.
+    - json: Module for reading and writing the cache index.
+    - os: Module for file handling.
+    - shutil: Module for copying file objects.
+    - time: Module for timestamps.
+    - urllib: Modules for parsing and opening URLs.
+
+Functions:
+    - cache_key(url): Builds the cache key of a datastore URL.
+    - pull_cached(url, ttl=None, offline=OFFLINE, max_bytes=MAX_CACHE_BYTES,
+    cache_dir=CACHE_DIR): Pulls data from a URL through the cache and returns
+    the name of the cached file, like helpers.pull_data.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+CACHE_DIR = "cache"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = 24 * 60 * 60
+# crashes are added daily, the lane and road networks change a few times a year
+DATASET_TTLS = {
+    "e4bfe397-6bfc-49c5-9367-c879fac7401d": 6 * 60 * 60,
+    "14e7e1a7-ffe0-4ae7-a6b4-3975fa32e879": 7 * 24 * 60 * 60,
+    "6fa7932b-7bc8-42bc-9250-168d5f5dc1ad": 30 * 24 * 60 * 60,
+}
+OFFLINE = os.environ.get("BOSTON_BIKE_OFFLINE", "") == "1"
+
+
+def cache_key(url):
+    """
+    Builds the cache key of a datastore URL from its resource_id and the rest
+    of its query, ignoring the order of the query parameters.
+
+    Parameters:
+        url (str): A datastore_search URL.
+
+    Returns:
+        str: The cache key, e.g. "<resource_id>-<query hash>".
+    """
+    query = urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query)
+    resource_id = dict(query).get("resource_id", "url")
+    rest = sorted(pair for pair in query if pair[0] != "resource_id")
+    digest = hashlib.sha1(
+        f"{urllib.parse.urlsplit(url).path}?{rest}".encode("utf-8")
+    ).hexdigest()[:12]
+    return f"{resource_id}-{digest}"
+
+
+def _load_index(cache_dir):
+    """
+    Loads the index of a cache directory.
+
+    Parameters:
+        cache_dir (str): The cache directory inside the data folder.
+
+    Returns:
+        dict: Cache entries by cache key.
+    """
+    try:
+        with open(f"data/{cache_dir}/index.json", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(index, cache_dir):
+    """
+    Saves the index of a cache directory, replacing the old one atomically.
+
+    Parameters:
+        index (dict): Cache entries by cache key.
+        cache_dir (str): The cache directory inside the data folder.
+
+    Returns:
+        None
+    """
+    path = f"data/{cache_dir}/index.json"
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=1)
+    os.replace(f"{path}.tmp", path)
+
+
+def _evict(index, max_bytes, cache_dir, keep):
+    """
+    Removes the least recently used datasets until the cache fits in
+    max_bytes. The dataset that was just requested is never removed.
+
+    Parameters:
+        index (dict): Cache entries by cache key.
+        max_bytes (int): The size limit of the cache.
+        cache_dir (str): The cache directory inside the data folder.
+        keep (str): The cache key of the dataset being served.
+
+    Returns:
+        None
+    """
+    total = sum(entry["size"] for entry in index.values())
+    by_age = sorted(index, key=lambda key: index[key]["last_used"])
+    for key in by_age:
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        total -= index.pop(key)["size"]
+        # also drop files derived from the dataset, e.g. by ingest_data
+        for path in glob.glob(f"data/{cache_dir}/{key}.*"):
+            os.remove(path)
+
+
+def _download(url, entry, path):
+    """
+    Downloads a URL to path, sending the validators of an existing entry so
+    the server can answer 304 Not Modified.
+
+    Parameters:
+        url (str): The URL to download.
+        entry (dict or None): The current cache entry of the URL.
+        path (str): Where to save the response body.
+
+    Returns:
+        dict or None: The response validators, or None if the cached copy is
+        still current.
+    """
+    request = urllib.request.Request(url)
+    if entry is not None and os.path.exists(path):
+        if entry.get("etag"):
+            request.add_header("If-None-Match", entry["etag"])
+        if entry.get("last_modified"):
+            request.add_header("If-Modified-Since", entry["last_modified"])
+    try:
+        with urllib.request.urlopen(request) as fileobj, open(
+            f"{path}.part", "wb"
+        ) as file:
+            shutil.copyfileobj(fileobj, file)
+            headers = fileobj.headers
+    except urllib.error.HTTPError as error:
+        if error.code == 304:
+            return None
+        raise
+    os.replace(f"{path}.part", path)
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    }
+
+
+def pull_cached(
+    url,
+    ttl=None,
+    offline=OFFLINE,
+    max_bytes=MAX_CACHE_BYTES,
+    cache_dir=CACHE_DIR,
+):
+    """
+    Pull data from a specified URL through the on-disk cache.
+
+    Parameters:
+        url (str): The URL from which to pull the data.
+        ttl (float): Seconds a cached copy is served without revalidation,
+        defaults to the dataset's entry in DATASET_TTLS.
+        offline (bool): Serve the cached copy without touching the network.
+        max_bytes (int): The size limit of the cache.
+        cache_dir (str): The cache directory inside the data folder.
+
+    Returns:
+        str: The name of the cached file relative to the data folder, which
+        can be passed to helpers.load_data.
+
+    Raises:
+        urllib.error.URLError: If the URL cannot be fetched and there is no
+        cached copy to fall back on.
+        FileNotFoundError: If offline is set and there is no cached copy.
+    """
+    os.makedirs(f"data/{cache_dir}", exist_ok=True)
+    key = cache_key(url)
+    index = _load_index(cache_dir)
+    entry = index.get(key)
+    name = f"{key}.json"
+    path = f"data/{cache_dir}/{name}"
+    if ttl is None:
+        ttl = DATASET_TTLS.get(key.rsplit("-", 1)[0], DEFAULT_TTL)
+    now = time.time()
+    cached = entry is not None and os.path.exists(path)
+    if offline:
+        if not cached:
+            raise FileNotFoundError(f"No cached copy of {url}")
+    elif not cached or now - entry["fetched_at"] >= ttl:
+        try:
+            validators = _download(url, entry if cached else None, path)
+        except urllib.error.URLError:
+            # serve the last good copy while the API is unreachable
+            if not cached:
+                raise
+        else:
+            entry = dict(entry or {}, fetched_at=now, name=name)
+            if validators is not None:
+                entry.update(validators, size=os.path.getsize(path))
+    entry["last_used"] = now
+    index[key] = entry
+    _evict(index, max_bytes, cache_dir, keep=key)
+    _save_index(index, cache_dir)
+    return f"{cache_dir}/{name}"
@@ -0,0 +1,260 @@
+"""
+Module for rendering the bar graphs of many slices to image files.
+
+accidents_by_lane.plot_data shows the two bar graphs of one result in a
+window. To chart results per neighborhood or per year without a display,
+this module draws on the Agg backend and builds the two figures once per
+process: every slice only updates the bar heights and labels before the
+figures are saved, instead of creating new figures. Slices are split over
+a process pool and written as PNG or SVG files.
+
+Dependencies:
+    - collections.namedtuple: Factory for the Chart tuple.
+    - concurrent.futures: Module for the process pool.
+    - os: Module for file handling.
+    - Matplotlib: Library used to draw the bar graphs (Agg backend).
+    - NumPy: Library for array operations.
+    - tracing: Module for timing the stages of the pipeline.
+
+Functions:
+    - chart_categories(slices): Returns the lane types of all slices in a
+    fixed order.
+    - new_charts(categories, figsize=FIGURE_SIZE): Creates the percent and
+    count figures for the given lane types.
+    - render_slice(charts, name, results, out_dir, formats=("png",)): Draws
+    the results of one slice onto the figures and saves them.
+    - render_batch(slices, out_dir, formats=("png",), workers=None): Renders
+    the charts of many slices in parallel.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import tracing
+
+FIGURE_SIZE = (15, 15)
+# a figure with its lane types, bar containers and the label of every bar
+Chart = namedtuple("Chart", ["figure", "axes", "categories", "bars", "labels"])
+
+
+def chart_categories(slices):
+    """
+    Returns the lane types of all slices in a fixed order, so every slice is
+    drawn on the same bars.
+
+    Parameters:
+        slices (dict): Maps slice names to (lane_type_dict, lane_distr_dict,
+        accident_percent_dict) tuples, see accidents_by_lane.normalize_data.
+
+    Returns:
+        list: The lane types in the order of the first slice's
+        lane_distr_dict, followed by any lane types only other slices have.
+    """
+    categories = {}
+    for lane_type_dict, lane_distr_dict, _ in slices.values():
+        categories.update(dict.fromkeys(lane_distr_dict))
+        categories.update(dict.fromkeys(lane_type_dict))
+    return list(categories)
+
+
+def _bar_chart(categories, alignments, text, figsize):
+    """
+    Creates a figure with bar containers of zero height.
+
+    Parameters:
+        categories (list): The lane types on the x axis.
+        alignments (list): The vertical alignment of the value labels of
+        each bar container, one container per entry.
+        text (tuple): The title of the figure, the label of the y axis and
+        the legend entry of each bar container.
+        figsize (tuple): The size of the figure in inches.
+
+    Returns:
+        Chart: The figure, its axes, lane types, bar containers and value
+        labels.
+    """
+    title, ylabel, legend = text
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    bars = []
+    labels = []
+    for position, alignment in enumerate(alignments):
+        container = axes.bar(
+            categories,
+            np.zeros(len(categories)),
+            edgecolor="white" if position == 0 else None,
+        )
+        bars.append(container)
+        labels.append(
+            [
+                axes.text(
+                    patch.get_x() + patch.get_width() / 2,
+                    0,
+                    "",
+                    ha="center",
+                    va=alignment,
+                )
+                for patch in container
+            ]
+        )
+    axes.legend(legend)
+    axes.set_title(title)
+    axes.set_ylabel(ylabel)
+    axes.set_xlabel("Lane Type")
+    return Chart(figure, axes, categories, bars, labels)
+
+
+def new_charts(categories, figsize=FIGURE_SIZE):
+    """
+    Creates the percent and count figures for the given lane types.
+
+    Parameters:
+        categories (list): The lane types on the x axis.
+        figsize (tuple): The size of the figures in inches.
+
+    Returns:
+        Tuple (percent_chart, count_chart): The two Charts, laid out like
+        the graphs of accidents_by_lane.plot_data.
+    """
+    percent_chart = _bar_chart(
+        categories,
+        ["top", "bottom"],
+        (
+            "Percentage of Bike Accidents by Category",
+            "Percent(%)",
+            ["Distribution of Accidents", "Distribution of Bike Lanes"],
+        ),
+        figsize,
+    )
+    count_chart = _bar_chart(
+        categories,
+        ["bottom"],
+        (
+            "Number of Bike Accidents by Category",
+            "Count",
+            ["Number of Accidents"],
+        ),
+        figsize,
+    )
+    return percent_chart, count_chart
+
+
+def _update_chart(chart, series, digits, title):
+    """
+    Sets the bar heights and value labels of a chart.
+
+    Parameters:
+        chart (Chart): The chart to update.
+        series (list): A dict of values by lane type for each bar container.
+        Lane types a dict does not have are drawn with zero height.
+        digits (int): The decimal places of the value labels.
+        title (str): The new title of the figure.
+    """
+    for container, labels, values in zip(chart.bars, chart.labels, series):
+        for patch, label, category in zip(container, labels, chart.categories):
+            value = values.get(category, 0)
+            patch.set_height(value)
+            label.set_y(value)
+            label.set_text(round(value, digits))
+    chart.axes.relim()
+    chart.axes.autoscale_view()
+    chart.axes.set_title(title)
+
+
+def render_slice(charts, name, results, out_dir, formats=("png",)):
+    """
+    Draws the results of one slice onto the figures and saves them.
+
+    Parameters:
+        charts (tuple): The figures from new_charts.
+        name (str): The name of the slice, used in the titles and file
+        names.
+        results (tuple): The (lane_type_dict, lane_distr_dict,
+        accident_percent_dict) of the slice.
+        out_dir (str): The directory to write the images to.
+        formats (tuple): The image formats to write, e.g. ("png", "svg").
+
+    Returns:
+        list: The paths of the written images.
+    """
+    lane_type_dict, lane_distr_dict, accident_percent_dict = results
+    percent_chart, count_chart = charts
+    _update_chart(
+        percent_chart,
+        [lane_distr_dict, accident_percent_dict],
+        1,
+        f"Percentage of Bike Accidents by Category ({name})",
+    )
+    _update_chart(
+        count_chart,
+        [lane_type_dict],
+        3,
+        f"Number of Bike Accidents by Category ({name})",
+    )
+    paths = []
+    for kind, chart in (("percent", percent_chart), ("count", count_chart)):
+        for image_format in formats:
+            path = os.path.join(out_dir, f"{name}_{kind}.{image_format}")
+            chart.figure.savefig(path)
+            paths.append(path)
+    return paths
+
+
+def _render_chunk(categories, items, out_dir, formats):
+    """
+    Renders a list of slices on one set of figures.
+
+    Parameters:
+        categories (list): The lane types on the x axis.
+        items (list): (name, results) pairs of the slices to render.
+        out_dir (str): The directory to write the images to.
+        formats (tuple): The image formats to write.
+
+    Returns:
+        list: The paths of the written images.
+    """
+    charts = new_charts(categories)
+    paths = []
+    for name, results in items:
+        paths.extend(render_slice(charts, name, results, out_dir, formats))
+    return paths
+
+
+@tracing.traced
+def render_batch(slices, out_dir, formats=("png",), workers=None):
+    """
+    Renders the percent and count charts of many slices, e.g. one per
+    neighborhood or year, to `<out_dir>/<name>_percent.<format>` and
+    `<out_dir>/<name>_count.<format>`.
+
+    Parameters:
+        slices (dict): Maps slice names to (lane_type_dict, lane_distr_dict,
+        accident_percent_dict) tuples, see accidents_by_lane.normalize_data.
+        out_dir (str): The directory to write the images to.
+        formats (tuple): The image formats to write, e.g. ("png", "svg").
+        workers (int): The number of processes, defaults to the CPU count.
+        With one worker the charts are rendered in this process.
+
+    Returns:
+        list: The paths of the written images, in the order of slices.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    categories = chart_categories(slices)
+    items = list(slices.items())
+    workers = min(workers or os.cpu_count() or 1, max(len(items), 1))
+    if workers == 1:
+        return _render_chunk(categories, items, out_dir, formats)
+    # contiguous chunks keep the paths in the order of slices
+    bounds = np.linspace(0, len(items), workers + 1).astype(int)
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(
+                _render_chunk, categories, items[start:stop], out_dir, formats
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        return [path for future in futures for path in future.result()]
@@ -0,0 +1,141 @@
+"""
+Module for organizing crash histories larger than memory.
+
+organize_by_lane needs the whole crash table in one DataFrame. Here the
+crashes are read from a pulled file in chunks of bounded size instead, see
+helpers.iter_bike_chunks. Each chunk goes through the same street-name
+normalization and lane matching as the in-memory path, against one bike
+lane index shared by all chunks. Only the counts by lane type are kept
+between chunks, so peak memory depends on the chunk size and not on the
+length of the history. The lane lengths used to normalize the counts only
+depend on the bike lane table and are memoized by the exposure module.
+
+Dependencies:
+    - accidents_by_lane: Module with the classification and normalization.
+    - helpers: Module for reading pulled datasets in chunks.
+    - lane_index: Module with the bike lane index.
+    - streets: Module for normalizing street names.
+    - tracing: Module for timing the stages of the pipeline.
+
+Functions:
+    - organize_by_lane_chunked(path, bike_lane_df, chunk_size=CHUNK_SIZE,
+    lane_path=BIKE_NETWORK_PATH, intersection_index=None): Counts crashes by
+    lane type one chunk at a time.
+    - report_chunked(path, bike_lane_df, road_data=None,
+    chunk_size=CHUNK_SIZE, lane_path=BIKE_NETWORK_PATH,
+    intersection_index=None): Counts and normalizes crashes by lane type one
+    chunk at a time.
+"""
+
+import accidents_by_lane
+import helpers
+import lane_index
+import streets
+import tracing
+
+CHUNK_SIZE = helpers.CHUNK_SIZE
+
+
+def _add_counts(totals, counts):
+    """
+    Adds the counts of one chunk to the totals.
+
+    Parameters:
+        totals (dict): The counts by lane type so far, updated in place.
+        counts (dict): The counts by lane type of one chunk.
+    """
+    for lane_type, count in counts.items():
+        totals[lane_type] = totals.get(lane_type, 0) + count
+
+
+@tracing.traced
+def organize_by_lane_chunked(
+    path,
+    bike_lane_df,
+    chunk_size=CHUNK_SIZE,
+    lane_path=lane_index.BIKE_NETWORK_PATH,
+    intersection_index=None,
+):
+    """
+    Organizes crashes by where they occured, like organize_by_lane, reading
+    the crashes one chunk at a time.
+
+    Parameters:
+        path (str): The name of a pulled crash file in the data folder,
+        ideally Parquet or newline-delimited JSON.
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        It is not changed.
+        chunk_size (int): The number of crash records read at a time.
+        lane_path (str): The bike network GeoJSON file to match against.
+        intersection_index (dict): If given, attribute intersection crashes
+        to the lane types meeting there, see find_non_street_accidents.
+
+    Returns:
+        A dictionary organizing crashes by bike lane presence, with the
+        same counts as organize_by_lane on the whole table.
+    """
+    # the lane side is small and the same for every chunk, prepare it once
+    bike_lane_df = bike_lane_df.copy()
+    bike_lane_df["STREET_NAM"] = streets.canonicalize_streets(
+        bike_lane_df["STREET_NAM"]
+    )
+    street_index = accidents_by_lane.build_street_index(bike_lane_df)
+    lane_index.load_lane_index(lane_path)
+    lane_type_dict = {"intersection": 0, "none": 0, "other": 0}
+    for chunk in helpers.iter_bike_chunks(
+        path, chunk_size, accidents_by_lane.ACCIDENT_COLUMNS
+    ):
+        counts = {"intersection": 0, "none": 0}
+        chunk = accidents_by_lane.abbreviate_accident_streets(chunk)
+        accidents_by_lane.find_non_street_accidents(
+            counts, chunk, intersection_index
+        )
+        accidents_by_lane.find_street_accidents(
+            counts,
+            chunk,
+            bike_lane_df,
+            street_index=street_index,
+            lane_path=lane_path,
+        )
+        _add_counts(lane_type_dict, counts)
+    return lane_type_dict
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def report_chunked(
+    path,
+    bike_lane_df,
+    road_data=None,
+    chunk_size=CHUNK_SIZE,
+    lane_path=lane_index.BIKE_NETWORK_PATH,
+    intersection_index=None,
+):
+    """
+    Counts and normalizes crashes by lane type, reading the crashes one
+    chunk at a time.
+
+    Parameters:
+        path (str): The name of a pulled crash file in the data folder.
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        road_data (pandas.DataFrame): Road segment data, pulled from the API
+        if not given.
+        chunk_size (int): The number of crash records read at a time.
+        lane_path (str): The bike network GeoJSON file to match against.
+        intersection_index (dict): If given, attribute intersection crashes
+        to the lane types meeting there, see find_non_street_accidents.
+
+    Returns:
+    Tuple (lane_type_dict, lane_distr_dict, accident_percent_dict):
+        The counts of organize_by_lane_chunked and the percentages of
+        accidents_by_lane.normalize_data, ready for plot_data or
+        charts.render_batch.
+    """
+    lane_type_dict = organize_by_lane_chunked(
+        path, bike_lane_df, chunk_size, lane_path, intersection_index
+    )
+    return (
+        lane_type_dict,
+        *accidents_by_lane.normalize_data(
+            lane_type_dict, bike_lane_df, road_data
+        ),
+    )
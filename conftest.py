@@ -0,0 +1,230 @@
+"""
+Shared pytest fixtures.
+
+Provides a local stand-in for the data.boston.gov CKAN datastore so that the
+download functions can be tested without touching the network.
+
+Also provides a small synthetic bike network and crash table around
+downtown Boston for testing the analysis offline.
+
+Fixtures:
+    build_dir: Keeps the compiled map layers of each test in its temporary
+    directory instead of data/build.
+    summary_path: Keeps the exposure summary of each test in its temporary
+    directory instead of data/exposure_summary.json.
+    ckan_server: Serves datastore_search and datastore_search_sql requests
+    for an in-memory list of records on a local port.
+    bike_network_path: Writes a two-lane bike network GeoJSON file.
+    bike_lane_table: The bike lane records matching the bike network.
+    bike_crashes: A crash table with crashes on, near and away from the lanes.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import LineString
+import artifacts
+import exposure
+
+TEST_RESOURCE_ID = "test-resource"
+
+
+def _sql_result(records, sql):
+    """
+    Answers the only datastore_search_sql query the code sends, records
+    after an `_id` in `_id` order, with CKAN's _full_text column added.
+
+    Parameters:
+        records (list): The records of the resource.
+        sql (str): A "SELECT * ... WHERE _id > n ORDER BY _id LIMIT m" query.
+
+    Returns:
+        dict: The result of the query.
+    """
+    after = int(re.search(r"_id > (\d+)", sql).group(1))
+    limit = int(re.search(r"LIMIT (\d+)", sql).group(1))
+    selected = sorted(
+        (record for record in records if record["_id"] > after),
+        key=lambda record: record["_id"],
+    )[:limit]
+    return {"records": [{**record, "_full_text": ""} for record in selected]}
+
+
+class _CkanHandler(BaseHTTPRequestHandler):
+    """
+    Answers datastore_search requests with a page of the server's records,
+    tagged with an ETag so conditional requests can be answered with 304.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=C0103
+        """
+        Handles a GET request for a page of records.
+        """
+        server = self.server
+        server.requests.append(self.path)
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        if parts.path.endswith("_sql"):
+            result = _sql_result(server.records, query["sql"][0])
+        else:
+            offset = int(query.get("offset", ["0"])[0])
+            limit = min(int(query.get("limit", ["100"])[0]), server.max_limit)
+            result = {
+                "resource_id": query["resource_id"][0],
+                "limit": limit,
+                "total": len(server.records),
+                "records": server.records[offset : offset + limit],
+            }
+        body = json.dumps({"success": True, "result": result}).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        """
+        Keeps the test output free of request logs.
+        """
+
+
+@pytest.fixture(autouse=True)
+def build_dir(tmp_path, monkeypatch):
+    """
+    Points the default artifact directory at the temporary directory of the
+    test and returns it, so no test writes to data/build.
+    """
+    path = str(tmp_path / "build")
+    monkeypatch.setattr(artifacts, "BUILD_DIR", path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def summary_path(tmp_path, monkeypatch):
+    """
+    Points the default exposure summary at the temporary directory of the
+    test and returns it, forgetting the summaries kept in memory before and
+    after the test.
+    """
+    path = str(tmp_path / "exposure_summary.json")
+    monkeypatch.setattr(exposure, "SUMMARY_PATH", path)
+    exposure.clear()
+    yield path
+    exposure.clear()
+
+
+@pytest.fixture
+def ckan_server():
+    """
+    Starts a local CKAN stand-in and yields it. Tests set `records` to the
+    rows the resource should contain, may lower `max_limit` and can inspect
+    `requests` afterwards.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CkanHandler)
+    server.records = []
+    server.requests = []
+    # the largest limit the server answers, like CKAN's ckan.datastore limit
+    server.max_limit = 32000
+    server.url = f"http://127.0.0.1:{server.server_port}/datastore_search"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def bike_network_path(tmp_path):
+    """
+    Writes a bike network of two parallel east-west lanes, about 110 m apart,
+    and returns the path of the GeoJSON file.
+    """
+    lanes = gpd.GeoDataFrame(
+        {
+            "STREET_NAM": ["MAIN ST", "PARK AVE"],
+            "ExisFacil": ["BL", "SBL"],
+            "Shape_Leng": ["3000.0", "1500.0"],
+        },
+        geometry=[
+            LineString([(-71.06, 42.35), (-71.05, 42.35)]),
+            LineString([(-71.06, 42.351), (-71.055, 42.351)]),
+        ],
+        crs="EPSG:4326",
+    )
+    path = tmp_path / "bike_network.geojson"
+    lanes.to_file(path, driver="GeoJSON")
+    return str(path)
+
+
+@pytest.fixture
+def bike_lane_table():
+    """
+    Returns the bike lane records matching bike_network_path, the way CKAN
+    returns them.
+    """
+    return pd.DataFrame(
+        {
+            "STREET_NAM": ["Main Street", "Park Avenue"],
+            "ExisFacil": ["BL", "SBL"],
+            "InstallDat": ["2013", "2019"],
+            "Shape_Leng": ["3000.0", "1500.0"],
+        }
+    )
+
+
+@pytest.fixture
+def bike_crashes():
+    """
+    Returns a crash table the way get_bike_data does, with values stored as
+    strings: two crashes a few meters from a lane, one between the lanes, one
+    on a street without a lane and two intersection/other crashes.
+    """
+    return pd.DataFrame(
+        {
+            "_id": [1, 2, 3, 4, 5, 6],
+            "dispatch_ts": [
+                "2023-01-03 08:00:00",
+                "2023-01-20 17:30:00",
+                "2023-02-11 12:00:00",
+                "2023-02-14 09:15:00",
+                "2023-03-01 18:45:00",
+                "2023-03-09 07:05:00",
+            ],
+            "mode_type": ["bike"] * 6,
+            "location_type": [
+                "Street",
+                "Street",
+                "Street",
+                "Street",
+                "Intersection",
+                "Other",
+            ],
+            "street": [
+                "MAIN STREET",
+                "PARK AVENUE",
+                "MAIN STREET",
+                "ELM STREET",
+                "MAIN STREET",
+                None,
+            ],
+            "xstreet1": [None, None, None, None, "PARK AVENUE", None],
+            "xstreet2": [None] * 6,
+            "lat": ["42.35005", "42.3509", "42.3505", "42.35", "42.351", ""],
+            "long": ["-71.055", "-71.058", "-71.055", "-71.0", "-71.06", ""],
+        }
+    )
@@ -0,0 +1,234 @@
+"""
+Module for keeping crashes in memory in a compact, typed form.
+
+get_bike_data returns every column of the crash table, and read from the
+API most of them are strings in object columns. The analysis and the maps
+only use the id, dispatch time, coordinates, location type and street names
+of each crash. A CrashStore keeps just those in NumPy arrays: ids and
+timestamps as 64-bit integers, coordinates as one (n, 2) float array, and
+the location type and the three street columns as small integer codes into
+a table of their distinct values. The coordinate array is handed to the
+maps as is, without copying.
+
+Dependencies:
+    - Geopandas: Extends pandas to allow spatial operations on geometric types.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+
+Classes:
+    - CrashStore: The columns of a crash table used by the analysis, stored
+    as typed arrays.
+"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+STREET_COLUMNS = ("street", "xstreet1", "xstreet2")
+
+
+def _codes(values, dtype):
+    """
+    Encodes values as integer codes into a table of their distinct values.
+
+    Parameters:
+        values (numpy.ndarray): The values, may contain missing values.
+        dtype (numpy.dtype): The integer type of the codes.
+
+    Returns:
+    Tuple (codes, uniques):
+        codes (numpy.ndarray): The code of each value, -1 where missing,
+        shaped like values.
+        uniques (numpy.ndarray): The distinct values as an object array.
+    """
+    codes, uniques = pd.factorize(values.ravel())
+    return (
+        codes.astype(dtype).reshape(values.shape),
+        np.asarray(uniques, dtype=object),
+    )
+
+
+class CrashStore:
+    """
+    The columns of a crash table used by the analysis, stored as typed
+    arrays. Build one with CrashStore.from_frame.
+
+    Attributes:
+        ids (numpy.ndarray): The _id of each crash as int64.
+        timestamps (numpy.ndarray): The dispatch time of each crash in
+        nanoseconds since the epoch as int64, the minimum int64 where
+        missing.
+        coords (numpy.ndarray): An (n, 2) array of [lat, long] rows, NaN
+        where missing.
+        location_codes (numpy.ndarray): The location type of each crash as
+        int8 codes into location_types, -1 where missing.
+        location_types (numpy.ndarray): The distinct location types.
+        street_codes (numpy.ndarray): An (n, 3) int32 array of codes into
+        street_names for the street, xstreet1 and xstreet2 columns, -1 where
+        missing.
+        street_names (numpy.ndarray): The distinct street names of all three
+        street columns.
+    """
+
+    __slots__ = (
+        "ids",
+        "timestamps",
+        "coords",
+        "location_codes",
+        "location_types",
+        "street_codes",
+        "street_names",
+    )
+
+    def __init__(self, ids, timestamps, coords, locations, streets):
+        """
+        Parameters:
+            ids (numpy.ndarray): The int64 ids.
+            timestamps (numpy.ndarray): The int64 timestamps.
+            coords (numpy.ndarray): The (n, 2) coordinates.
+            locations (tuple): The location codes and types.
+            streets (tuple): The street codes and names.
+        """
+        self.ids = ids
+        self.timestamps = timestamps
+        self.coords = coords
+        self.location_codes, self.location_types = locations
+        self.street_codes, self.street_names = streets
+
+    @classmethod
+    def from_frame(cls, crash_df, coordinate_dtype=np.float64):
+        """
+        Builds a store from a crash table, e.g. the result of get_bike_data.
+
+        Parameters:
+            crash_df (pandas.DataFrame): Crashes with _id, dispatch_ts, lat,
+            long, location_type, street, xstreet1 and xstreet2 columns, as
+            strings or typed.
+            coordinate_dtype (numpy.dtype): The float type of the
+            coordinates. float32 halves their memory but rounds them to
+            about a meter.
+
+        Returns:
+            CrashStore: The store.
+        """
+        coords = (
+            crash_df[["lat", "long"]]
+            .apply(pd.to_numeric, errors="coerce")
+            .to_numpy(dtype=coordinate_dtype)
+        )
+        return cls(
+            crash_df["_id"].astype(np.int64).to_numpy(),
+            pd.to_datetime(crash_df["dispatch_ts"])
+            .to_numpy("datetime64[ns]")
+            .view(np.int64),
+            np.ascontiguousarray(coords),
+            _codes(crash_df["location_type"].to_numpy(dtype=object), np.int8),
+            _codes(
+                crash_df[list(STREET_COLUMNS)].to_numpy(dtype=object),
+                np.int32,
+            ),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """
+        int: The memory used by the arrays and the distinct strings.
+        """
+        strings = sum(
+            len(value)
+            for value in (*self.location_types, *self.street_names)
+            if isinstance(value, str)
+        )
+        return (
+            sum(getattr(self, name).nbytes for name in self.__slots__) + strings
+        )
+
+    def select(self, mask):
+        """
+        Returns the crashes where mask is true.
+
+        Parameters:
+            mask (numpy.ndarray): A boolean array, or an array of positions.
+
+        Returns:
+            CrashStore: A store with the selected crashes, sharing the
+            tables of distinct values.
+        """
+        return CrashStore(
+            self.ids[mask],
+            self.timestamps[mask],
+            self.coords[mask],
+            (self.location_codes[mask], self.location_types),
+            (self.street_codes[mask], self.street_names),
+        )
+
+    def location_mask(self, location_type):
+        """
+        Returns which crashes have the given location type.
+
+        Parameters:
+            location_type (str): E.g. "Street" or "Intersection".
+
+        Returns:
+            numpy.ndarray: A boolean array.
+        """
+        matches = np.flatnonzero(self.location_types == location_type)
+        if matches.size == 0:
+            return np.zeros(len(self), dtype=bool)
+        return self.location_codes == matches[0]
+
+    def located(self):
+        """
+        Returns the coordinates of the crashes that have them.
+
+        Returns:
+            numpy.ndarray: An (m, 2) array of [lat, long] rows, the coords
+            array itself when no coordinates are missing.
+        """
+        missing = np.isnan(self.coords).any(axis=1)
+        if not missing.any():
+            return self.coords
+        return self.coords[~missing]
+
+    def geometry(self):
+        """
+        Returns the crashes as points.
+
+        Returns:
+            geopandas.GeoSeries: A point per crash in EPSG:4326, with NaN
+            coordinates where they are missing.
+        """
+        return gpd.GeoSeries(
+            gpd.points_from_xy(self.coords[:, 1], self.coords[:, 0]),
+            crs="EPSG:4326",
+        )
+
+    def to_frame(self):
+        """
+        Returns the crashes as a DataFrame with the columns the analysis
+        uses, for the functions of accidents_by_lane.
+
+        Returns:
+            pandas.DataFrame: _id, dispatch_ts, location_type, street,
+            xstreet1, xstreet2, lat and long columns. The text columns are
+            categoricals over the tables of distinct values.
+        """
+        frame = pd.DataFrame(
+            {
+                "_id": self.ids,
+                "dispatch_ts": self.timestamps.view("datetime64[ns]"),
+                "location_type": pd.Categorical.from_codes(
+                    self.location_codes, self.location_types
+                ),
+            }
+        )
+        for position, column in enumerate(STREET_COLUMNS):
+            frame[column] = pd.Categorical.from_codes(
+                self.street_codes[:, position], self.street_names
+            )
+        frame["lat"] = self.coords[:, 0]
+        frame["long"] = self.coords[:, 1]
+        return frame
@@ -0,0 +1,244 @@
+"""
+Module for downloading several datastore tables concurrently.
+
+A report run needs the crash, bike lane and road segment tables. Instead of
+pulling them one after the other, they are paged through at the same time on
+an asyncio event loop. Requests go over a small pool of keep-alive HTTP
+connections per host, and each page is parsed into a DataFrame on a worker
+thread as soon as it arrives, while other pages are still downloading. Once
+the first page of a table gives its total, its remaining pages are requested
+together.
+
+Dependencies:
+    - asyncio: Module for running the downloads concurrently.
+    - http.client: Module for keep-alive HTTP connections.
+    - json: Module for decoding the responses.
+    - queue: Module for the pool of idle connections.
+    - urllib.parse: Module for building page URLs.
+    - Pandas: A powerful data manipulation library.
+    - helpers: Module holding the default page size.
+
+Functions:
+    - load_urls(urls, page_size=PAGE_SIZE, max_connections=MAX_CONNECTIONS):
+    Downloads every record of several datastore_search URLs concurrently and
+    returns a DataFrame for each.
+"""
+
+import asyncio
+import http.client
+import json
+import queue
+import urllib.parse
+import pandas as pd
+import helpers
+
+MAX_CONNECTIONS = 6
+
+
+class ConnectionPool:
+    """
+    A pool of keep-alive HTTP connections to one host.
+
+    Attributes:
+        scheme (str): "http" or "https".
+        host (str): The host and port to connect to.
+        idle (queue.LifoQueue): Connections ready for another request.
+    """
+
+    def __init__(self, scheme, host):
+        self.scheme = scheme
+        self.host = host
+        self.idle = queue.LifoQueue()
+
+    def _connect(self):
+        """
+        Opens a new connection to the host.
+
+        Returns:
+            http.client.HTTPConnection: The connection.
+        """
+        connection_class = (
+            http.client.HTTPSConnection
+            if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return connection_class(self.host, timeout=60)
+
+    def get_json(self, path):
+        """
+        Sends a GET request on an idle connection, or a new one, and decodes
+        the JSON response. If an idle connection fails, e.g. because the
+        server closed it in the meantime, the request is sent once more on a
+        new connection.
+
+        Parameters:
+            path (str): The path and query to request.
+
+        Returns:
+            The decoded response.
+
+        Raises:
+            http.client.HTTPException: If the response is not 200 OK.
+        """
+        try:
+            connection, reused = self.idle.get_nowait(), True
+        except queue.Empty:
+            connection, reused = self._connect(), False
+        while True:
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if not reused:
+                    raise
+                connection, reused = self._connect(), False
+        self.idle.put(connection)
+        if response.status != 200:
+            raise http.client.HTTPException(
+                f"GET {path} returned {response.status}"
+            )
+        return json.loads(body)
+
+    def close(self):
+        """
+        Closes every idle connection.
+        """
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+def _page_path(url, offset, page_size):
+    """
+    Builds the path and query of one page of a datastore_search URL.
+
+    Parameters:
+        url (str): The datastore_search URL, its limit and offset are
+        replaced.
+        offset (int): The number of records to skip.
+        page_size (int): The number of records to request.
+
+    Returns:
+        str: The path and query of the page.
+    """
+    parts = urllib.parse.urlsplit(url)
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    query.update(limit=page_size, offset=offset)
+    query.setdefault("sort", "_id asc")
+    return f"{parts.path}?{urllib.parse.urlencode(query)}"
+
+
+def _fetch_page(pool, url, offset, page_size):
+    """
+    Downloads and parses one page. Runs on a worker thread.
+
+    Parameters:
+        pool (ConnectionPool): The connections to the URL's host.
+        url (str): The datastore_search URL.
+        offset (int): The number of records to skip.
+        page_size (int): The number of records to request.
+
+    Returns:
+        Tuple (records, total): The page as a DataFrame and the total number
+        of records in the table.
+    """
+    result = pool.get_json(_page_path(url, offset, page_size))["result"]
+    return pd.DataFrame(result["records"]), result.get("total")
+
+
+async def _fetch_table(pool, url, page_size, slots):
+    """
+    Downloads every page of a table, requesting the pages after the first
+    one concurrently. The server may cap the page size below page_size, so
+    the pages are as long as the first one. Without a total the pages are
+    requested one after another until one comes back empty.
+
+    Parameters:
+        pool (ConnectionPool): The connections to the URL's host.
+        url (str): The datastore_search URL.
+        page_size (int): The number of records per page.
+        slots (asyncio.Semaphore): Limits the requests in flight.
+
+    Returns:
+        pandas.DataFrame: Every record of the table.
+    """
+
+    async def fetch(offset, limit):
+        async with slots:
+            return await asyncio.to_thread(
+                _fetch_page, pool, url, offset, limit
+            )
+
+    first, total = await fetch(0, page_size)
+    pages = [first]
+    if total is None:
+        while len(pages[-1]):
+            offset = sum(len(page) for page in pages)
+            pages.append((await fetch(offset, page_size))[0])
+    elif 0 < len(first) < total:
+        step = len(first)
+        rest = await asyncio.gather(
+            *(fetch(offset, step) for offset in range(step, total, step))
+        )
+        pages.extend(page for page, _ in rest)
+    return pd.concat(pages, ignore_index=True)
+
+
+async def _fetch_all(urls, page_size, max_connections):
+    """
+    Downloads several tables concurrently.
+
+    Parameters:
+        urls (dict): The datastore_search URL of each table by name.
+        page_size (int): The number of records per page.
+        max_connections (int): The number of requests in flight per host.
+
+    Returns:
+        dict: Every record of each table as a DataFrame, by name.
+    """
+    pools = {}
+    slots = {}
+    for url in urls.values():
+        parts = urllib.parse.urlsplit(url)
+        pools.setdefault(
+            parts.netloc, ConnectionPool(parts.scheme, parts.netloc)
+        )
+        slots.setdefault(parts.netloc, asyncio.Semaphore(max_connections))
+    try:
+        frames = await asyncio.gather(
+            *(
+                _fetch_table(
+                    pools[urllib.parse.urlsplit(url).netloc],
+                    url,
+                    page_size,
+                    slots[urllib.parse.urlsplit(url).netloc],
+                )
+                for url in urls.values()
+            )
+        )
+    finally:
+        for pool in pools.values():
+            pool.close()
+    return dict(zip(urls, frames))
+
+
+def load_urls(
+    urls, page_size=helpers.PAGE_SIZE, max_connections=MAX_CONNECTIONS
+):
+    """
+    Downloads every record of several datastore_search URLs concurrently.
+    The limit and offset of the URLs are replaced to page through the whole
+    table. Unlike cache.pull_cached, the tables are always downloaded.
+
+    Parameters:
+        urls (dict): The datastore_search URL of each table by name.
+        page_size (int): The number of records per page.
+        max_connections (int): The number of requests in flight per host.
+
+    Returns:
+        dict: Every record of each table as a DataFrame, by name, with the
+        values left as they were in the JSON.
+    """
+    return asyncio.run(_fetch_all(urls, page_size, max_connections))
@@ -0,0 +1,199 @@
+"""
+Module for the exposure denominators used to normalize accident counts.
+
+normalize_data compares the share of accidents on each lane type with the
+share of road length that lane type covers. Those lengths only change when
+the lane or road tables change, so they are computed once, kept in memory
+and stored in a small versioned summary file, `data/exposure_summary.json`.
+Road length is keyed by the pulled road file (its path, size and
+modification time), so an unchanged table is never loaded again. Lane
+lengths of the frame helpers.load_records read from a Parquet file are keyed
+by that file the same way. Any other table, including a copy or subset of a
+loaded one, is keyed by a hash of its columns, so an edited copy gets new
+lengths. A loaded frame edited in place keeps its file key, so edit a copy.
+The summary keeps the lane lengths of the MAX_LANE_SUMMARIES most recent
+tables.
+
+Dependencies:
+    - hashlib: Module for fingerprinting lane tables.
+    - json: Module for reading and writing the summary file.
+    - os: Module for file handling.
+    - Pandas: A powerful data manipulation library.
+    - helpers: Module for reading the road table.
+
+Functions:
+    - road_length(road_path): Returns the total length of every road in a
+    pulled road table.
+    - lane_lengths(bike_lane_df, by=("ExisFacil",)): Returns the total
+    length of bike lanes grouped by the given columns, e.g. facility type and
+    install year.
+    - clear(): Forgets the summaries kept in memory.
+"""
+
+import hashlib
+import json
+import os
+import pandas as pd
+import helpers
+
+SUMMARY_PATH = "data/exposure_summary.json"
+SUMMARY_VERSION = 1
+# lane length entries kept in the summary file, oldest dropped first
+MAX_LANE_SUMMARIES = 16
+_summaries = {}
+
+
+def _load_summary(summary_path):
+    """
+    Loads the summary file, kept in memory after the first call.
+
+    Parameters:
+        summary_path (str): The path of the summary file.
+
+    Returns:
+        dict: Road lengths ("roads") and lane lengths ("lanes") by key.
+    """
+    if summary_path not in _summaries:
+        summary = {"version": SUMMARY_VERSION, "roads": {}, "lanes": {}}
+        try:
+            with open(summary_path, encoding="utf-8") as file:
+                stored = json.load(file)
+            if stored.get("version") == SUMMARY_VERSION:
+                summary = stored
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        _summaries[summary_path] = summary
+    return _summaries[summary_path]
+
+
+def _save_summary(summary, summary_path):
+    """
+    Saves the summary file, replacing the old one atomically.
+
+    Parameters:
+        summary (dict): The summary, see _load_summary.
+        summary_path (str): The path of the summary file.
+
+    Returns:
+        None
+    """
+    with open(f"{summary_path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(summary, file, indent=1)
+    os.replace(f"{summary_path}.tmp", summary_path)
+
+
+def clear():
+    """
+    Forgets the summaries kept in memory, so the next call reads the summary
+    file again.
+    """
+    _summaries.clear()
+
+
+def road_length(road_path, summary_path=None):
+    """
+    Returns the total length of every road in a pulled road table. The table
+    is only read if this version of the file has not been summarized yet.
+
+    Parameters:
+        road_path (str): The name of the pulled road file in the data
+        folder, e.g. as returned by cache.pull_cached.
+        summary_path (str): The path of the summary file, defaults to
+        SUMMARY_PATH.
+
+    Returns:
+        float: The sum of SHAPESTLength.
+    """
+    stat = os.stat(f"data/{road_path}")
+    key = f"{road_path}:{stat.st_size}:{stat.st_mtime_ns}"
+    summary_path = summary_path or SUMMARY_PATH
+    summary = _load_summary(summary_path)
+    if key not in summary["roads"]:
+        road_data = helpers.load_records(
+            helpers.ingest_data(road_path), ["SHAPESTLength"]
+        )
+        # only the latest version of each file is worth keeping
+        summary["roads"] = {
+            old_key: length
+            for old_key, length in summary["roads"].items()
+            if not old_key.startswith(f"{road_path}:")
+        }
+        summary["roads"][key] = float(
+            road_data["SHAPESTLength"].astype(float).sum()
+        )
+        _save_summary(summary, summary_path)
+    return summary["roads"][key]
+
+
+def _fingerprint(frame):
+    """
+    Hashes the content of a DataFrame.
+
+    Parameters:
+        frame (pandas.DataFrame): The DataFrame to hash.
+
+    Returns:
+        str: A hex digest that changes when any value changes.
+    """
+    hashes = pd.util.hash_pandas_object(frame, index=False)
+    digest = hashlib.sha1(hashes.to_numpy().tobytes())
+    digest.update(",".join(frame.columns).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _lane_key(frame, columns):
+    """
+    Returns the summary key of the lane lengths of a table. A table exactly
+    as helpers.load_records read it from a Parquet file is keyed by that
+    file. Every other table is hashed, including copies and edits of a
+    loaded table, which inherit its attrs.
+
+    Parameters:
+        frame (pandas.DataFrame): DataFrame containing bike lane data.
+        columns (list): The columns the lengths are computed from.
+
+    Returns:
+        str: The key of the lengths in the summary.
+    """
+    if frame.attrs.get("source_id") == id(frame):
+        return f"{frame.attrs['source']}:{','.join(columns)}"
+    return _fingerprint(frame[columns])
+
+
+def lane_lengths(bike_lane_df, by=("ExisFacil",), summary_path=None):
+    """
+    Returns the total length of bike lanes grouped by the given columns.
+    The table is not hashed if it is a frame helpers.load_records read
+    whole from a Parquet file.
+
+    Parameters:
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        by (tuple): The columns to group by, e.g. ("ExisFacil", "InstallDat")
+        for length per facility type and install year.
+        summary_path (str): The path of the summary file, defaults to
+        SUMMARY_PATH.
+
+    Returns:
+        pandas.Series: The sum of Shape_Leng for each group, named
+        "Shape_Leng" and indexed by the columns in by.
+    """
+    columns = [*by, "Shape_Leng"]
+    key = _lane_key(bike_lane_df, columns)
+    summary_path = summary_path or SUMMARY_PATH
+    summary = _load_summary(summary_path)
+    if key not in summary["lanes"]:
+        for old_key in list(summary["lanes"])[: 1 - MAX_LANE_SUMMARIES]:
+            del summary["lanes"][old_key]
+        lengths = (
+            bike_lane_df[columns]
+            .astype({"Shape_Leng": float})
+            .groupby(list(by), observed=True)["Shape_Leng"]
+            .sum()
+        )
+        summary["lanes"][key] = json.loads(
+            lengths.reset_index().to_json(orient="records")
+        )
+        _save_summary(summary, summary_path)
+    return pd.DataFrame(summary["lanes"][key], columns=columns).set_index(
+        list(by)
+    )["Shape_Leng"]
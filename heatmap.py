@@ -7,31 +7,48 @@ overlaying GeoJson data, generating heat maps, and adding street data layers.
 Dependencies:
     Folium: A Python wrapper for Leaflet.js mapping library.
     Pandas: A powerful data manipulation library.
+    NumPy: Library for array operations.
     Geopandas: Extends pandas to allow spatial operations on geometric types.
     Folium.plugins.HeatMap: Plugin for creating heatmaps in Folium.
+    artifacts: Module for loading GeoJSON layers simplified per zoom level.
+    crash_store: Module for the compact in-memory crash table.
+    tracing: Module for timing the stages of the pipeline.
 
 Functions:
     get_map(path, lat, lon, zoom): Generates a Folium map centered at the
     specified latitude and longitude with the given zoom level, and overlays a
     GeoJson file onto the map.
 
-    get_heat_map(data: pd.DataFrame, m): Generates a heat map layer based on
-    geographical data.
+    heat_points(data: pd.DataFrame): Extracts the coordinates of the
+    located rows of a DataFrame as a NumPy array.
+
+    bin_points(points, cell_size=BIN_SIZE): Aggregates points into a square
+    grid, returning one weighted point per occupied cell.
+
+    get_heat_map(data: pd.DataFrame, m, cell_size=None): Generates a heat map
+    layer based on geographical data.
 
     get_street_data(path, m): Retrieves street data from a GeoJSON file and
     adds it as a GeoJson layer to a folium.Map.
 """
 
 import folium
+import numpy as np
 import pandas as pd
 from folium.plugins import HeatMap
-import geopandas as gpd
+import artifacts
+from crash_store import CrashStore
+import tracing
+
+# about 110 m north-south, 80 m east-west at Boston's latitude
+BIN_SIZE = 0.001
 
 
 def get_map(path, lat, lon, zoom):
     """
     Generates a Folium map centered at the specified latitude and longitude with
-    the given zoom level, and overlays a GeoJson file onto the map.
+    the given zoom level, and overlays a GeoJson file onto the map. The file
+    is simplified for the zoom level, see artifacts.prepare_layer.
 
     Parameters:
         path (str): The file path to the GeoJson data.
@@ -45,11 +62,75 @@ def get_map(path, lat, lon, zoom):
     folium_map = folium.Map(
         location=[lat, lon], zoom_start=zoom, tiles="CartoDB positron"
     )
-    folium.GeoJson(path, name="boston").add_to(folium_map)
+    layer = artifacts.prepare_layer(path, zoom)
+    folium.GeoJson(layer, name="boston").add_to(folium_map)
     return folium_map
 
 
-def get_heat_map(data: pd.DataFrame, folium_map):
+def heat_points(data: pd.DataFrame):
+    """
+    Extracts the coordinates of the located rows of a DataFrame.
+
+    Parameters:
+        data (pd.DataFrame): A pandas DataFrame containing latitude and
+        longitude coordinates in lat and long columns, or a CrashStore.
+
+    Returns:
+        numpy.ndarray: An (n, 2) array of [lat, long] rows, leaving out rows
+        whose coordinates are missing or not numbers.
+    """
+    if isinstance(data, CrashStore):
+        return data.located()
+    points = (
+        data[["lat", "long"]]
+        .apply(pd.to_numeric, errors="coerce")
+        .to_numpy(dtype=float)
+    )
+    return points[~np.isnan(points).any(axis=1)]
+
+
+def bin_points(points, cell_size=BIN_SIZE):
+    """
+    Aggregates points into a square grid, so a heat map only carries one
+    point per occupied cell instead of every crash.
+
+    Parameters:
+        points (numpy.ndarray): An (n, 2) array of [lat, long] rows.
+        cell_size (float): The side of a grid cell in degrees.
+
+    Returns:
+        numpy.ndarray: An (m, 3) array of [lat, long, weight] rows, one per
+        occupied cell, placed at the cell center and weighted by the share of
+        the busiest cell's points it holds.
+
+    Raises:
+        ValueError: If cell_size is not positive, or so small that the cell
+        numbers do not fit in 64-bit integers.
+    """
+    if not np.isfinite(cell_size) or cell_size <= 0:
+        raise ValueError("cell_size must be a positive number of degrees")
+    cells = np.floor(points / cell_size)
+    if np.abs(cells).max() >= 2**62:
+        raise ValueError(f"cell_size {cell_size} is too small")
+    cells = cells.astype(np.int64)
+    origin = cells.min(axis=0)
+    cells -= origin
+    height, width = (int(extent) + 1 for extent in cells.max(axis=0))
+    if height > np.iinfo(np.int64).max // width:
+        # too many cells for one integer key each, sort the rows instead
+        cells, counts = np.unique(cells, axis=0, return_counts=True)
+    else:
+        # one integer key per cell, much faster to sort than rows of an array
+        keys, counts = np.unique(
+            cells[:, 0] * width + cells[:, 1], return_counts=True
+        )
+        cells = np.column_stack(np.divmod(keys, width))
+    centers = (cells + origin + 0.5) * cell_size
+    return np.column_stack([centers, counts / counts.max()])
+
+
+@tracing.traced
+def get_heat_map(data: pd.DataFrame, folium_map, cell_size=None):
     """
     Generates a heat map layer based on geographical data.
 
@@ -58,13 +139,18 @@ def get_heat_map(data: pd.DataFrame, folium_map):
         longitude coordinates.
         m (folium.Map): An instance of folium.Map to which the heat map layer
         will be added.
+        cell_size (float): If given, points are first binned into a grid
+        with cells this many degrees wide, see bin_points, which keeps the
+        map small for long crash histories.
 
     Returns:
         folium.Map: The folium.Map instance with the heat map layer added.
     """
-    points = [(row["lat"], row["long"]) for index, row in data.iterrows()]
+    points = heat_points(data)
+    if cell_size is not None and len(points):
+        points = bin_points(points, cell_size)
     HeatMap(
-        points,
+        points.tolist(),
         radius=15,
         opacity=0.6,
         blur=7,
@@ -74,10 +160,12 @@ def get_heat_map(data: pd.DataFrame, folium_map):
     return folium_map
 
 
+@tracing.traced
 def get_street_data(path, folium_map):
     """
     Retrieves street data from a GeoJSON file and adds it as a GeoJson layer to
-    a folium.Map.
+    a folium.Map. The file is simplified for the zoom level of the map, see
+    artifacts.prepare_layer.
 
     Parameters:
         path (str): The file path to the GeoJSON file containing street data.
@@ -87,7 +175,7 @@ def get_street_data(path, folium_map):
     Returns:
         folium.Map: The folium.Map instance with the street data layer added.
     """
-    street_data = gpd.read_file(path)
+    street_data = artifacts.prepare_layer(path, folium_map.options["zoom"])
 
     folium.GeoJson(
         street_data,
@@ -2,29 +2,62 @@
 Module for handling data retrieval and manipulation.
 
 This module provides functions to pull data from a specified URL, save it as
-JSON, load data from a JSON file, and retrieve filtered bike data from a
-specified URL.
+JSON, page through a CKAN datastore resource into a newline-delimited JSON
+file, convert a pulled dataset into a typed Parquet file, load data from a
+JSON or Parquet file, and retrieve filtered bike data from a specified URL.
 
 Dependencies:
     - json: Module for encoding and decoding JSON data.
+    - os: Module for file handling.
+    - shutil: Module for copying file objects.
+    - urllib.parse: Module for building query strings.
     - urllib.request: Module for opening URLs.
     - Pandas: A powerful data manipulation library.
+    - PyArrow: The Parquet engine used by pandas, also read in batches.
+    - tracing: Module for timing the stages of the pipeline.
 
 Functions:
     - pull_data(url, data_name="data"): Pulls data from a specified URL and
     saves it as a JSON file.
+    - iter_pages(resource_id, offset=0, page_size=PAGE_SIZE,
+    base_url=None): Yields the records of a CKAN resource one page
+    at a time.
+    - pull_records(resource_id, data_name, page_size=PAGE_SIZE,
+    base_url=None): Streams every record of a CKAN resource to a
+    newline-delimited JSON file, resuming a partial download.
     - load_data(path): Loads data from a specified path and returns it as a
     pandas DataFrame.
-    - get_bike_data(path): Retrieves bike data from a specified URL, filters
-    records for mode type 'bike', and returns the filtered data as a pandas
-    DataFrame.
+    - ingest_data(path): Converts a pulled dataset into a typed, columnar
+    Parquet file once and returns its name.
+    - load_records(path, columns=None, filters=None): Loads the records of a
+    pulled dataset as a pandas DataFrame.
+    - iter_bike_chunks(path, chunk_size=CHUNK_SIZE, columns=None): Yields
+    the bike records of a pulled dataset in chunks of bounded size.
+    - get_bike_data(path, columns=None): Retrieves bike data from a specified
+    URL, filters records for mode type 'bike', and returns the filtered data
+    as a pandas DataFrame.
 """
 
 import json
+import os
+import shutil
+import urllib.parse
 import urllib.request
 import pandas as pd
+import pyarrow.parquet as pq
+import tracing
 
+CKAN_SEARCH_URL = "https://data.boston.gov/api/3/action/datastore_search"
+PAGE_SIZE = 32000
+# records held in memory at a time by iter_bike_chunks
+CHUNK_SIZE = 100000
+# columns with a handful of repeated values, stored as pandas categoricals
+CATEGORY_COLUMNS = ("mode_type", "location_type", "ExisFacil")
+# zero-padded digits such as ZIP codes ("02115") are identifiers, not numbers
+ZERO_PADDED = r"[-+]?0\d"
 
+
+@tracing.traced
 def pull_data(url, data_name="data"):
     """
     Pull data from a specified URL and save it as a JSON file.
@@ -36,14 +69,108 @@ def pull_data(url, data_name="data"):
     Returns:
         None
     """
-    # pylint: disable=R1732
-    fileobj = urllib.request.urlopen(url)
-    response_dict = json.loads(fileobj.read())
-    with open(f"data/{data_name}", "w", encoding="utf-8") as file:
-        json.dump(response_dict, file)
+    # copy the response straight to disk instead of holding it in memory
+    with urllib.request.urlopen(url) as fileobj, open(
+        f"data/{data_name}", "wb"
+    ) as file:
+        shutil.copyfileobj(fileobj, file)
+    return data_name
+
+
+def iter_pages(resource_id, offset=0, page_size=PAGE_SIZE, base_url=None):
+    """
+    Yields the records of a CKAN datastore resource one page at a time.
+
+    Records are requested in `_id` order so that an offset always points at
+    the same record, which is what makes resuming a download possible.
+
+    Parameters:
+        resource_id (str): The CKAN resource to page through.
+        offset (int): The number of records to skip before the first page.
+        page_size (int): The number of records requested per page.
+        base_url (str): The datastore_search endpoint, defaults to
+        CKAN_SEARCH_URL.
+
+    Yields:
+        list: The records (dicts) of a single page.
+    """
+    base_url = base_url or CKAN_SEARCH_URL
+    while True:
+        query = urllib.parse.urlencode(
+            {
+                "resource_id": resource_id,
+                "limit": page_size,
+                "offset": offset,
+                "sort": "_id asc",
+            }
+        )
+        with urllib.request.urlopen(f"{base_url}?{query}") as fileobj:
+            result = json.load(fileobj)["result"]
+        records = result["records"]
+        if not records:
+            return
+        yield records
+        offset += len(records)
+        # a short page is not the end, the server may cap limit below page_size
+        if offset >= result.get("total", float("inf")):
+            return
+
+
+def _count_complete_lines(path):
+    """
+    Counts the complete lines of a file, cutting off a trailing partial line
+    left behind by an interrupted download.
+
+    Parameters:
+        path (str): The path of the newline-delimited file.
+
+    Returns:
+        int: The number of complete lines in the file.
+    """
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    end = 0
+    with open(path, "rb") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            count += 1
+            end += len(line)
+    with open(path, "rb+") as file:
+        file.truncate(end)
+    return count
+
+
+def pull_records(resource_id, data_name, page_size=PAGE_SIZE, base_url=None):
+    """
+    Streams every record of a CKAN resource to a newline-delimited JSON file
+    in the data folder, one page at a time.
+
+    Only a single page is held in memory at once. If the file already holds
+    records from an earlier, interrupted call, the download resumes after the
+    last complete record instead of starting over.
+
+    Parameters:
+        resource_id (str): The CKAN resource to download.
+        data_name (str): The name of the file to be saved, e.g. "crashes.jsonl".
+        page_size (int): The number of records requested per page.
+        base_url (str): The datastore_search endpoint, defaults to
+        CKAN_SEARCH_URL.
+
+    Returns:
+        str: The name of the saved file.
+    """
+    path = f"data/{data_name}"
+    offset = _count_complete_lines(path)
+    with open(path, "a", encoding="utf-8") as file:
+        for records in iter_pages(resource_id, offset, page_size, base_url):
+            file.writelines(json.dumps(record) + "\n" for record in records)
+            file.flush()
     return data_name
 
 
+@tracing.traced(rows=lambda result: len(result["records"]))
 def load_data(path):
     """
     Load data from a specified path and save it as a variable
@@ -57,17 +184,172 @@ def load_data(path):
     return pd.read_json(f"data/{path}")["result"]
 
 
-def get_bike_data(path):
+def _convert_column(column):
+    """
+    Converts a column of CKAN strings to the type its values actually have.
+
+    Parameters:
+        column (pandas.Series): A column as loaded from the JSON.
+
+    Returns:
+        pandas.Series: The column as a categorical, datetime or number if all
+        of its values allow it, otherwise unchanged. Columns with zero-padded
+        values such as ZIP codes stay strings, so no leading zeros are lost.
+    """
+    if column.dtype != object or column.isna().all():
+        return column
+    if column.name in CATEGORY_COLUMNS:
+        return column.astype("category")
+    if column.name.endswith("_ts"):
+        converters = [pd.to_datetime]
+    elif column.astype(str).str.match(ZERO_PADDED).any():
+        converters = []
+    else:
+        # astype parses with Python's exact float parser, unlike to_numeric
+        converters = [
+            lambda col: col.astype(int),
+            lambda col: col.astype(float),
+        ]
+    for converter in converters:
+        try:
+            return converter(column)
+        except (ValueError, TypeError):
+            pass
+    return column
+
+
+@tracing.traced
+def ingest_data(path):
+    """
+    Converts a pulled dataset into a typed, columnar Parquet file next to it.
+    Numeric and timestamp strings are parsed and CATEGORY_COLUMNS become
+    categoricals. The conversion only runs again when the source is newer
+    than the Parquet file.
+
+    Parameters:
+        path (str): The name of a pulled JSON file in the data folder.
+
+    Returns:
+        str: The name of the Parquet file in the data folder.
+    """
+    parquet_path = f"{os.path.splitext(path)[0]}.parquet"
+    source_mtime = os.path.getmtime(f"data/{path}")
+    if (
+        not os.path.exists(f"data/{parquet_path}")
+        or os.path.getmtime(f"data/{parquet_path}") < source_mtime
+    ):
+        records = load_records(path)
+        records = records.apply(_convert_column)
+        records.to_parquet(f"data/{parquet_path}", index=False)
+    return parquet_path
+
+
+def load_records(path, columns=None, filters=None):
+    """
+    Load the records of a pulled dataset as a pandas DataFrame, whether it was
+    saved by pull_data (a CKAN response), by pull_records (one JSON record
+    per line) or by ingest_data (Parquet).
+
+    Parameters:
+        path (str): The name of the file in the data folder
+        columns (list): The columns to load, defaults to all of them. Parquet
+        files only read these columns from disk.
+        filters (list): Filters such as [("mode_type", "==", "bike")] which
+        are pushed down into the Parquet reader. Ignored for JSON files.
+
+    Returns:
+        pandas.DataFrame: One row per record, typed if read from Parquet and
+        with the values left as they were in the JSON otherwise. A whole
+        Parquet file read without filters carries attrs["source"], its name,
+        size and modification time, and attrs["source_id"], the id of the
+        returned frame. pandas copies attrs to derived frames, so summaries
+        only use the source as a key for the frame with that id.
+    """
+    if path.endswith(".parquet"):
+        records = pd.read_parquet(
+            f"data/{path}", columns=columns, filters=filters
+        )
+        if filters is None:
+            stat = os.stat(f"data/{path}")
+            records.attrs["source"] = (
+                f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+            )
+            records.attrs["source_id"] = id(records)
+        return records
+    if path.endswith(".jsonl"):
+        records = pd.read_json(
+            f"data/{path}", lines=True, dtype=False, convert_dates=False
+        )
+        return records if columns is None else records[columns]
+    records = pd.DataFrame(load_data(path)["records"])
+    return records if columns is None else records[columns]
+
+
+def iter_bike_chunks(path, chunk_size=CHUNK_SIZE, columns=None):
+    """
+    Yields the bike records of a pulled dataset in chunks, so a table larger
+    than memory can be processed one chunk at a time. Parquet and
+    newline-delimited JSON files are read chunk by chunk; a CKAN response
+    saved by pull_data has to be loaded whole first.
+
+    Parameters:
+        path (str): The name of the file in the data folder.
+        chunk_size (int): The number of records read at a time. Chunks hold
+        at most this many rows, fewer once non-bike records are dropped.
+        columns (list): The columns to keep, defaults to all of them.
+
+    Yields:
+        pandas.DataFrame: The bike records of one chunk, with the column
+        types load_records gives the whole file: typed for Parquet files
+        written by ingest_data, and with the values left as they were in the
+        JSON otherwise.
+    """
+    if columns is not None and "mode_type" not in columns:
+        columns = [*columns, "mode_type"]
+    if path.endswith(".parquet"):
+        batches = (
+            batch.to_pandas()
+            for batch in pq.ParquetFile(f"data/{path}").iter_batches(
+                batch_size=chunk_size, columns=columns
+            )
+        )
+    elif path.endswith(".jsonl"):
+        batches = pd.read_json(
+            f"data/{path}",
+            lines=True,
+            dtype=False,
+            convert_dates=False,
+            chunksize=chunk_size,
+        )
+    else:
+        records = load_records(path)
+        batches = (
+            records.iloc[start : start + chunk_size]
+            for start in range(0, len(records), chunk_size)
+        )
+    for batch in batches:
+        if columns is not None:
+            batch = batch[columns]
+        yield batch[batch["mode_type"] == "bike"].reset_index(drop=True)
+
+
+@tracing.traced(rows=len)
+def get_bike_data(path, columns=None):
     """
     Retrieves bike data from a specified URL, filters records for mode type
     'bike', and returns the filtered data as a pandas DataFrame.
 
     Parameters:
         URL (str): The URL from which to pull the data.
+        columns (list): The columns to keep, defaults to all of them.
 
     Returns:
         pandas.DataFrame: DataFrame containing filtered bike data.
     """
-    bike_data = pd.DataFrame(load_data(path)["records"])
+    if columns is not None and "mode_type" not in columns:
+        columns = [*columns, "mode_type"]
+    bike_data = load_records(
+        path, columns, filters=[("mode_type", "==", "bike")]
+    )
     bike_data = bike_data[bike_data["mode_type"] == "bike"].reset_index()
     return bike_data
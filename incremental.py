@@ -0,0 +1,231 @@
+"""
+Module for keeping the crash counts by lane type up to date incrementally.
+
+Only a handful of crashes are added to the Vision Zero table each day, so
+instead of pulling and classifying the whole table on every run, the counts
+of organize_by_lane are persisted together with a high-water mark, the
+largest crash `_id` seen so far. An update fetches the records after the
+mark, classifies only those against the lane index and adds their counts to
+the persisted ones. New records are selected with `_id > mark` through
+datastore_search_sql rather than with the mark as an offset, since `_id` can
+have gaps after records are deleted or the table is reloaded.
+
+The counts are only valid for one bike network, so they are recomputed from
+scratch when the lane network file changes.
+
+Dependencies:
+    - json: Module for reading and writing the state file.
+    - os: Module for file handling.
+    - urllib.parse: Module for parsing datastore URLs and building queries.
+    - urllib.request: Module for opening URLs.
+    - Pandas: A powerful data manipulation library.
+    - accidents_by_lane: Module classifying crashes by lane type.
+    - artifacts: Module for hashing the bike network.
+    - cache: Module for the cached lane table.
+    - helpers: Module for the datastore endpoint and loading records.
+    - lane_index: Module holding the default bike network path.
+
+Functions:
+    - iter_new_pages(resource_id, high_water_mark,
+    page_size=helpers.PAGE_SIZE, base_url=None): Yields the records after a
+    high-water mark one page at a time.
+    - load_state(state_path=STATE_PATH): Loads the persisted counts.
+    - merge_counts(lane_type_dict, delta_dict): Adds two count dictionaries.
+    - update_lane_counts(bike_lane_df, resource_id=ACCIDENTS_RESOURCE_ID,
+    state_path=STATE_PATH, lane_path=BIKE_NETWORK_PATH, base_url=None):
+    Classifies the crashes added since the last run and returns the updated
+    counts.
+    - visualize_data(bike_accidents_url, bike_lane_url,
+    state_path=STATE_PATH): Like accidents_by_lane.visualize_data, with the
+    counts updated incrementally.
+"""
+
+import json
+import os
+import urllib.parse
+import urllib.request
+import pandas as pd
+import accidents_by_lane
+import artifacts
+import cache
+import helpers
+import lane_index
+
+STATE_PATH = "data/incremental_state.json"
+ACCIDENTS_RESOURCE_ID = "e4bfe397-6bfc-49c5-9367-c879fac7401d"
+
+
+def iter_new_pages(
+    resource_id, high_water_mark, page_size=helpers.PAGE_SIZE, base_url=None
+):
+    """
+    Yields the records of a CKAN resource whose `_id` is above a high-water
+    mark, one page at a time in `_id` order. Each page starts after the
+    largest `_id` of the page before, so gaps in `_id` never skip records.
+
+    Parameters:
+        resource_id (str): The CKAN resource to page through.
+        high_water_mark (int): The largest `_id` already seen.
+        page_size (int): The number of records requested per page.
+        base_url (str): The datastore_search endpoint, defaults to
+        helpers.CKAN_SEARCH_URL. Queries go to the datastore_search_sql
+        action next to it.
+
+    Yields:
+        list: The records (dicts) of a single page.
+    """
+    sql_url = f"{base_url or helpers.CKAN_SEARCH_URL}_sql"
+    while True:
+        sql = (
+            f'SELECT * FROM "{resource_id}" WHERE _id > {int(high_water_mark)}'
+            f" ORDER BY _id LIMIT {int(page_size)}"
+        )
+        query = urllib.parse.urlencode({"sql": sql})
+        with urllib.request.urlopen(f"{sql_url}?{query}") as fileobj:
+            records = json.load(fileobj)["result"]["records"]
+        if not records:
+            return
+        for record in records:
+            record.pop("_full_text", None)
+        yield records
+        high_water_mark = max(record["_id"] for record in records)
+
+
+def load_state(state_path=STATE_PATH):
+    """
+    Loads the persisted counts.
+
+    Parameters:
+        state_path (str): The path of the state file.
+
+    Returns:
+        dict: The high-water mark ("high_water_mark"), the hash of the bike
+        network the counts belong to ("lane_hash") and the counts
+        ("lane_type_dict"). Empty counts if there is no state yet.
+    """
+    try:
+        with open(state_path, encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"high_water_mark": 0, "lane_hash": None, "lane_type_dict": {}}
+
+
+def _save_state(state, state_path):
+    """
+    Saves the counts, replacing the old state file atomically.
+
+    Parameters:
+        state (dict): The state, see load_state.
+        state_path (str): The path of the state file.
+
+    Returns:
+        None
+    """
+    with open(f"{state_path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=1)
+    os.replace(f"{state_path}.tmp", state_path)
+
+
+def merge_counts(lane_type_dict, delta_dict):
+    """
+    Adds two dictionaries of accident counts by lane type.
+
+    Parameters:
+        lane_type_dict (dict): The counts so far.
+        delta_dict (dict): The counts of newly classified crashes.
+
+    Returns:
+        dict: The summed counts as plain numbers for the state file, ints
+        where they are whole and floats where crashes were split between
+        lane types, e.g. by organize_by_lane's intersection_index.
+    """
+    merged = dict(lane_type_dict)
+    for key, count in delta_dict.items():
+        merged[key] = merged.get(key, 0) + count
+    return {
+        key: int(count) if float(count).is_integer() else float(count)
+        for key, count in merged.items()
+    }
+
+
+def update_lane_counts(
+    bike_lane_df,
+    resource_id=ACCIDENTS_RESOURCE_ID,
+    state_path=STATE_PATH,
+    lane_path=lane_index.BIKE_NETWORK_PATH,
+    base_url=None,
+):
+    """
+    Classifies the crashes added since the last run and adds them to the
+    persisted counts.
+
+    Parameters:
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        resource_id (str): The CKAN resource of the crash table.
+        state_path (str): The path of the state file.
+        lane_path (str): The bike network GeoJSON file to match against.
+        base_url (str): The datastore_search endpoint, defaults to
+        helpers.CKAN_SEARCH_URL.
+
+    Returns:
+        dict: The accident counts by lane type over every crash seen so far,
+        like organize_by_lane.
+    """
+    state = load_state(state_path)
+    lane_hash = artifacts.layer_hash(lane_path)
+    if state["lane_hash"] != lane_hash:
+        state = {"high_water_mark": 0, "lane_hash": lane_hash}
+        state["lane_type_dict"] = {"intersection": 0, "none": 0, "other": 0}
+    high_water_mark = state["high_water_mark"]
+    records = [
+        record
+        for page in iter_new_pages(
+            resource_id, high_water_mark, base_url=base_url
+        )
+        for record in page
+    ]
+    if records:
+        new_crashes = pd.DataFrame(records)
+        bike_crashes = new_crashes[
+            new_crashes["mode_type"] == "bike"
+        ].reset_index()
+        delta_dict = accidents_by_lane.organize_by_lane(
+            bike_crashes, bike_lane_df.copy(), lane_path=lane_path
+        )
+        state["lane_type_dict"] = merge_counts(
+            state["lane_type_dict"], delta_dict
+        )
+        state["high_water_mark"] = int(new_crashes["_id"].max())
+    _save_state(state, state_path)
+    return dict(state["lane_type_dict"])
+
+
+def visualize_data(bike_accidents_url, bike_lane_url, state_path=STATE_PATH):
+    """
+    Creates the two bar graphs of accidents_by_lane.visualize_data, only
+    classifying the crashes added since the last run.
+
+    Parameters:
+        bike_accidents_url: The url of the bike accident data, only its
+        resource_id is used.
+        bike_lane_url: The url to load bike lane data from api.
+        state_path (str): The path of the state file.
+
+    Returns:
+        None
+    """
+    query = urllib.parse.parse_qs(
+        urllib.parse.urlsplit(bike_accidents_url).query
+    )
+    bike_lane_df = helpers.load_records(
+        helpers.ingest_data(cache.pull_cached(bike_lane_url))
+    )
+    lane_type_dict = update_lane_counts(
+        bike_lane_df, query["resource_id"][0], state_path
+    )
+    lane_distr_dict, accident_percent_dict = accidents_by_lane.normalize_data(
+        lane_type_dict, bike_lane_df
+    )
+    accidents_by_lane.plot_data(
+        lane_type_dict, lane_distr_dict, accident_percent_dict
+    )
@@ -0,0 +1,208 @@
+"""
+Module for attributing intersection crashes to the bike lanes that meet there.
+
+Crash records at an intersection name the two streets that cross in street
+and xstreet1 (or xstreet2), but have no lane type. This module finds the
+nodes where segments of different streets end at the same point, in the
+bike network and optionally in the street segments, and keys each node by
+the pair of its canonical street names. Every intersection crash is then
+classified with one dict lookup instead of a geometric search.
+
+Dependencies:
+    - collections.namedtuple: Factory for the Intersection tuple.
+    - functools: Module for keeping loaded indexes in memory.
+    - itertools: Module for the street pairs of a node.
+    - Geopandas: Extends pandas to allow spatial operations on geometric types.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+    - Shapely: Library for geometric objects.
+    - artifacts: Module for loading compiled GeoJSON layers.
+    - lane_index: Module with the bike network path and metric CRS.
+    - streets: Module for normalizing street names.
+
+Functions:
+    - build_intersection_index(bike_lanes, street_segments=None,
+    name_column="STREET_NAM"): Maps street pairs to the node where they meet
+    and the lane types there.
+    - load_intersection_index(lane_path=BIKE_NETWORK_PATH, street_path=None,
+    name_column="STREET_NAM"): Loads an intersection index from GeoJSON
+    files, once per process.
+    - intersection_facilities(crash_df, index): Looks up the lane types at
+    the intersection of each crash.
+"""
+
+import functools
+import itertools
+from collections import namedtuple
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+import artifacts
+import lane_index
+import streets
+
+# endpoints closer than this many meters are taken as the same node
+SNAP_DISTANCE = 1.0
+
+Intersection = namedtuple("Intersection", ["lat", "lon", "facilities"])
+Intersection.__doc__ = """
+A node where two streets meet, with the lane types (ExisFacil) of the bike
+lanes ending there as a frozenset.
+"""
+
+
+def _endpoints(layer, name_column, facility_column=None):
+    """
+    Returns the first and last point of every line in a layer.
+
+    Parameters:
+        layer (geopandas.GeoDataFrame): Line features with street names.
+        name_column (str): The column holding the street names.
+        facility_column (str): The column holding the lane types, if any.
+
+    Returns:
+        pandas.DataFrame: One row per endpoint with its snapped node key (x,
+        y), lat, lon, canonical street name and lane type (None if unknown).
+    """
+    lines = layer[layer.geometry.notna()].explode(index_parts=False)
+    lines = lines[lines.geom_type == "LineString"]
+    geometries = lines.geometry.values
+    points = gpd.GeoSeries(
+        np.concatenate(
+            [
+                shapely.get_point(geometries, 0),
+                shapely.get_point(geometries, -1),
+            ]
+        ),
+        crs=layer.crs,
+    ).to_crs("EPSG:4326")
+    projected = points.to_crs(lane_index.LANE_CRS)
+    names = streets.canonicalize_streets(lines[name_column]).to_numpy()
+    if facility_column is None:
+        facilities = np.full(len(lines), None, dtype=object)
+    else:
+        facilities = lines[facility_column].astype(object).to_numpy()
+    return pd.DataFrame(
+        {
+            "x": np.round(projected.x.to_numpy() / SNAP_DISTANCE),
+            "y": np.round(projected.y.to_numpy() / SNAP_DISTANCE),
+            "lat": points.y.to_numpy(),
+            "lon": points.x.to_numpy(),
+            "street": np.tile(names, 2),
+            "facility": np.tile(facilities, 2),
+        }
+    )
+
+
+def build_intersection_index(
+    bike_lanes, street_segments=None, name_column="STREET_NAM"
+):
+    """
+    Maps each pair of streets meeting at a node to the node and the lane
+    types of the bike lanes ending there.
+
+    Parameters:
+        bike_lanes (geopandas.GeoDataFrame): Bike lane segments with
+        STREET_NAM and ExisFacil columns.
+        street_segments (geopandas.GeoDataFrame): Street segments, to also
+        find where bike lanes meet streets without a bike lane.
+        name_column (str): The street name column of street_segments.
+
+    Returns:
+        dict: Maps frozensets of two canonical street names to an
+        Intersection. Streets meeting at several nodes keep the first node
+        and the lane types of all of them.
+    """
+    endpoints = [_endpoints(bike_lanes, "STREET_NAM", "ExisFacil")]
+    if street_segments is not None:
+        endpoints.append(_endpoints(street_segments, name_column))
+    endpoints = pd.concat(endpoints, ignore_index=True).dropna(
+        subset=["street"]
+    )
+    # only nodes where at least two different streets end
+    crossing = endpoints.groupby(["x", "y"])["street"].transform("nunique") >= 2
+    nodes = (
+        endpoints[crossing]
+        .groupby(["x", "y"], sort=False)
+        .agg(
+            lat=("lat", "first"),
+            lon=("lon", "first"),
+            streets=("street", lambda names: sorted(set(names))),
+            facilities=("facility", lambda types: set(types.dropna())),
+        )
+    )
+    index = {}
+    for node in nodes.itertuples(index=False):
+        for pair in itertools.combinations(node.streets, 2):
+            key = frozenset(pair)
+            if key in index:
+                index[key] = index[key]._replace(
+                    facilities=index[key].facilities | node.facilities
+                )
+            else:
+                index[key] = Intersection(
+                    node.lat, node.lon, frozenset(node.facilities)
+                )
+    return index
+
+
+@functools.lru_cache(maxsize=8)
+def load_intersection_index(
+    lane_path=lane_index.BIKE_NETWORK_PATH,
+    street_path=None,
+    name_column="STREET_NAM",
+):
+    """
+    Loads an intersection index from GeoJSON files through their compiled
+    artifacts. The index is kept in memory, so later calls in the same
+    process cost nothing.
+
+    Parameters:
+        lane_path (str): The path of the bike network GeoJSON file.
+        street_path (str): The path of a street segments GeoJSON file, if
+        any.
+        name_column (str): The street name column of the street segments.
+
+    Returns:
+        dict: The index, see build_intersection_index.
+    """
+    street_segments = None
+    if street_path is not None:
+        street_segments = artifacts.load_layer(street_path)
+    return build_intersection_index(
+        artifacts.load_layer(lane_path), street_segments, name_column
+    )
+
+
+def intersection_facilities(crash_df, index):
+    """
+    Looks up the lane types at the intersection of each crash, trying the
+    street with xstreet1 and then with xstreet2.
+
+    Parameters:
+        crash_df (pandas.DataFrame): Crashes with street, xstreet1 and
+        xstreet2 columns.
+        index (dict): The index from build_intersection_index.
+
+    Returns:
+        pandas.Series: A frozenset of lane types for each crash, indexed like
+        crash_df. It is empty where the intersection is not in the index or
+        has no bike lane.
+    """
+    street, first, second = (
+        streets.canonicalize_streets(crash_df[column]).to_numpy()
+        for column in ("street", "xstreet1", "xstreet2")
+    )
+    none = Intersection(None, None, frozenset())
+    return pd.Series(
+        [
+            index.get(
+                frozenset((name, cross)),
+                index.get(frozenset((name, other)), none),
+            ).facilities
+            for name, cross, other in zip(street, first, second)
+        ],
+        index=crash_df.index,
+        dtype=object,
+    )
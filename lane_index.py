@@ -0,0 +1,268 @@
+"""
+Module for matching crashes to the bike lane segments they happened on.
+
+The bike network is projected once into a metric coordinate system for
+Massachusetts and kept in a persistent STRtree. Each crash is matched to the
+nearest lane segment within a distance threshold in meters, which replaces
+buffering every crash point by a fixed number of degrees (an ellipse rather
+than a circle at Boston's latitude) and rebuilding a spatial index on every
+run.
+
+Dependencies:
+    - collections.namedtuple: Factory for the LaneIndex tuple.
+    - concurrent.futures: Module for the process pool of parallel matching.
+    - functools: Module for keeping loaded indexes in memory.
+    - artifacts: Module for loading compiled GeoJSON layers.
+    - Geopandas: Extends pandas to allow spatial operations on geometric types.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+    - Shapely: Library for geometric objects and the STRtree spatial index.
+    - tracing: Module for timing the stages of the pipeline.
+
+Functions:
+    - build_lane_index(bike_lanes): Projects a bike network and builds its
+    spatial index.
+    - load_lane_index(path=BIKE_NETWORK_PATH): Loads a bike network GeoJSON
+    file into a LaneIndex, once per process.
+    - crash_points(crash_df): Converts crash coordinates into projected
+    points.
+    - match_crashes(crash_df, index, max_distance=MATCH_DISTANCE): Finds the
+    nearest lane segment and its distance for each crash.
+    - match_crashes_parallel(crash_df, index, max_distance=MATCH_DISTANCE,
+    workers=None, cell_size=PARTITION_SIZE): Matches crashes like
+    match_crashes on a process pool, partitioned by grid cell.
+"""
+
+import functools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely import STRtree
+from shapely.geometry import box
+import artifacts
+import tracing
+
+BIKE_NETWORK_PATH = "data/Existing_Bike_Network_2023.geojson"
+# NAD83 / Massachusetts Mainland, in meters
+LANE_CRS = "EPSG:26986"
+# about the 0.000127 degree buffer the matching used to apply
+MATCH_DISTANCE = 14.0
+# side of the grid cells crashes are partitioned into for parallel matching
+PARTITION_SIZE = 2000.0
+
+LaneIndex = namedtuple("LaneIndex", ["lanes", "tree"])
+LaneIndex.__doc__ = """
+A bike network projected into LANE_CRS together with an STRtree over its
+geometries. Tree positions are row positions in lanes.
+"""
+
+
+def build_lane_index(bike_lanes):
+    """
+    Projects a bike network and builds its spatial index.
+
+    Parameters:
+        bike_lanes (geopandas.GeoDataFrame): Bike lane segments with at least
+        STREET_NAM and ExisFacil columns.
+
+    Returns:
+        LaneIndex: The projected lanes and their STRtree.
+    """
+    lanes = bike_lanes.to_crs(LANE_CRS).reset_index(drop=True)
+    return LaneIndex(lanes, STRtree(lanes.geometry.values))
+
+
+@functools.lru_cache(maxsize=8)
+def load_lane_index(path=BIKE_NETWORK_PATH):
+    """
+    Loads a bike network GeoJSON file into a LaneIndex, reading the layer
+    from its compiled artifact. The index is kept in memory, so later calls
+    in the same process cost nothing.
+
+    Parameters:
+        path (str): The path of the bike network GeoJSON file.
+
+    Returns:
+        LaneIndex: The projected lanes and their STRtree.
+    """
+    return build_lane_index(artifacts.load_layer(path))
+
+
+def crash_points(crash_df):
+    """
+    Converts crash coordinates into points in LANE_CRS. Crashes without
+    coordinates are left out.
+
+    Parameters:
+        crash_df (pandas.DataFrame): Crashes with lat and long columns.
+
+    Returns:
+        geopandas.GeoSeries: The projected points, indexed like crash_df.
+    """
+    lat = pd.to_numeric(crash_df["lat"], errors="coerce")
+    long = pd.to_numeric(crash_df["long"], errors="coerce")
+    located = lat.notna() & long.notna()
+    return gpd.GeoSeries(
+        gpd.points_from_xy(long[located], lat[located]),
+        index=crash_df.index[located],
+        crs="EPSG:4326",
+    ).to_crs(LANE_CRS)
+
+
+def _nearest_lanes(points, lanes, tree, max_distance):
+    """
+    Finds the nearest lane for each point. Ties go to the lane with the
+    lowest position, so the result does not depend on how the tree was built.
+
+    Parameters:
+        points (geopandas.GeoSeries): Projected crash points.
+        lanes (geopandas.GeoDataFrame): The lanes in the tree, with their
+        position in the full network in a "lane" column.
+        tree (shapely.STRtree): The tree over the geometries of lanes.
+        max_distance (float): The largest distance in meters to match at.
+
+    Returns:
+        pandas.DataFrame: The matches, see match_crashes.
+    """
+    (crash_positions, tree_positions), distances = tree.query_nearest(
+        points.values,
+        max_distance=max_distance,
+        return_distance=True,
+        all_matches=True,
+    )
+    lane_positions = lanes["lane"].to_numpy()[tree_positions]
+    order = np.lexsort((lane_positions, crash_positions))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = np.diff(crash_positions[order]) != 0
+    order = order[first]
+    matches = pd.DataFrame(
+        lanes[["STREET_NAM", "ExisFacil", "lane"]].iloc[tree_positions[order]]
+    )
+    matches.index = points.index[crash_positions[order]]
+    matches["distance"] = distances[order]
+    return matches
+
+
+@tracing.traced(rows=len)
+def match_crashes(crash_df, index, max_distance=MATCH_DISTANCE):
+    """
+    Finds the nearest lane segment for each crash, if there is one within
+    max_distance meters.
+
+    Parameters:
+        crash_df (pandas.DataFrame): Crashes with lat and long columns.
+        index (LaneIndex): The bike network to match against.
+        max_distance (float): The largest distance in meters at which a crash
+        still counts as on a lane.
+
+    Returns:
+        pandas.DataFrame: One row per matched crash, indexed like crash_df,
+        with the lane's STREET_NAM and ExisFacil, its row position in
+        index.lanes ("lane") and the distance in meters ("distance").
+    """
+    lanes = index.lanes.assign(lane=np.arange(len(index.lanes)))
+    return _nearest_lanes(
+        crash_points(crash_df), lanes, index.tree, max_distance
+    )
+
+
+def _match_partition(points, lanes, max_distance):
+    """
+    Matches the crashes of one partition against the lanes near it. Runs in
+    a worker process.
+
+    Parameters:
+        points (geopandas.GeoSeries): Projected crash points.
+        lanes (geopandas.GeoDataFrame): The lanes near the points, with their
+        position in the full network in a "lane" column.
+        max_distance (float): The largest distance in meters to match at.
+
+    Returns:
+        pandas.DataFrame: The matches, see match_crashes.
+    """
+    return _nearest_lanes(
+        points, lanes, STRtree(lanes.geometry.values), max_distance
+    )
+
+
+def _partitions(points, lanes, tree, max_distance, cell_size):
+    """
+    Splits crash points into square grid cells and finds the lanes that come
+    within max_distance of each cell.
+
+    Parameters:
+        points (geopandas.GeoSeries): Projected crash points.
+        lanes (geopandas.GeoDataFrame): The full network, with a "lane"
+        column.
+        tree (shapely.STRtree): The tree over the geometries of lanes.
+        max_distance (float): The largest distance in meters to match at.
+        cell_size (float): The side of a grid cell in meters.
+
+    Yields:
+        Tuple (points, lanes): The crash points of a cell and the lanes near
+        it, skipping cells without any lanes nearby.
+    """
+    cells = pd.DataFrame(
+        {
+            "x": np.floor(points.x.to_numpy() / cell_size),
+            "y": np.floor(points.y.to_numpy() / cell_size),
+        }
+    )
+    for (cell_x, cell_y), positions in cells.groupby(
+        ["x", "y"]
+    ).indices.items():
+        near = tree.query(
+            box(
+                cell_x * cell_size - max_distance,
+                cell_y * cell_size - max_distance,
+                (cell_x + 1) * cell_size + max_distance,
+                (cell_y + 1) * cell_size + max_distance,
+            )
+        )
+        if len(near):
+            yield points.iloc[positions], lanes.iloc[np.sort(near)]
+
+
+@tracing.traced(rows=len)
+def match_crashes_parallel(
+    crash_df,
+    index,
+    max_distance=MATCH_DISTANCE,
+    workers=None,
+    cell_size=PARTITION_SIZE,
+):
+    """
+    Matches crashes like match_crashes, with the work spread over a process
+    pool. Crashes are partitioned into square grid cells, and each cell is
+    shipped with only the lanes that come within max_distance of it, so
+    every crash sees the same candidate lanes as in match_crashes and the
+    results are identical.
+
+    Parameters:
+        crash_df (pandas.DataFrame): Crashes with lat and long columns.
+        index (LaneIndex): The bike network to match against.
+        max_distance (float): The largest distance in meters at which a crash
+        still counts as on a lane.
+        workers (int): The number of processes, defaults to the CPU count.
+        cell_size (float): The side of a grid cell in meters.
+
+    Returns:
+        pandas.DataFrame: The matches, see match_crashes.
+    """
+    points = crash_points(crash_df)
+    lanes = index.lanes.assign(lane=np.arange(len(index.lanes)))
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(_match_partition, *partition, max_distance)
+            for partition in _partitions(
+                points, lanes, index.tree, max_distance, cell_size
+            )
+        ]
+        results = [future.result() for future in futures]
+    if not results:
+        return _nearest_lanes(points.iloc[:0], lanes, index.tree, max_distance)
+    matches = pd.concat(results)
+    # back into the order of crash_df, like match_crashes
+    return matches.loc[points.index.intersection(matches.index, sort=False)]
@@ -0,0 +1,190 @@
+"""
+Module for confidence intervals on accidents by lane type.
+
+normalize_data gives the share of accidents of each lane type as a single
+number, although some lane types only have a few dozen crashes. This module
+puts intervals around those numbers. Shares are bootstrapped: resampling the
+crashes with replacement only changes how many fall into each lane type, so
+every resample is one multinomial draw, and all resamples are drawn as one
+array instead of re-running organize_by_lane. This needs whole crash counts,
+so intersection-weighted counts are rejected. Accidents per lane-kilometer
+get Poisson intervals from Byar's approximation.
+
+Dependencies:
+    - concurrent.futures: Module for the process pool.
+    - statistics.NormalDist: The normal quantiles of the Poisson intervals.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+    - exposure: Module for the memoized lane lengths.
+    - metrics: Module with the meters-to-kilometer conversion.
+
+Functions:
+    - assignment_counts(assignments): Counts a crash-to-lane-type
+    assignment vector.
+    - bootstrap_shares(lane_type_dict, n_resamples=N_RESAMPLES,
+    confidence=0.95, seed=None, workers=None): Bootstraps the percent of
+    accidents of each lane type.
+    - poisson_interval(counts, confidence=0.95): Returns Byar's interval for
+    Poisson counts.
+    - rate_intervals(lane_type_dict, bike_lane_df, confidence=0.95): Returns
+    accidents per lane-kilometer of each lane type with intervals.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import exposure
+from metrics import METERS_PER_KILOMETER
+
+N_RESAMPLES = 10000
+
+
+def assignment_counts(assignments):
+    """
+    Counts a crash-to-lane-type assignment vector, e.g. the ExisFacil column
+    of find_street_accidents' matches or service.classify_crashes.
+
+    Parameters:
+        assignments (array-like): The lane type of each crash, missing for
+        crashes without one.
+
+    Returns:
+        dict: The number of crashes of each lane type, like organize_by_lane.
+    """
+    return pd.Series(assignments).value_counts().to_dict()
+
+
+def _resample(counts, n_resamples, seed):
+    """
+    Draws bootstrap resamples of the crash counts.
+
+    Parameters:
+        counts (numpy.ndarray): The number of crashes of each lane type.
+        n_resamples (int): The number of resamples.
+        seed (numpy.random.SeedSequence): The seed of this batch.
+
+    Returns:
+        numpy.ndarray: An (n_resamples, lane types) array of the percent of
+        crashes of each lane type in each resample.
+    """
+    total = counts.sum()
+    draws = np.random.default_rng(seed).multinomial(
+        total, counts / total, size=n_resamples
+    )
+    return draws * (100 / total)
+
+
+def bootstrap_shares(
+    lane_type_dict,
+    n_resamples=N_RESAMPLES,
+    confidence=0.95,
+    seed=None,
+    workers=None,
+):
+    """
+    Bootstraps the percent of accidents of each lane type, the
+    accident_percent_dict of normalize_data, with percentile intervals.
+
+    Parameters:
+        lane_type_dict (dict): Dictionary with accident counts by lane type.
+        n_resamples (int): The number of bootstrap resamples.
+        confidence (float): The coverage of the intervals.
+        seed (int): The seed of the resamples, for reproducible intervals.
+        workers (int): If given, split the resamples over this many
+        processes. Each batch gets its own child seed, so the result only
+        depends on seed and workers.
+
+    Returns:
+        pandas.DataFrame: One row per lane type with the percent of
+        accidents ("percent") and the interval ("low", "high").
+
+    Raises:
+        ValueError: If there are no crashes to resample, or if a count is
+        not a whole number, e.g. the intersection-weighted counts of
+        organize_by_lane, since a multinomial draw only resamples whole
+        crashes.
+    """
+    counts = np.array(list(lane_type_dict.values()), dtype=float)
+    if (counts < 0).any() or (counts != np.round(counts)).any():
+        raise ValueError(
+            "bootstrap_shares needs whole, non-negative crash counts"
+        )
+    if counts.sum() <= 0:
+        raise ValueError("bootstrap_shares needs at least one crash")
+    if workers is None:
+        shares = _resample(counts, n_resamples, np.random.SeedSequence(seed))
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        sizes = np.diff(np.linspace(0, n_resamples, workers + 1).astype(int))
+        with ProcessPoolExecutor(workers) as executor:
+            shares = np.concatenate(
+                list(
+                    executor.map(
+                        _resample, [counts] * workers, sizes.tolist(), seeds
+                    )
+                )
+            )
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(shares, [tail, 100 - tail], axis=0)
+    return pd.DataFrame(
+        {"percent": counts * (100 / counts.sum()), "low": low, "high": high},
+        index=pd.Index(list(lane_type_dict), name="lane_type"),
+    )
+
+
+def poisson_interval(counts, confidence=0.95):
+    """
+    Returns Byar's approximation of the exact interval for Poisson counts.
+
+    Parameters:
+        counts (array-like): Observed counts.
+        confidence (float): The coverage of the intervals.
+
+    Returns:
+    Tuple (low, high):
+        low (numpy.ndarray): The lower bounds, 0 for a count of 0.
+        high (numpy.ndarray): The upper bounds.
+    """
+    counts = np.asarray(counts, dtype=float)
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        low = counts * (1 - 1 / (9 * counts) - z / (3 * np.sqrt(counts))) ** 3
+    above = counts + 1
+    high = above * (1 - 1 / (9 * above) + z / (3 * np.sqrt(above))) ** 3
+    return np.where(counts > 0, low, 0.0), high
+
+
+def rate_intervals(lane_type_dict, bike_lane_df, confidence=0.95):
+    """
+    Returns accidents per lane-kilometer of each lane type with Poisson
+    intervals, treating the lane length as known.
+
+    Parameters:
+        lane_type_dict (dict): Dictionary with accident counts by lane type.
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        confidence (float): The coverage of the intervals.
+
+    Returns:
+        pandas.DataFrame: One row per lane type with lane length, with the
+        accidents ("count"), lane-kilometers ("km"), accidents per
+        lane-kilometer ("rate") and its interval ("low", "high").
+    """
+    kilometers = exposure.lane_lengths(bike_lane_df) / METERS_PER_KILOMETER
+    kilometers = kilometers[kilometers > 0]
+    counts = np.array(
+        [lane_type_dict.get(lane_type, 0) for lane_type in kilometers.index],
+        dtype=float,
+    )
+    low, high = poisson_interval(counts, confidence)
+    km = kilometers.to_numpy()
+    return pd.DataFrame(
+        {
+            "count": counts,
+            "km": km,
+            "rate": counts / km,
+            "low": low / km,
+            "high": high / km,
+        },
+        index=kilometers.index.rename("lane_type"),
+    )
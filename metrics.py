@@ -0,0 +1,114 @@
+"""
+Module for safety metrics over time.
+
+normalize_data gives a single all-time snapshot. This module buckets the
+crashes matched to bike lanes by month (or week, or any pandas period) and
+lane type, and divides by the length of each lane type to get accidents per
+lane-kilometer for every period. Counting is a single vectorized group-by
+over the matched crashes, and counts for new crashes can be added to
+existing ones, so the time series never has to be recomputed from scratch.
+
+Dependencies:
+    - Pandas: A powerful data manipulation library.
+    - exposure: Module for the memoized lane lengths.
+
+Functions:
+    - count_by_period(crash_df, matches, freq="M", time_column="dispatch_ts"):
+    Counts the matched crashes of each lane type in each period.
+    - merge_period_counts(counts, new_counts): Adds the counts of newly
+    matched crashes to existing counts.
+    - accident_rates(counts, bike_lane_df, window=1): Converts counts into
+    accidents per lane-kilometer, optionally over a rolling window.
+"""
+
+import pandas as pd
+import exposure
+
+# Shape_Leng is measured in meters (Massachusetts State Plane)
+METERS_PER_KILOMETER = 1000.0
+
+
+def count_by_period(crash_df, matches, freq="M", time_column="dispatch_ts"):
+    """
+    Counts the matched crashes of each lane type in each period.
+
+    Parameters:
+        crash_df (pandas.DataFrame): Crashes with a timestamp column.
+        matches (pandas.DataFrame): The lane each crash was matched to,
+        indexed like crash_df, see lane_index.match_crashes and
+        accidents_by_lane.find_street_accidents.
+        freq (str): The pandas period of the buckets, e.g. "M" for months or
+        "W" for weeks.
+        time_column (str): The column holding the crash timestamps.
+
+    Returns:
+        pandas.DataFrame: Crash counts with one row per period, including
+        periods without crashes, and one column per lane type.
+    """
+    periods = pd.to_datetime(
+        crash_df.loc[matches.index, time_column]
+    ).dt.to_period(freq)
+    counts = pd.crosstab(periods.to_numpy(), matches["ExisFacil"].to_numpy())
+    return _fill_periods(counts, freq)
+
+
+def _fill_periods(counts, freq):
+    """
+    Adds zero rows for the periods between the first and last period.
+
+    Parameters:
+        counts (pandas.DataFrame): Counts indexed by period.
+        freq (str): The pandas period of the buckets.
+
+    Returns:
+        pandas.DataFrame: The counts with a row for every period.
+    """
+    counts = counts.rename_axis(index="period", columns="ExisFacil")
+    if counts.empty:
+        return counts
+    full_range = pd.period_range(
+        counts.index.min(), counts.index.max(), freq=freq
+    )
+    return counts.reindex(full_range.rename("period"), fill_value=0)
+
+
+def merge_period_counts(counts, new_counts):
+    """
+    Adds the counts of newly matched crashes to existing counts.
+
+    Parameters:
+        counts (pandas.DataFrame): Counts from count_by_period.
+        new_counts (pandas.DataFrame): Counts of new crashes with the same
+        freq.
+
+    Returns:
+        pandas.DataFrame: The summed counts.
+    """
+    if counts.empty:
+        return new_counts
+    if new_counts.empty:
+        return counts
+    merged = counts.add(new_counts, fill_value=0).fillna(0).astype(int)
+    return _fill_periods(merged, counts.index.freqstr)
+
+
+def accident_rates(counts, bike_lane_df, window=1):
+    """
+    Converts counts into accidents per lane-kilometer of each lane type.
+
+    Parameters:
+        counts (pandas.DataFrame): Counts from count_by_period.
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        window (int): The number of periods to sum over, e.g. 3 for a
+        rolling quarter of monthly counts.
+
+    Returns:
+        pandas.DataFrame: Accidents per lane-kilometer, shaped like counts.
+        Lane types without any lane length are left out.
+    """
+    kilometers = exposure.lane_lengths(bike_lane_df) / METERS_PER_KILOMETER
+    kilometers = kilometers[kilometers > 0]
+    if window > 1:
+        counts = counts.rolling(window, min_periods=1).sum()
+    counts = counts.reindex(columns=kilometers.index, fill_value=0)
+    return counts / kilometers
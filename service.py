@@ -0,0 +1,447 @@
+"""
+Module for serving crash queries from a long-running process.
+
+The crash table and the bike lane index are loaded, and every crash is
+classified by lane type, once when the service starts. Queries are then
+answered from memory over a small HTTP API on an asyncio server, so a
+dashboard does not start a new Python process and reload the data for each
+chart. Answers are kept in a bounded least recently used cache, and every
+endpoint counts its requests, cache hits and latency.
+
+Endpoints, all GET with JSON responses:
+    /counts?bbox=west,south,east,north&start=2023-01-01&end=2024-01-01:
+    Crash counts by lane type, every parameter optional.
+    /nearest?lat=42.35&lon=-71.06&max_distance=14: The nearest bike lane
+    within max_distance meters of a point.
+    /heatmap?bbox=...&start=...&end=...&cell_size=0.001: Heat map points
+    binned into a grid, see heatmap.bin_points.
+    /metrics: Request counts, cache hits and latency of each endpoint.
+
+Dependencies:
+    - asyncio: Module for the HTTP server.
+    - collections.OrderedDict: Ordered dict for the result cache.
+    - json: Module for encoding the responses.
+    - time: Module for timing the requests.
+    - urllib.parse: Module for parsing request targets.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+    - accidents_by_lane: Module for loading and classifying the crashes.
+    - crash_store: Module for the compact in-memory crash table.
+    - heatmap: Module for binning the heat map points.
+    - lane_index: Module for matching points to bike lanes.
+
+Functions:
+    - classify_crashes(bike_accident_df, bike_lane_df, lane_path): Labels
+    each crash with its lane type the way organize_by_lane counts it.
+    - start_server(service, host="127.0.0.1", port=PORT): Starts serving a
+    QueryService over HTTP and returns the server.
+    - serve(service, host="127.0.0.1", port=PORT): Serves a QueryService
+    over HTTP until cancelled.
+    - run(bike_accidents_url, bike_lane_url, host="127.0.0.1", port=PORT):
+    Loads the data and serves it.
+
+Classes:
+    - QueryService: Answers queries about the crashes held in memory.
+"""
+
+import asyncio
+import json
+import time
+import urllib.parse
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import accidents_by_lane
+import heatmap
+import lane_index
+from crash_store import CrashStore
+
+PORT = 8750
+RESULT_CACHE_SIZE = 1024
+MAX_HEADER_BYTES = 16 * 1024
+# heat map cells from about 10 cm to about 100 km wide, in degrees
+MIN_CELL_SIZE = 1e-6
+MAX_CELL_SIZE = 1.0
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found"}
+
+
+def classify_crashes(
+    bike_accident_df, bike_lane_df, lane_path=lane_index.BIKE_NETWORK_PATH
+):
+    """
+    Labels each crash with its lane type the way organize_by_lane counts it:
+    "intersection", "other", "none" for street crashes on streets without a
+    bike lane, or the ExisFacil of the matched lane.
+
+    Parameters:
+        bike_accident_df (pandas.DataFrame): DataFrame with bike accident data.
+        bike_lane_df (pandas.DataFrame): DataFrame containing bike lane data.
+        lane_path (str): The bike network GeoJSON file to match against.
+
+    Returns:
+        pandas.Categorical: The label of each crash, in the order of
+        bike_accident_df. Crashes organize_by_lane does not count, such as
+        street crashes too far from a lane, are missing.
+    """
+    crash_df, bike_lane_df = accidents_by_lane.abbreviate_street_names(
+        bike_accident_df.reset_index(drop=True), bike_lane_df.copy()
+    )
+    location = crash_df["location_type"].astype(object).to_numpy()
+    labels = np.full(len(crash_df), None, dtype=object)
+    labels[location == "Intersection"] = "intersection"
+    labels[location == "Other"] = "other"
+    on_lane_street = (
+        crash_df["street"]
+        .isin(accidents_by_lane.build_street_index(bike_lane_df))
+        .to_numpy()
+    )
+    labels[(location == "Street") & ~on_lane_street] = "none"
+    matches = lane_index.match_crashes(
+        crash_df[(location == "Street") & on_lane_street],
+        lane_index.load_lane_index(lane_path),
+    )
+    labels[matches.index.to_numpy()] = matches["ExisFacil"].astype(object)
+    return pd.Categorical(labels)
+
+
+def _bbox(query):
+    """
+    Parses the bbox parameter of a query.
+
+    Parameters:
+        query (dict): The parsed query string.
+
+    Returns:
+        tuple: (west, south, east, north) in degrees, or None if not given.
+    """
+    if "bbox" not in query:
+        return None
+    bbox = tuple(float(value) for value in query["bbox"].split(","))
+    if len(bbox) != 4:
+        raise ValueError("bbox must be west,south,east,north")
+    return bbox
+
+
+def _time_range(query):
+    """
+    Parses the start and end parameters of a query.
+
+    Parameters:
+        query (dict): The parsed query string.
+
+    Returns:
+        tuple: The start (inclusive) and end (exclusive) as nanoseconds
+        since the epoch, None where not given.
+    """
+    return tuple(
+        pd.Timestamp(query[name]).value if name in query else None
+        for name in ("start", "end")
+    )
+
+
+class QueryService:
+    """
+    Answers queries about the crashes held in memory.
+
+    Attributes:
+        crashes (CrashStore): The crashes.
+        labels (pandas.Categorical): The lane type label of each crash, see
+        classify_crashes.
+        index (LaneIndex): The bike network to find nearest lanes in.
+        cache_size (int): The number of answers kept in the result cache.
+        metrics (dict): Request count, cache hits and latency by endpoint.
+    """
+
+    def __init__(self, crashes, labels, index, cache_size=RESULT_CACHE_SIZE):
+        """
+        Parameters:
+            crashes (CrashStore): The crashes.
+            labels (pandas.Categorical): The label of each crash.
+            index (LaneIndex): The bike network.
+            cache_size (int): The number of answers to cache.
+        """
+        self.crashes = crashes
+        self.labels = labels
+        self.index = index
+        self.cache_size = cache_size
+        self.metrics = {}
+        self._cache = OrderedDict()
+        self._routes = {
+            "/counts": self.counts,
+            "/nearest": self.nearest_lane,
+            "/heatmap": self.heatmap_bins,
+        }
+
+    @classmethod
+    def from_data(
+        cls,
+        bike_accident_df,
+        bike_lane_df,
+        lane_path=lane_index.BIKE_NETWORK_PATH,
+    ):
+        """
+        Builds a service from the crash and bike lane tables.
+
+        Parameters:
+            bike_accident_df (pandas.DataFrame): DataFrame with bike
+            accident data.
+            bike_lane_df (pandas.DataFrame): DataFrame containing bike lane
+            data.
+            lane_path (str): The bike network GeoJSON file to match against.
+
+        Returns:
+            QueryService: The service.
+        """
+        return cls(
+            CrashStore.from_frame(bike_accident_df),
+            classify_crashes(bike_accident_df, bike_lane_df, lane_path),
+            lane_index.load_lane_index(lane_path),
+        )
+
+    def _select(self, bbox=None, start=None, end=None):
+        """
+        Returns which crashes lie in a bbox and time range.
+
+        Parameters:
+            bbox (tuple): (west, south, east, north), or None for anywhere.
+            start (int): The first nanosecond, or None.
+            end (int): The nanosecond after the last, or None.
+
+        Returns:
+            numpy.ndarray: A boolean array.
+        """
+        mask = np.ones(len(self.crashes), dtype=bool)
+        if bbox is not None:
+            lat, lon = self.crashes.coords[:, 0], self.crashes.coords[:, 1]
+            mask &= (lon >= bbox[0]) & (lat >= bbox[1])
+            mask &= (lon <= bbox[2]) & (lat <= bbox[3])
+        if start is not None:
+            mask &= self.crashes.timestamps >= start
+        if end is not None:
+            mask &= self.crashes.timestamps < end
+        return mask
+
+    def counts(self, query):
+        """
+        Counts the crashes of each lane type in a bbox and time range.
+
+        Parameters:
+            query (dict): Optional bbox, start and end parameters.
+
+        Returns:
+            dict: The number of crashes of each lane type.
+        """
+        codes = self.labels.codes[
+            self._select(_bbox(query), *_time_range(query))
+        ]
+        counts = np.bincount(
+            codes[codes >= 0], minlength=len(self.labels.categories)
+        )
+        return dict(zip(self.labels.categories, counts.tolist()))
+
+    def nearest_lane(self, query):
+        """
+        Finds the nearest bike lane to a point.
+
+        Parameters:
+            query (dict): lat and lon parameters, and optionally
+            max_distance in meters.
+
+        Returns:
+            dict: The lane's STREET_NAM, ExisFacil, position in the network
+            and distance in meters, or {"lane": None} if no lane is within
+            max_distance.
+        """
+        point = pd.DataFrame(
+            {"lat": [float(query["lat"])], "long": [float(query["lon"])]}
+        )
+        matches = lane_index.match_crashes(
+            point,
+            self.index,
+            float(query.get("max_distance", lane_index.MATCH_DISTANCE)),
+        )
+        if matches.empty:
+            return {"lane": None}
+        match = matches.iloc[0]
+        return {
+            "STREET_NAM": match["STREET_NAM"],
+            "ExisFacil": match["ExisFacil"],
+            "lane": int(match["lane"]),
+            "distance": float(match["distance"]),
+        }
+
+    def heatmap_bins(self, query):
+        """
+        Bins the crashes in a bbox and time range into heat map points.
+
+        Parameters:
+            query (dict): Optional bbox, start, end and cell_size
+            parameters.
+
+        Returns:
+            dict: The [lat, long, weight] rows under "points".
+
+        Raises:
+            ValueError: If cell_size is outside MIN_CELL_SIZE to
+            MAX_CELL_SIZE.
+        """
+        cell_size = float(query.get("cell_size", heatmap.BIN_SIZE))
+        if not MIN_CELL_SIZE <= cell_size <= MAX_CELL_SIZE:
+            raise ValueError(
+                f"cell_size must be between {MIN_CELL_SIZE} and"
+                f" {MAX_CELL_SIZE} degrees"
+            )
+        crashes = self.crashes.select(
+            self._select(_bbox(query), *_time_range(query))
+        )
+        points = crashes.located()
+        if points.size == 0:
+            return {"points": []}
+        return {"points": heatmap.bin_points(points, cell_size).tolist()}
+
+    def _record(self, path, started, hit):
+        """
+        Adds a request to the metrics of its endpoint.
+
+        Parameters:
+            path (str): The endpoint.
+            started (float): The perf_counter value when the request came in.
+            hit (bool): Whether the answer came from the cache.
+        """
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics = self.metrics.setdefault(
+            path,
+            {"requests": 0, "cache_hits": 0, "total_ms": 0.0, "max_ms": 0.0},
+        )
+        metrics["requests"] += 1
+        metrics["cache_hits"] += hit
+        metrics["total_ms"] += elapsed
+        metrics["max_ms"] = max(metrics["max_ms"], elapsed)
+
+    def handle(self, target):
+        """
+        Answers a request, without any networking.
+
+        Parameters:
+            target (str): The request target, e.g. "/counts?start=2023-01-01".
+
+        Returns:
+        Tuple (status, body):
+            status (int): The HTTP status code.
+            body (dict): The JSON-serializable answer, or an "error" message.
+        """
+        started = time.perf_counter()
+        parts = urllib.parse.urlsplit(target)
+        if parts.path == "/metrics":
+            return 200, self.metrics
+        if parts.path not in self._routes:
+            return 404, {"error": f"unknown endpoint {parts.path}"}
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        key = (parts.path, tuple(sorted(query.items())))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self._record(parts.path, started, True)
+            return 200, self._cache[key]
+        try:
+            body = self._routes[parts.path](query)
+        except (KeyError, ValueError) as error:
+            return 400, {"error": f"bad query: {error}"}
+        self._cache[key] = body
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self._record(parts.path, started, False)
+        return 200, body
+
+
+async def _respond(service, reader, writer):
+    """
+    Answers the requests of one connection, keeping it open between
+    requests unless the client asks to close it.
+
+    Parameters:
+        service (QueryService): The service answering the requests.
+        reader (asyncio.StreamReader): The connection's reader.
+        writer (asyncio.StreamWriter): The connection's writer.
+    """
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                break
+            request_line, *headers = head.decode("latin-1").split("\r\n")
+            method, target = request_line.split(" ")[:2]
+            if method == "GET":
+                status, body = service.handle(target)
+            else:
+                status, body = 400, {"error": "only GET is supported"}
+            payload = json.dumps(body).encode("utf-8")
+            close = any(
+                header.lower() == "connection: close" for header in headers
+            )
+            writer.write(
+                (
+                    f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'close' if close else 'keep-alive'}\r\n"
+                    "\r\n"
+                ).encode("latin-1")
+                + payload
+            )
+            await writer.drain()
+            if close:
+                break
+    finally:
+        writer.close()
+
+
+async def start_server(service, host="127.0.0.1", port=PORT):
+    """
+    Starts serving a QueryService over HTTP.
+
+    Parameters:
+        service (QueryService): The service answering the requests.
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 for any free port.
+
+    Returns:
+        asyncio.Server: The listening server.
+    """
+    return await asyncio.start_server(
+        lambda reader, writer: _respond(service, reader, writer),
+        host,
+        port,
+        limit=MAX_HEADER_BYTES,
+    )
+
+
+async def serve(service, host="127.0.0.1", port=PORT):
+    """
+    Serves a QueryService over HTTP until cancelled.
+
+    Parameters:
+        service (QueryService): The service answering the requests.
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+    """
+    server = await start_server(service, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def run(bike_accidents_url, bike_lane_url, host="127.0.0.1", port=PORT):
+    """
+    Loads the crash and bike lane tables through the cache and serves them.
+
+    Parameters:
+        bike_accidents_url: The url to load bike accident data from api.
+        bike_lane_url: The url to load bike lane data from api.
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+    """
+    bike_accident_df, bike_lane_df = accidents_by_lane.load_data(
+        bike_accidents_url, bike_lane_url
+    )
+    service = QueryService.from_data(bike_accident_df, bike_lane_df)
+    asyncio.run(serve(service, host, port))
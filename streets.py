@@ -0,0 +1,103 @@
+"""
+Module for normalizing street names so the crash and bike lane datasets can be
+matched on them.
+
+Street names are upper-cased, their whitespace collapsed and whole words such
+as "STREET" or "NORTH" abbreviated ("ST", "N"). Street names repeat heavily,
+so a column is normalized once per unique value with vectorized string
+operations and the results are broadcast back to every row.
+
+Dependencies:
+    - functools: Module for memoizing single names.
+    - re: Module for regular expressions.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+
+Functions:
+    - canonical_street(name, upper=True): Normalizes a single street name.
+    - canonicalize_streets(names, upper=True): Normalizes a column of street
+    names, leaving missing values as None.
+"""
+
+import functools
+import re
+import numpy as np
+import pandas as pd
+
+ABBREVIATIONS = {
+    "NORTH": "N",
+    "SOUTH": "S",
+    "EAST": "E",
+    "WEST": "W",
+    "STREET": "ST",
+    "ROAD": "RD",
+    "AVENUE": "AVE",
+    "PARKWAY": "PKWY",
+    "BOULEVARD": "BLVD",
+    "DRIVE": "DR",
+}
+# only whole whitespace-separated words, so "EASTERN" and "STREET." are kept
+ABBREVIATION_PATTERN = re.compile(
+    r"(?<!\S)(" + "|".join(ABBREVIATIONS) + r")(?!\S)"
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _abbreviate(match):
+    """
+    Returns the abbreviation of a matched word.
+
+    Parameters:
+        match (re.Match): A match of ABBREVIATION_PATTERN.
+
+    Returns:
+        str: The abbreviated word.
+    """
+    return ABBREVIATIONS[match.group(0)]
+
+
+@functools.lru_cache(maxsize=65536)
+def canonical_street(name, upper=True):
+    """
+    Normalizes a single street name.
+
+    Parameters:
+        name (str): The street name, e.g. "Massachusetts  Avenue".
+        upper (bool): Whether to upper-case the name first. Only upper-case
+        words are abbreviated.
+
+    Returns:
+        str: The normalized name, e.g. "MASSACHUSETTS AVE".
+    """
+    if upper:
+        name = name.upper()
+    name = " ".join(name.split())
+    return ABBREVIATION_PATTERN.sub(_abbreviate, name)
+
+
+def canonicalize_streets(names, upper=True):
+    """
+    Normalizes a column of street names the same way as canonical_street,
+    working on each unique name only once.
+
+    Parameters:
+        names (pandas.Series): The street names, may contain missing values.
+        upper (bool): Whether to upper-case the names first. Only upper-case
+        words are abbreviated.
+
+    Returns:
+        pandas.Series: The normalized names with the index of names, missing
+        values are None.
+    """
+    codes, uniques = pd.factorize(names)
+    unique_names = pd.Series(uniques, dtype=object)
+    if upper:
+        unique_names = unique_names.str.upper()
+    unique_names = (
+        unique_names.str.replace(WHITESPACE_PATTERN, " ", regex=True)
+        .str.strip()
+        .str.replace(ABBREVIATION_PATTERN, _abbreviate, regex=True)
+    )
+    # append a None for the missing values, which factorize codes as -1
+    lookup = np.append(unique_names.to_numpy(dtype=object), None)
+    return pd.Series(lookup[codes], index=names.index, name=names.name)
@@ -0,0 +1,249 @@
+"""
+Module for generating synthetic Boston bike data at any scale.
+
+The generated tables have the columns and types of the real datasets after
+ingest, so the analysis and map functions can be benchmarked offline at
+sizes the city has not reached yet. The bike network is a grid of
+east-west lane segments over Boston, one street per grid row, and most
+street crashes are placed a few meters from a lane on the street they name.
+Everything is drawn from a seeded generator, so the same scale always gives
+the same data.
+
+Dependencies:
+    - os: Module for file handling.
+    - Geopandas: Extends pandas to allow spatial operations on geometric types.
+    - NumPy: Library for array operations.
+    - Pandas: A powerful data manipulation library.
+    - Shapely: Library for geometric objects.
+    - lane_index: Module with the metric CRS of the bike network.
+
+Functions:
+    - bike_network(n_lanes, seed=0): Generates a bike network GeoDataFrame.
+    - bike_lane_table(network): Returns the bike lane records of a network,
+    the way CKAN returns them.
+    - crash_table(n_crashes, network, seed=0): Generates a crash table around
+    a bike network.
+    - road_table(network): Returns a road segment table longer than the bike
+    network.
+    - write_dataset(n_crashes, out_dir, seed=0): Writes a crash table and a
+    bike network of matching scale and returns the tables.
+"""
+
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+import lane_index
+
+# area the lanes are spread over, about the extent of Boston
+BOUNDS = (-71.12, 42.30, -71.00, 42.38)
+# length of a lane segment in degrees of longitude (about 160 m)
+LANE_SPAN = 0.002
+# number of east-west streets in the grid
+STREET_ROWS = 200
+FACILITY_TYPES = np.array(["BL", "SBL", "SLM", "BFBL", "SUB", "PSL"])
+LOCATION_TYPES = np.array(["Street", "Intersection", "Other"])
+LOCATION_WEIGHTS = [0.7, 0.2, 0.1]
+# share of street crashes placed on a lane, the rest land anywhere
+ON_LANE_SHARE = 0.6
+# share of crashes recorded without coordinates
+MISSING_SHARE = 0.01
+# crashes per lane segment, so the network grows with the crash table
+CRASHES_PER_LANE = 100
+
+
+def _street_names(rows, title=False):
+    """
+    Returns the full street name of each grid row.
+
+    Parameters:
+        rows (numpy.ndarray): Grid row numbers.
+        title (bool): Whether to write names in title case like the bike
+        lane table instead of upper case like the crash table.
+
+    Returns:
+        numpy.ndarray: The street names.
+    """
+    names = np.char.add(np.char.add("ROW", rows.astype(str)), " STREET").astype(
+        object
+    )
+    if title:
+        return np.char.title(names.astype(str)).astype(object)
+    return names
+
+
+def bike_network(n_lanes, seed=0):
+    """
+    Generates a bike network of east-west lane segments.
+
+    Parameters:
+        n_lanes (int): The number of lane segments.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        geopandas.GeoDataFrame: Lane segments in EPSG:4326 with STREET_NAM,
+        ExisFacil, InstallDat, Shape_Leng and a grid row column. Like in the
+        real network, Shape_Leng is the length in meters in the Massachusetts
+        State Plane.
+    """
+    rng = np.random.default_rng(seed)
+    west, south, east, north = BOUNDS
+    rows = rng.integers(0, STREET_ROWS, n_lanes)
+    lat = south + (rows + 0.5) * (north - south) / STREET_ROWS
+    start = rng.uniform(west, east - LANE_SPAN, n_lanes)
+    coords = np.stack(
+        [
+            np.column_stack([start, lat]),
+            np.column_stack([start + LANE_SPAN, lat]),
+        ],
+        axis=1,
+    )
+    geometry = gpd.GeoSeries(shapely.linestrings(coords), crs="EPSG:4326")
+    return gpd.GeoDataFrame(
+        {
+            "STREET_NAM": _street_names(rows, title=True),
+            "ExisFacil": rng.choice(FACILITY_TYPES, n_lanes),
+            "InstallDat": rng.integers(2000, 2024, n_lanes).astype(str),
+            "Shape_Leng": (
+                geometry.to_crs(lane_index.LANE_CRS).length.to_numpy()
+            ),
+            "row": rows,
+        },
+        geometry=geometry,
+        crs="EPSG:4326",
+    )
+
+
+def bike_lane_table(network):
+    """
+    Returns the bike lane records of a network, the way CKAN returns them.
+
+    Parameters:
+        network (geopandas.GeoDataFrame): A network from bike_network.
+
+    Returns:
+        pandas.DataFrame: STREET_NAM, ExisFacil, InstallDat and Shape_Leng,
+        with values stored as strings.
+    """
+    return pd.DataFrame(
+        network[["STREET_NAM", "ExisFacil", "InstallDat", "Shape_Leng"]]
+    ).astype(str)
+
+
+def _crash_locations(rng, network, on_street):
+    """
+    Draws crash coordinates and the grid row of the street each crash is on.
+
+    Parameters:
+        rng (numpy.random.Generator): The random generator.
+        network (geopandas.GeoDataFrame): A network from bike_network.
+        on_street (numpy.ndarray): Whether each crash happened on a street.
+
+    Returns:
+    Tuple (lat, lon, rows):
+        lat (numpy.ndarray): Latitudes, NaN for crashes without coordinates.
+        lon (numpy.ndarray): Longitudes, NaN for crashes without
+        coordinates.
+        rows (numpy.ndarray): Grid rows of the streets.
+    """
+    west, south, east, north = BOUNDS
+    n_crashes = len(on_street)
+    lat = rng.uniform(south, north, n_crashes)
+    lon = rng.uniform(west, east, n_crashes)
+    rows = rng.integers(0, STREET_ROWS, n_crashes)
+    # move some street crashes onto a lane, a few meters to either side
+    on_lane = on_street & (rng.random(n_crashes) < ON_LANE_SHARE)
+    lanes = rng.integers(0, len(network), int(on_lane.sum()))
+    bounds = network.geometry.bounds.to_numpy()[lanes]
+    lon[on_lane] = rng.uniform(bounds[:, 0], bounds[:, 2])
+    lat[on_lane] = bounds[:, 1] + rng.uniform(-5e-5, 5e-5, len(lanes))
+    rows[on_lane] = network["row"].to_numpy()[lanes]
+    missing = rng.random(n_crashes) < MISSING_SHARE
+    lat[missing] = np.nan
+    lon[missing] = np.nan
+    return lat, lon, rows
+
+
+def crash_table(n_crashes, network, seed=0):
+    """
+    Generates a crash table around a bike network.
+
+    Parameters:
+        n_crashes (int): The number of crashes.
+        network (geopandas.GeoDataFrame): A network from bike_network.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        pandas.DataFrame: Crashes with the columns and types of
+        helpers.get_bike_data on an ingested table.
+    """
+    rng = np.random.default_rng(seed)
+    location = rng.choice(len(LOCATION_TYPES), n_crashes, p=LOCATION_WEIGHTS)
+    lat, lon, rows = _crash_locations(rng, network, location == 0)
+    street = _street_names(rows)
+    street[location == 2] = None
+    seconds = rng.integers(0, 365 * 24 * 3600 * 8, n_crashes)
+    return pd.DataFrame(
+        {
+            "_id": np.arange(1, n_crashes + 1),
+            "dispatch_ts": (
+                pd.Timestamp("2015-01-01")
+                + pd.to_timedelta(np.sort(seconds), unit="s")
+            ),
+            "mode_type": pd.Categorical(["bike"] * n_crashes),
+            "location_type": pd.Categorical.from_codes(
+                location, LOCATION_TYPES
+            ),
+            "street": street,
+            "xstreet1": np.where(
+                location == 1,
+                _street_names(rng.integers(0, STREET_ROWS, n_crashes)),
+                None,
+            ),
+            "xstreet2": np.full(n_crashes, None, dtype=object),
+            "lat": lat,
+            "long": lon,
+        }
+    )
+
+
+def road_table(network):
+    """
+    Returns a road segment table ten times longer than the bike network.
+
+    Parameters:
+        network (geopandas.GeoDataFrame): A network from bike_network.
+
+    Returns:
+        pandas.DataFrame: Road segments with a SHAPESTLength column.
+    """
+    return pd.DataFrame(
+        {"SHAPESTLength": np.repeat(network["Shape_Leng"].to_numpy(), 10)}
+    )
+
+
+def write_dataset(n_crashes, out_dir, seed=0):
+    """
+    Writes a crash table and a bike network of matching scale.
+
+    Parameters:
+        n_crashes (int): The number of crashes.
+        out_dir (str): The directory to write crashes.parquet and
+        bike_network.geojson to.
+        seed (int): The seed of the random generator.
+
+    Returns:
+    Tuple (crash_df, bike_lane_df, road_data, network_path):
+        crash_df (pandas.DataFrame): The crash table.
+        bike_lane_df (pandas.DataFrame): The bike lane records.
+        road_data (pandas.DataFrame): The road segment table.
+        network_path (str): The path of the bike network GeoJSON file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    network = bike_network(max(n_crashes // CRASHES_PER_LANE, 10), seed)
+    crash_df = crash_table(n_crashes, network, seed)
+    network_path = os.path.join(out_dir, "bike_network.geojson")
+    network.drop(columns="row").to_file(network_path, driver="GeoJSON")
+    crash_df.to_parquet(os.path.join(out_dir, "crashes.parquet"), index=False)
+    return crash_df, bike_lane_table(network), road_table(network), network_path
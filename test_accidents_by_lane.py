@@ -0,0 +1,39 @@
+"""
+Test module for verifying the classification of crashes by lane type.
+
+This module contains test cases for abbreviate_street_names and
+organize_by_lane, run against a synthetic bike network and crash table.
+"""
+
+from accidents_by_lane import abbreviate_street_names, organize_by_lane
+
+
+def test_abbreviate_street_names(bike_crashes, bike_lane_table):
+    """
+    Test case to verify that both datasets end up with the same street names.
+    """
+    bike_accident_df, bike_lane_df = abbreviate_street_names(
+        bike_crashes, bike_lane_table
+    )
+
+    assert list(bike_lane_df["STREET_NAM"]) == ["MAIN ST", "PARK AVE"]
+    assert list(bike_accident_df["street"][:2]) == ["MAIN ST", "PARK AVE"]
+    assert bike_accident_df["xstreet1"][4] == "PARK AVE"
+    assert bike_accident_df["street"][5] is None
+
+
+def test_organize_by_lane(bike_network_path, bike_crashes, bike_lane_table):
+    """
+    Test case to verify the crash counts of each category.
+    """
+    lane_type_dict = organize_by_lane(
+        bike_crashes, bike_lane_table, lane_path=bike_network_path
+    )
+
+    assert lane_type_dict == {
+        "intersection": 1,
+        "none": 1,
+        "other": 1,
+        "BL": 1,
+        "SBL": 1,
+    }
@@ -0,0 +1,154 @@
+"""
+Test module for verifying compiled GeoJSON artifacts.
+
+This module contains test cases for load_layer, layer_bounds and
+build_artifacts: compiling a layer once, reusing it while its source is
+unchanged, rebuilding it when the source changes and filtering features by
+bounding box, keeping sources with the same file name apart and deleting
+superseded variants. It also tests the display variants made by
+prepare_layer.
+"""
+
+import os
+import geopandas as gpd
+import shapely
+from shapely.geometry import LineString
+import artifacts
+from artifacts import (
+    build_artifacts,
+    layer_bounds,
+    layer_hash,
+    load_layer,
+    prepare_layer,
+    zoom_tolerance,
+)
+
+
+def test_load_layer_matches_source(bike_network_path, build_dir):
+    """
+    Test case to verify that a layer loaded from its artifact holds the same
+    features as the GeoJSON file.
+    """
+    layer = load_layer(bike_network_path, build_dir=build_dir)
+    source = gpd.read_file(bike_network_path)
+
+    assert list(layer.columns) == list(source.columns)
+    assert layer.crs == source.crs
+    assert sorted(layer["STREET_NAM"]) == sorted(source["STREET_NAM"])
+    # pylint: disable=W0212
+    assert os.path.exists(
+        artifacts._artifact_paths(bike_network_path, build_dir)[0]
+    )
+
+
+def test_artifact_is_reused_until_source_changes(bike_network_path, build_dir):
+    """
+    Test case to verify that the artifact is only rebuilt when the content of
+    its source changes.
+    """
+    # pylint: disable=W0212
+    artifact_path = artifacts._artifact_paths(bike_network_path, build_dir)[0]
+    first = build_artifacts([bike_network_path], build_dir)[bike_network_path]
+    built_at = os.path.getmtime(artifact_path)
+
+    os.utime(bike_network_path, (0, 0))
+    load_layer(bike_network_path, build_dir=build_dir)
+    assert os.path.getmtime(artifact_path) == built_at
+
+    source = gpd.read_file(bike_network_path)
+    source.iloc[:1].to_file(bike_network_path, driver="GeoJSON")
+    second = build_artifacts([bike_network_path], build_dir)[bike_network_path]
+    assert second["sha256"] != first["sha256"]
+    assert len(load_layer(bike_network_path, build_dir=build_dir)) == 1
+
+
+def test_load_layer_bbox(bike_network_path, build_dir):
+    """
+    Test case to verify that a bounding box only loads the features it
+    intersects, and that the layer bounds come from the metadata.
+    """
+    layer = load_layer(
+        bike_network_path,
+        bbox=(-71.052, 42.349, -71.051, 42.3505),
+        build_dir=build_dir,
+    )
+
+    assert list(layer["STREET_NAM"]) == ["MAIN ST"]
+    assert layer_bounds(bike_network_path, build_dir) == [
+        -71.06,
+        42.35,
+        -71.05,
+        42.351,
+    ]
+
+
+def test_zoom_tolerance():
+    """
+    Test case to verify that each zoom level uses the tolerance of the
+    highest range it falls into.
+    """
+    assert zoom_tolerance(3) == 40.0
+    assert zoom_tolerance(12) == 10.0
+    assert zoom_tolerance(13) == 10.0
+    assert zoom_tolerance(20) == 0.0
+
+
+def test_prepare_layer(tmp_path, build_dir):
+    """
+    Test case to verify that prepared layers drop invisible detail and round
+    their coordinates, and that they are cached.
+    """
+    path = str(tmp_path / "wiggly.geojson")
+    # a line with a 1 m wiggle every 10 m
+    line = LineString(
+        [(-71.06 + i * 0.0001, 42.35 + (i % 2) * 0.00001) for i in range(101)]
+    )
+    gpd.GeoDataFrame(geometry=[line], crs="EPSG:4326").to_file(
+        path, driver="GeoJSON"
+    )
+    coarse = prepare_layer(path, 12, build_dir=build_dir)
+    fine = prepare_layer(path, 18, precision=4, build_dir=build_dir)
+
+    assert shapely.get_num_coordinates(coarse.geometry.values)[0] == 2
+    assert shapely.get_num_coordinates(fine.geometry.values)[0] == 101
+    assert list(fine.geometry[0].coords)[1] == (-71.0599, 42.35)
+    assert prepare_layer(path, 13, build_dir=build_dir) is coarse
+
+
+def test_same_file_name_in_other_directory(
+    bike_network_path, tmp_path, build_dir
+):
+    """
+    Test case to verify that sources sharing a file name in different
+    directories are compiled into separate artifacts.
+    """
+    other_path = tmp_path / "other" / "bike_network.geojson"
+    other_path.parent.mkdir()
+    gpd.read_file(bike_network_path).iloc[:1].to_file(
+        other_path, driver="GeoJSON"
+    )
+
+    assert len(load_layer(bike_network_path, build_dir=build_dir)) == 2
+    assert len(load_layer(str(other_path), build_dir=build_dir)) == 1
+    assert len(os.listdir(build_dir)) == 4
+    assert len(load_layer(bike_network_path, build_dir=build_dir)) == 2
+
+
+def test_superseded_variants_are_removed(bike_network_path, build_dir):
+    """
+    Test case to verify that rebuilding a changed source deletes the
+    prepared variants of its old version.
+    """
+    prepare_layer(bike_network_path, 12, build_dir=build_dir)
+    prepare_layer(bike_network_path, 14, build_dir=build_dir)
+    assert len(os.listdir(build_dir)) == 4
+
+    source = gpd.read_file(bike_network_path)
+    source.iloc[:1].to_file(bike_network_path, driver="GeoJSON")
+    layer = prepare_layer(bike_network_path, 12, build_dir=build_dir)
+
+    sha256 = layer_hash(bike_network_path, build_dir)
+    variants = [name for name in os.listdir(build_dir) if ".t" in name]
+    assert len(layer) == 1
+    assert len(variants) == 1
+    assert variants[0].endswith(f".{sha256[:12]}.parquet")
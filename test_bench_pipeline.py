@@ -0,0 +1,96 @@
+"""
+Test module for verifying the synthetic data generator and the benchmark
+harness.
+
+This module contains test cases for synthetic.write_dataset and
+bench_pipeline.run_benchmarks at a small scale, for stages starting cold and
+for the import time budget of the CLI.
+"""
+
+import os
+import pytest
+import accidents_by_lane
+import bench_pipeline
+import lane_index
+import synthetic
+
+
+def test_write_dataset(tmp_path):
+    """
+    Test case to verify that the same seed gives the same tables and that
+    street crashes are matched to lanes.
+    """
+    crash_df, bike_lane_df, _, network_path = synthetic.write_dataset(
+        2000, str(tmp_path)
+    )
+    again = synthetic.write_dataset(2000, str(tmp_path / "again"))[0]
+    same_data = again.equals(crash_df)
+    lane_type_dict = {"intersection": 0, "none": 0}
+
+    crash_df, bike_lane_df = accidents_by_lane.abbreviate_street_names(
+        crash_df, bike_lane_df
+    )
+    matches = accidents_by_lane.find_street_accidents(
+        lane_type_dict, crash_df, bike_lane_df, lane_path=network_path
+    )
+
+    assert len(crash_df) == 2000
+    assert same_data
+    assert len(matches) > 0.3 * (crash_df["location_type"] == "Street").sum()
+
+
+def test_lane_lengths_in_meters():
+    """
+    Test case to verify that Shape_Leng is the projected length in meters,
+    like in the real bike network.
+    """
+    network = synthetic.bike_network(20)
+
+    lengths = network.to_crs(lane_index.LANE_CRS).length
+
+    assert network["Shape_Leng"].to_numpy() == pytest.approx(lengths)
+    assert 150 < network["Shape_Leng"].mean() < 180
+
+
+def test_run_benchmarks(tmp_path):
+    """
+    Test case to verify that every stage is timed and measured.
+    """
+    results = bench_pipeline.run_benchmarks([500], str(tmp_path), repeat=1)
+
+    assert [row["stage"] for row in results] == [
+        "abbreviate_street_names",
+        "find_street_accidents",
+        "normalize_data",
+        "get_heat_map",
+        "get_heat_map_binned",
+        "get_street_data",
+    ]
+    assert all(row["best"] > 0 and row["peak_bytes"] > 0 for row in results)
+
+
+def test_stages_start_cold(tmp_path, build_dir):
+    """
+    Test case to verify that preparing the stages builds neither the lane
+    index nor the network artifact, so their first runs include both.
+    """
+    tables = synthetic.write_dataset(500, str(tmp_path))
+    lane_index.load_lane_index.cache_clear()
+
+    stages = bench_pipeline.pipeline_stages(*tables)
+
+    assert lane_index.load_lane_index.cache_info().currsize == 0
+    assert not os.path.exists(build_dir)
+    setup, func = stages["find_street_accidents"]
+    func(*setup())
+    assert lane_index.load_lane_index.cache_info().currsize == 1
+
+
+def test_import_time():
+    """
+    Test case to verify that importing the CLI in a fresh interpreter stays
+    under its time budget.
+    """
+    timing = bench_pipeline.import_time("boston_bike", repeat=3)
+
+    assert 0 < timing["best"] < bench_pipeline.IMPORT_BUDGET
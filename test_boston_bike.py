@@ -0,0 +1,129 @@
+"""
+Test module for verifying the command line interface.
+
+This module contains test cases for the argument parser and for the modules
+the CLI imports, which runs each check in a fresh interpreter so modules
+imported by other tests do not hide a heavy import. The import time budget
+is checked in test_bench_pipeline.
+"""
+
+import subprocess
+import sys
+import pytest
+import boston_bike
+
+HEAVY_MODULES = ("pandas", "geopandas", "shapely", "matplotlib", "folium")
+
+
+def _fresh_import(module):
+    """
+    Imports a module in a new interpreter.
+
+    Parameters:
+        module (str): The module to import.
+
+    Returns:
+        set: The top-level modules in sys.modules after the import.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; "
+            "print(' '.join({name.split('.')[0] for name in sys.modules}))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_cli_import_is_light():
+    """
+    Test case to verify that importing the CLI loads none of the data or
+    plotting libraries.
+    """
+    assert _fresh_import("boston_bike").isdisjoint(HEAVY_MODULES)
+
+
+def test_analysis_import_skips_plotting():
+    """
+    Test case to verify that accidents_by_lane only imports matplotlib and
+    folium once something is drawn.
+    """
+    loaded = _fresh_import("accidents_by_lane")
+    assert loaded.isdisjoint({"matplotlib", "folium"})
+
+
+def test_help_runs_without_heavy_imports():
+    """
+    Test case to verify that printing help does not import the pipeline.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, boston_bike\n"
+            "try:\n"
+            "    boston_bike.main(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "print('pandas' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "classify" in result.stdout
+    assert result.stdout.split()[-1] == "False"
+
+
+@pytest.mark.parametrize(
+    "argv,command,run",
+    [
+        (["fetch"], "fetch", boston_bike.fetch),
+        (["classify", "--workers", "2"], "classify", boston_bike.classify),
+        (["report", "--output", "charts"], "report", boston_bike.report),
+        (
+            ["heatmap", "--tiles", "tiles"],
+            "heatmap",
+            boston_bike.heatmap_command,
+        ),
+    ],
+)
+def test_subcommands(argv, command, run):
+    """
+    Test case to verify that each subcommand dispatches to its handler.
+
+    Parameters:
+        argv (list): The command line.
+        command (str): The expected subcommand.
+        run (function): The expected handler.
+    """
+    arguments = boston_bike.build_parser().parse_args(argv)
+    assert arguments.command == command
+    assert arguments.run is run
+    assert arguments.accidents_url == boston_bike.ACCIDENTS_URL
+
+
+def test_subcommand_required():
+    """
+    Test case to verify that running without a subcommand is an error.
+    """
+    with pytest.raises(SystemExit):
+        boston_bike.build_parser().parse_args([])
+
+
+def test_main_runs_handler(monkeypatch, capsys):
+    """
+    Test case to verify that main passes the parsed options to the handler
+    and returns a zero exit status.
+    """
+    monkeypatch.setattr(
+        boston_bike,
+        "classify",
+        lambda arguments: print(arguments.workers, arguments.intersections),
+    )
+    assert boston_bike.main(["classify", "--workers", "3"]) == 0
+    assert capsys.readouterr().out.strip() == "3 False"
@@ -0,0 +1,135 @@
+"""
+Test module for verifying the on-disk dataset cache.
+
+This module contains test cases for pull_cached, run against a local CKAN
+stand-in: serving fresh copies without network traffic, revalidating expired
+copies with a conditional GET, evicting the least recently used datasets and
+serving the last good copy offline.
+
+Attributes:
+    TEST_CACHE_DIR (str): The cache directory used by the tests.
+"""
+
+import os
+import shutil
+import pytest
+from conftest import TEST_RESOURCE_ID
+from cache import cache_key, pull_cached
+from helpers import load_data
+
+TEST_CACHE_DIR = "test_cache"
+
+
+@pytest.fixture
+def cache_teardown():
+    """
+    Teardown function to remove the test cache directory.
+    """
+    yield
+    shutil.rmtree(f"data/{TEST_CACHE_DIR}", ignore_errors=True)
+
+
+def resource_url(server, resource_id=TEST_RESOURCE_ID):
+    """
+    Builds a datastore_search URL on the local CKAN stand-in.
+
+    Parameters:
+        server: The local CKAN stand-in.
+        resource_id (str): The resource to request.
+
+    Returns:
+        str: The URL.
+    """
+    return f"{server.url}?resource_id={resource_id}&limit=100"
+
+
+def test_cache_key_ignores_query_order():
+    """
+    Test case to verify that the cache key only depends on the resource and
+    the query, not on the order of its parameters.
+    """
+    assert cache_key("http://x/d?resource_id=a&limit=5&q=b") == cache_key(
+        "http://x/d?q=b&limit=5&resource_id=a"
+    )
+    assert cache_key("http://x/d?resource_id=a&limit=5") != cache_key(
+        "http://x/d?resource_id=a&limit=6"
+    )
+
+
+# pylint: disable=W0621
+# pylint: disable=W0613
+def test_fresh_copy_skips_network(ckan_server, cache_teardown):
+    """
+    Test case to verify that a copy younger than its TTL is served without a
+    request.
+    """
+    ckan_server.records = [{"_id": 1}]
+    url = resource_url(ckan_server)
+
+    first = pull_cached(url, ttl=60, cache_dir=TEST_CACHE_DIR)
+    second = pull_cached(url, ttl=60, cache_dir=TEST_CACHE_DIR)
+
+    assert first == second
+    assert len(ckan_server.requests) == 1
+    assert load_data(first)["records"] == [{"_id": 1}]
+
+
+def test_expired_copy_is_revalidated(ckan_server, cache_teardown):
+    """
+    Test case to verify that an expired copy is revalidated and only
+    replaced when the data changed upstream.
+    """
+    ckan_server.records = [{"_id": 1}]
+    url = resource_url(ckan_server)
+    name = pull_cached(url, ttl=0, cache_dir=TEST_CACHE_DIR)
+    modified_at = os.path.getmtime(f"data/{name}")
+
+    pull_cached(url, ttl=0, cache_dir=TEST_CACHE_DIR)
+    assert os.path.getmtime(f"data/{name}") == modified_at
+
+    ckan_server.records = [{"_id": 1}, {"_id": 2}]
+    pull_cached(url, ttl=0, cache_dir=TEST_CACHE_DIR)
+    assert len(load_data(name)["records"]) == 2
+    assert len(ckan_server.requests) == 3
+
+
+def test_least_recently_used_is_evicted(ckan_server, cache_teardown):
+    """
+    Test case to verify that the cache drops its least recently used dataset
+    when it grows past its size limit.
+    """
+    ckan_server.records = [{"_id": index} for index in range(50)]
+    first = pull_cached(
+        resource_url(ckan_server, "a"), cache_dir=TEST_CACHE_DIR
+    )
+    size = os.path.getsize(f"data/{first}")
+
+    second = pull_cached(
+        resource_url(ckan_server, "b"),
+        max_bytes=size + 1,
+        cache_dir=TEST_CACHE_DIR,
+    )
+
+    assert not os.path.exists(f"data/{first}")
+    assert os.path.exists(f"data/{second}")
+
+
+def test_offline_serves_last_good_copy(ckan_server, cache_teardown):
+    """
+    Test case to verify that offline mode and an unreachable API both fall
+    back to the cached copy.
+    """
+    ckan_server.records = [{"_id": 1}]
+    url = resource_url(ckan_server)
+    name = pull_cached(url, cache_dir=TEST_CACHE_DIR)
+    ckan_server.shutdown()
+    ckan_server.server_close()
+
+    assert pull_cached(url, offline=True, cache_dir=TEST_CACHE_DIR) == name
+    assert pull_cached(url, ttl=0, cache_dir=TEST_CACHE_DIR) == name
+    with pytest.raises(FileNotFoundError):
+        pull_cached(
+            resource_url(ckan_server, "missing"),
+            offline=True,
+            cache_dir=TEST_CACHE_DIR,
+        )
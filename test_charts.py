@@ -0,0 +1,73 @@
+"""
+Test module for verifying the batch rendering of the bar graphs.
+
+This module contains test cases for chart_categories, render_slice and
+render_batch.
+"""
+
+import os
+import charts
+
+SLICES = {
+    "2022": (
+        {"intersection": 4, "none": 2, "other": 1, "BL": 3},
+        {"intersection": 50.0, "none": 25.0, "other": 12.5, "BL": 12.5},
+        {"intersection": 40.0, "none": 20.0, "other": 10.0, "BL": 30.0},
+    ),
+    "2023": (
+        {"intersection": 2, "none": 1, "other": 0, "SBL": 1},
+        {"intersection": 50.0, "none": 25.0, "other": 0.0, "SBL": 25.0},
+        {"intersection": 50.0, "none": 25.0, "other": 0.0, "SBL": 25.0},
+    ),
+}
+
+
+def test_chart_categories():
+    """
+    Test case to verify that lane types of later slices are added at the end.
+    """
+    assert charts.chart_categories(SLICES) == [
+        "intersection",
+        "none",
+        "other",
+        "BL",
+        "SBL",
+    ]
+
+
+def test_render_slice_reuses_bars(tmp_path):
+    """
+    Test case to verify that rendering a slice only updates the bars, and
+    that lane types missing from a slice are drawn with zero height.
+    """
+    chart_pair = charts.new_charts(charts.chart_categories(SLICES))
+    bars = chart_pair[1].bars[0]
+
+    charts.render_slice(chart_pair, "2022", SLICES["2022"], str(tmp_path))
+    charts.render_slice(chart_pair, "2023", SLICES["2023"], str(tmp_path))
+
+    assert chart_pair[1].bars[0] is bars
+    assert [patch.get_height() for patch in bars] == [2, 1, 0, 0, 1]
+    assert chart_pair[1].labels[0][0].get_text() == "2"
+
+
+def test_render_batch(tmp_path):
+    """
+    Test case to verify that every slice is written in every format, in
+    parallel and in order.
+    """
+    paths = charts.render_batch(
+        SLICES, str(tmp_path), formats=("png", "svg"), workers=2
+    )
+
+    assert [os.path.basename(path) for path in paths] == [
+        "2022_percent.png",
+        "2022_percent.svg",
+        "2022_count.png",
+        "2022_count.svg",
+        "2023_percent.png",
+        "2023_percent.svg",
+        "2023_count.png",
+        "2023_count.svg",
+    ]
+    assert all(os.path.getsize(path) > 0 for path in paths)
@@ -0,0 +1,142 @@
+"""
+Test module for verifying the chunked crash pipeline.
+
+This module contains test cases comparing organize_by_lane_chunked and
+report_chunked with the in-memory functions on synthetic crashes saved as
+Parquet and newline-delimited JSON.
+"""
+
+import os
+import pytest
+import accidents_by_lane
+import helpers
+import streets
+import synthetic
+from chunked import organize_by_lane_chunked, report_chunked
+from intersections import Intersection
+
+TEST_CRASH_PATHS = (
+    "test_chunked_crashes.parquet",
+    "test_chunked_crashes.jsonl",
+)
+
+
+@pytest.fixture
+def crash_files(tmp_path):
+    """
+    Writes 3000 synthetic crashes and a few non-bike records to the data
+    folder as Parquet and newline-delimited JSON, and removes them after.
+    """
+    crash_df, bike_lane_df, road_data, network_path = synthetic.write_dataset(
+        3000, str(tmp_path)
+    )
+    records = crash_df.astype({"mode_type": str})
+    records.loc[::500, "mode_type"] = "ped"
+    records.to_parquet(f"data/{TEST_CRASH_PATHS[0]}", index=False)
+    records.astype({"dispatch_ts": str}).to_json(
+        f"data/{TEST_CRASH_PATHS[1]}", orient="records", lines=True
+    )
+    yield records, bike_lane_df, road_data, network_path
+    for path in TEST_CRASH_PATHS:
+        os.remove(f"data/{path}")
+
+
+# pylint: disable=W0621
+def test_iter_bike_chunks(crash_files):
+    """
+    Test case to verify that chunks hold at most chunk_size bike records and
+    together hold all of them.
+    """
+    records = crash_files[0]
+
+    for path in TEST_CRASH_PATHS:
+        chunks = list(helpers.iter_bike_chunks(path, 700, ["_id"]))
+
+        assert max(len(chunk) for chunk in chunks) <= 700
+        assert (
+            sum(len(chunk) for chunk in chunks)
+            == (records["mode_type"] == "bike").sum()
+        )
+
+
+@pytest.mark.usefixtures("crash_files")
+@pytest.mark.parametrize("path", TEST_CRASH_PATHS)
+def test_chunk_types(path):
+    """
+    Test case to verify that every chunk has the column types load_records
+    gives the whole file.
+
+    Parameters:
+        path (str): The crash file to read.
+    """
+    expected = helpers.load_records(path).dtypes
+
+    for chunk in helpers.iter_bike_chunks(path, 700):
+        assert chunk.dtypes.equals(expected)
+
+
+@pytest.mark.parametrize("path", TEST_CRASH_PATHS)
+def test_matches_in_memory(crash_files, path):
+    """
+    Test case to verify that the chunked counts and percentages equal those
+    of the in-memory path.
+    """
+    records, bike_lane_df, road_data, network_path = crash_files
+    bike_accident_df = records[records["mode_type"] == "bike"]
+    in_memory = accidents_by_lane.organize_by_lane(
+        bike_accident_df[accidents_by_lane.ACCIDENT_COLUMNS].copy(),
+        bike_lane_df.copy(),
+        lane_path=network_path,
+    )
+
+    chunked = report_chunked(
+        path, bike_lane_df, road_data, chunk_size=700, lane_path=network_path
+    )
+
+    assert chunked[0] == in_memory
+    assert chunked[1:] == accidents_by_lane.normalize_data(
+        in_memory, bike_lane_df, road_data
+    )
+    assert (
+        organize_by_lane_chunked(
+            path, bike_lane_df, chunk_size=10000, lane_path=network_path
+        )
+        == in_memory
+    )
+
+
+def test_report_with_intersections(crash_files):
+    """
+    Test case to verify that the chunked report attributes intersection
+    crashes like organize_by_lane with the same intersection index.
+    """
+    records, bike_lane_df, road_data, network_path = crash_files
+    bike_accident_df = records[records["mode_type"] == "bike"]
+    crossings = bike_accident_df[
+        bike_accident_df["location_type"] == "Intersection"
+    ]
+    index = {
+        frozenset(pair): Intersection(None, None, frozenset({"BL"}))
+        for pair in zip(
+            streets.canonicalize_streets(crossings["street"])[::3],
+            streets.canonicalize_streets(crossings["xstreet1"])[::3],
+        )
+    }
+    in_memory = accidents_by_lane.organize_by_lane(
+        bike_accident_df[accidents_by_lane.ACCIDENT_COLUMNS].copy(),
+        bike_lane_df.copy(),
+        lane_path=network_path,
+        intersection_index=index,
+    )
+
+    chunked = report_chunked(
+        TEST_CRASH_PATHS[0],
+        bike_lane_df,
+        road_data,
+        chunk_size=700,
+        lane_path=network_path,
+        intersection_index=index,
+    )
+
+    assert chunked[0] == pytest.approx(in_memory)
+    assert chunked[0]["intersection"] < len(crossings)
@@ -0,0 +1,75 @@
+"""
+Test module for verifying the compact crash store.
+
+This module contains test cases for building a CrashStore from a crash
+table and handing it to the analysis and the heat map.
+"""
+
+import numpy as np
+import pandas as pd
+import accidents_by_lane
+import heatmap
+import synthetic
+from crash_store import CrashStore
+
+
+def test_from_frame(bike_crashes):
+    """
+    Test case to verify that the store keeps the values of the crash table.
+    """
+    store = CrashStore.from_frame(bike_crashes)
+
+    assert len(store) == 6
+    assert store.ids.dtype == np.int64
+    assert store.coords.shape == (6, 2)
+    assert np.isnan(store.coords[5]).all()
+    assert store.location_mask("Street").sum() == 4
+    assert not store.location_mask("Highway").any()
+    assert store.street_names[store.street_codes[4, 1]] == "PARK AVENUE"
+    assert store.street_codes[5, 0] == -1
+    assert pd.Timestamp(store.timestamps[0]) == pd.Timestamp(
+        "2023-01-03 08:00:00"
+    )
+
+
+def test_heat_points_without_copy(bike_crashes):
+    """
+    Test case to verify that the heat map uses the coordinates of the store
+    and that a store without missing coordinates hands over its array.
+    """
+    store = CrashStore.from_frame(bike_crashes)
+    located = store.select(store.location_mask("Street"))
+
+    assert np.allclose(
+        heatmap.heat_points(store), heatmap.heat_points(bike_crashes)
+    )
+    assert heatmap.heat_points(located) is located.coords
+
+
+def test_to_frame_analysis(bike_crashes, bike_lane_table, bike_network_path):
+    """
+    Test case to verify that the analysis gives the same counts on the
+    frame of a store as on the crash table.
+    """
+    frame = CrashStore.from_frame(bike_crashes).to_frame()
+
+    from_store = accidents_by_lane.organize_by_lane(
+        frame, bike_lane_table.copy(), lane_path=bike_network_path
+    )
+    from_table = accidents_by_lane.organize_by_lane(
+        bike_crashes.copy(), bike_lane_table.copy(), lane_path=bike_network_path
+    )
+
+    assert from_store == from_table
+
+
+def test_memory():
+    """
+    Test case to verify that the store is much smaller than the crash table
+    with its values stored as strings.
+    """
+    network = synthetic.bike_network(100)
+    crash_df = synthetic.crash_table(10000, network).astype(str)
+    store = CrashStore.from_frame(crash_df)
+
+    assert store.nbytes * 5 < crash_df.memory_usage(deep=True).sum()
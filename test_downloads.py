@@ -0,0 +1,92 @@
+"""
+Test module for verifying the concurrent downloader.
+
+This module contains test cases for load_urls and the connection pool, run
+against a local CKAN stand-in.
+"""
+
+import http.client
+import urllib.parse
+import pandas as pd
+from conftest import TEST_RESOURCE_ID
+from downloads import ConnectionPool, load_urls
+
+
+class _StaleConnection:
+    """
+    A keep-alive connection the server has closed while it was idle.
+    """
+
+    closed = False
+
+    def request(self, *args):
+        """
+        Fails like a request on a connection closed by the server.
+        """
+        raise http.client.RemoteDisconnected(f"closed before {args}")
+
+    def close(self):
+        """
+        Marks the connection as closed.
+        """
+        self.closed = True
+
+
+def test_load_urls(ckan_server):
+    """
+    Test case to verify that every page of every table is downloaded and
+    the pages are put back together in order.
+    """
+    ckan_server.records = [
+        {"_id": index, "value": str(index)} for index in range(1, 24)
+    ]
+    urls = {
+        name: f"{ckan_server.url}?resource_id={name}&limit=49000"
+        for name in ("accidents", "lanes", "roads")
+    }
+
+    tables = load_urls(urls, page_size=5, max_connections=2)
+
+    assert list(tables) == ["accidents", "lanes", "roads"]
+    for table in tables.values():
+        pd.testing.assert_frame_equal(table, pd.DataFrame(ckan_server.records))
+    assert len(ckan_server.requests) == 15
+    assert all("limit=5" in request for request in ckan_server.requests)
+
+
+def test_stale_connection_is_replaced(ckan_server):
+    """
+    Test case to verify that a request on an idle connection the server has
+    closed is sent again on a new connection.
+    """
+    ckan_server.records = [{"_id": 1}]
+    parts = urllib.parse.urlsplit(ckan_server.url)
+    pool = ConnectionPool(parts.scheme, parts.netloc)
+    stale = _StaleConnection()
+    pool.idle.put(stale)
+
+    result = pool.get_json(
+        f"{parts.path}?resource_id={TEST_RESOURCE_ID}&limit=10"
+    )
+    pool.close()
+
+    assert result["result"]["records"] == [{"_id": 1}]
+    assert stale.closed
+    assert len(ckan_server.requests) == 1
+
+
+def test_load_urls_capped_limit(ckan_server):
+    """
+    Test case to verify that every record is downloaded when the server caps
+    the page size below the one requested.
+    """
+    ckan_server.records = [
+        {"_id": index, "value": str(index)} for index in range(1, 24)
+    ]
+    ckan_server.max_limit = 4
+    url = f"{ckan_server.url}?resource_id={TEST_RESOURCE_ID}"
+
+    table = load_urls({"lanes": url}, page_size=10)["lanes"]
+
+    pd.testing.assert_frame_equal(table, pd.DataFrame(ckan_server.records))
+    assert len(ckan_server.requests) == 6
@@ -0,0 +1,144 @@
+"""
+Test module for verifying the memoized exposure denominators.
+
+This module contains test cases for road_length and lane_lengths, checking
+that results are stored in the summary file and recomputed when the source
+data changes.
+
+Attributes:
+    TEST_ROAD_NAME (str): The name of the road test data file.
+    TEST_LANE_NAME (str): The name of the lane test Parquet file.
+"""
+
+import json
+import os
+import time
+import pytest
+import exposure
+import helpers
+
+TEST_ROAD_NAME = "test_roads.json"
+TEST_LANE_NAME = "test_lanes.parquet"
+
+
+# pylint: disable=W0621
+@pytest.fixture
+def summary_path(summary_path):
+    """
+    Returns the summary file path of the test, see conftest, and removes
+    the test data files afterwards.
+    """
+    yield summary_path
+    for name in (TEST_ROAD_NAME, "test_roads.parquet", TEST_LANE_NAME):
+        if os.path.exists(f"data/{name}"):
+            os.remove(f"data/{name}")
+
+
+def write_roads(lengths):
+    """
+    Writes a road table the way pull_data saves it.
+
+    Parameters:
+        lengths (list): The SHAPESTLength of each road, as strings.
+
+    Returns:
+        None
+    """
+    records = [{"SHAPESTLength": length} for length in lengths]
+    with open(f"data/{TEST_ROAD_NAME}", "w", encoding="utf-8") as file:
+        json.dump({"result": {"records": records}}, file)
+
+
+def test_road_length(summary_path):
+    """
+    Test case to verify that the road length is stored and recomputed once
+    the road file changes.
+    """
+    write_roads(["100.5", "200"])
+    assert exposure.road_length(TEST_ROAD_NAME, summary_path) == 300.5
+
+    exposure.clear()
+    with open(summary_path, encoding="utf-8") as file:
+        assert list(json.load(file)["roads"].values()) == [300.5]
+    assert exposure.road_length(TEST_ROAD_NAME, summary_path) == 300.5
+
+    write_roads(["1"])
+    # a new download is always newer than the Parquet file of the old one
+    later = time.time() + 10
+    os.utime(f"data/{TEST_ROAD_NAME}", (later, later))
+    assert exposure.road_length(TEST_ROAD_NAME, summary_path) == 1
+
+
+def test_lane_lengths(bike_lane_table, summary_path):
+    """
+    Test case to verify lane lengths by facility type and install year, and
+    that an edited table gets new lengths.
+    """
+    by_type = exposure.lane_lengths(bike_lane_table, summary_path=summary_path)
+    by_year = exposure.lane_lengths(
+        bike_lane_table, ("ExisFacil", "InstallDat"), summary_path
+    )
+    bike_lane_table.loc[0, "Shape_Leng"] = "10"
+    edited = exposure.lane_lengths(bike_lane_table, summary_path=summary_path)
+
+    assert by_type.to_dict() == {"BL": 3000.0, "SBL": 1500.0}
+    assert by_year.to_dict() == {
+        ("BL", "2013"): 3000.0,
+        ("SBL", "2019"): 1500.0,
+    }
+    assert edited["BL"] == 10.0
+
+
+def test_lane_lengths_keyed_by_file(bike_lane_table, summary_path, monkeypatch):
+    """
+    Test case to verify that a lane table read from its Parquet file is
+    keyed by the file instead of being hashed, and by the new file once it
+    is rewritten.
+    """
+    bike_lane_table.to_parquet(f"data/{TEST_LANE_NAME}", index=False)
+    monkeypatch.setattr(exposure, "_fingerprint", None)
+
+    lanes = helpers.load_records(TEST_LANE_NAME)
+    lengths = exposure.lane_lengths(lanes, summary_path=summary_path)
+    assert lengths["BL"] == 3000.0
+
+    bike_lane_table.loc[0, "Shape_Leng"] = "10"
+    bike_lane_table.to_parquet(f"data/{TEST_LANE_NAME}", index=False)
+    later = time.time() + 10
+    os.utime(f"data/{TEST_LANE_NAME}", (later, later))
+    lanes = helpers.load_records(TEST_LANE_NAME)
+    assert exposure.lane_lengths(lanes, summary_path=summary_path)["BL"] == 10
+
+
+def test_lane_summaries_are_capped(bike_lane_table, summary_path, monkeypatch):
+    """
+    Test case to verify that the summary file only keeps the lane lengths of
+    the most recent tables.
+    """
+    monkeypatch.setattr(exposure, "MAX_LANE_SUMMARIES", 2)
+    for length in ("10", "20", "30"):
+        bike_lane_table.loc[0, "Shape_Leng"] = length
+        exposure.lane_lengths(bike_lane_table, summary_path=summary_path)
+
+    with open(summary_path, encoding="utf-8") as file:
+        lanes = json.load(file)["lanes"]
+    assert [entry[0]["Shape_Leng"] for entry in lanes.values()] == [20, 30]
+
+
+def test_lane_lengths_of_changed_copy(bike_lane_table, summary_path):
+    """
+    Test case to verify that copies and subsets of a loaded lane table,
+    which inherit its attrs, get their own lengths.
+    """
+    bike_lane_table.to_parquet(f"data/{TEST_LANE_NAME}", index=False)
+    lanes = helpers.load_records(TEST_LANE_NAME)
+    exposure.lane_lengths(lanes, summary_path=summary_path)
+
+    doubled = lanes.assign(Shape_Leng=lanes["Shape_Leng"].astype(float) * 2)
+    subset = lanes[lanes["ExisFacil"] == "SBL"]
+
+    doubled_lengths = exposure.lane_lengths(doubled, summary_path=summary_path)
+    subset_lengths = exposure.lane_lengths(subset, summary_path=summary_path)
+
+    assert doubled_lengths.to_dict() == {"BL": 6000.0, "SBL": 3000.0}
+    assert subset_lengths.to_dict() == {"SBL": 1500.0}
@@ -0,0 +1,77 @@
+"""
+Test module for verifying the heat map layer.
+
+This module contains test cases for heat_points, bin_points and get_heat_map.
+"""
+
+import folium
+import numpy as np
+import pandas as pd
+import pytest
+from heatmap import bin_points, get_heat_map, heat_points
+
+
+def test_heat_points(bike_crashes):
+    """
+    Test case to verify that coordinates are extracted as floats and rows
+    without coordinates are left out.
+    """
+    points = heat_points(bike_crashes)
+
+    assert points.shape == (5, 2)
+    assert points[0].tolist() == [42.35005, -71.055]
+
+
+def test_bin_points():
+    """
+    Test case to verify that points in the same cell are merged into one
+    weighted point at the cell center.
+    """
+    points = np.array([[42.3501, -71.0501], [42.3502, -71.0502], [42.36, -71]])
+
+    binned = bin_points(points, cell_size=0.001)
+
+    assert binned.shape == (2, 3)
+    assert np.allclose(binned[0], [42.3505, -71.0505, 1.0])
+    assert binned[1, 2] == 0.5
+
+
+def test_bin_points_tiny_cells():
+    """
+    Test case to verify that cells too many for one integer key per cell
+    are still binned at the right place.
+    """
+    points = np.array([[42.35, -71.05], [42.35, -71.05], [42.36, -71.06]])
+
+    binned = bin_points(points, cell_size=1e-12)
+
+    assert binned.shape == (2, 3)
+    assert np.allclose(binned[:, :2], [[42.35, -71.05], [42.36, -71.06]])
+    assert binned[:, 2].tolist() == [1.0, 0.5]
+
+
+@pytest.mark.parametrize("cell_size", [0, -0.001, float("nan"), 1e-30])
+def test_bin_points_bad_cell_size(cell_size):
+    """
+    Test case to verify that cell sizes that cannot be binned are rejected.
+    """
+    with pytest.raises(ValueError):
+        bin_points(np.array([[42.35, -71.05]]), cell_size=cell_size)
+
+
+def test_get_heat_map_binned(bike_crashes):
+    """
+    Test case to verify that binning reduces the points handed to the heat
+    map layer.
+    """
+    data = pd.concat([bike_crashes] * 100, ignore_index=True)
+
+    raw = get_heat_map(data, folium.Map())
+    binned = get_heat_map(data, folium.Map(), cell_size=0.001)
+
+    # pylint: disable=W0212
+    raw_layer, binned_layer = (
+        list(folium_map._children.values())[-1] for folium_map in (raw, binned)
+    )
+    assert len(raw_layer.data) == 500
+    assert len(binned_layer.data) == 4
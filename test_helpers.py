@@ -6,6 +6,10 @@ This module contains test cases for testing the following functions:
 file.
 - load_data: Function to load data from a JSON file.
 - get_bike_data: Function to extract bike-related data from loaded data.
+- pull_records: Function to stream a CKAN resource page by page into a
+newline-delimited JSON file.
+- load_records: Function to load the records of a pulled dataset.
+- ingest_data: Function to convert a pulled dataset into a typed Parquet file.
 
 Each test case is designed to validate the correctness of these functions and
 ensure they operate as expected.
@@ -14,13 +18,25 @@ Attributes:
     TEST_URL (str): The URL from which data is pulled for testing.
     TEST_DATA_NAME (str): The name of the test data file.
     TEST_PATH (str): The path to the test data file.
+    TEST_NDJSON_NAME (str): The name of the newline-delimited test data file.
+    TEST_NDJSON_PATH (str): The path to the newline-delimited test data file.
+    TEST_PARQUET_PATH (str): The path to the Parquet test data file.
 
 """
 
+import json
 import os
 import pytest
 import pandas as pd
-from helpers import pull_data, load_data, get_bike_data
+from conftest import TEST_RESOURCE_ID
+from helpers import (
+    pull_data,
+    load_data,
+    get_bike_data,
+    pull_records,
+    load_records,
+    ingest_data,
+)
 
 TEST_URL = (
     "https://data.boston.gov/api/3/action/datastore_search?resource_id"
@@ -28,6 +44,9 @@ TEST_URL = (
 )
 TEST_DATA_NAME = "test_data.json"
 TEST_PATH = f"data/{TEST_DATA_NAME}"
+TEST_NDJSON_NAME = "test_data.jsonl"
+TEST_NDJSON_PATH = f"data/{TEST_NDJSON_NAME}"
+TEST_PARQUET_PATH = "data/test_data.parquet"
 
 
 @pytest.fixture(scope="module")
@@ -40,6 +59,22 @@ def setup_teardown():
         os.remove(TEST_PATH)
 
 
+@pytest.fixture
+def ndjson_teardown():
+    """
+    Teardown function to remove the files at TEST_NDJSON_PATH and
+    TEST_PARQUET_PATH before and after each test, since pull_records resumes
+    into an existing file.
+    """
+    for path in (TEST_NDJSON_PATH, TEST_PARQUET_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+    yield
+    for path in (TEST_NDJSON_PATH, TEST_PARQUET_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
 # pylint: disable=W0621
 # pylint: disable=W0613
 def test_pull_data(setup_teardown):
@@ -105,3 +140,186 @@ def test_get_bike_data(setup_teardown):
     bike_data = bike_data[bike_data["mode_type"] == "bike"].reset_index()
 
     assert expected_data.equals(bike_data)
+
+
+def make_records(count):
+    """
+    Builds fake crash records with every value stored as a string, the way
+    CKAN returns them.
+
+    Parameters:
+        count (int): The number of records to build.
+
+    Returns:
+        list: The fake records.
+    """
+    return [
+        {
+            "_id": index + 1,
+            "mode_type": "bike" if index % 2 else "mv",
+            "lat": str(42.3 + index / 1000),
+        }
+        for index in range(count)
+    ]
+
+
+def test_pull_records_pages(ckan_server, ndjson_teardown):
+    """
+    Test case to verify that pull_records pages through a resource and writes
+    one record per line.
+
+    Parameters:
+        ckan_server (fixture): Local CKAN stand-in.
+        ndjson_teardown (fixture): Fixture removing the newline-delimited
+        test data file.
+
+    Raises:
+        AssertionError: If the saved records do not match the served records
+        or the resource was not requested page by page.
+    """
+    ckan_server.records = make_records(25)
+
+    result = pull_records(
+        TEST_RESOURCE_ID, TEST_NDJSON_NAME, 10, base_url=ckan_server.url
+    )
+
+    assert result == TEST_NDJSON_NAME
+    assert len(ckan_server.requests) == 3
+    assert load_records(TEST_NDJSON_NAME).to_dict("records") == (
+        ckan_server.records
+    )
+
+
+def test_pull_records_capped_limit(ckan_server, ndjson_teardown):
+    """
+    Test case to verify that pull_records keeps paging when the server
+    returns fewer records per page than requested.
+
+    Parameters:
+        ckan_server (fixture): Local CKAN stand-in.
+        ndjson_teardown (fixture): Fixture removing the newline-delimited
+        test data file.
+
+    Raises:
+        AssertionError: If records after the first short page are lost.
+    """
+    ckan_server.records = make_records(25)
+    ckan_server.max_limit = 4
+
+    pull_records(
+        TEST_RESOURCE_ID, TEST_NDJSON_NAME, 10, base_url=ckan_server.url
+    )
+
+    assert len(ckan_server.requests) == 7
+    assert load_records(TEST_NDJSON_NAME).to_dict("records") == (
+        ckan_server.records
+    )
+
+
+def test_pull_records_resumes(ckan_server, ndjson_teardown):
+    """
+    Test case to verify that pull_records continues an interrupted download
+    after its last complete record.
+
+    Parameters:
+        ckan_server (fixture): Local CKAN stand-in.
+        ndjson_teardown (fixture): Fixture removing the newline-delimited
+        test data file.
+
+    Raises:
+        AssertionError: If records are duplicated or lost, or the download
+        did not start at the right offset.
+    """
+    ckan_server.records = make_records(25)
+    with open(TEST_NDJSON_PATH, "w", encoding="utf-8") as file:
+        for record in ckan_server.records[:12]:
+            file.write(json.dumps(record) + "\n")
+        file.write('{"_id": 13, "mode_')
+
+    pull_records(
+        TEST_RESOURCE_ID, TEST_NDJSON_NAME, 10, base_url=ckan_server.url
+    )
+
+    assert "offset=12" in ckan_server.requests[0]
+    assert load_records(TEST_NDJSON_NAME).to_dict("records") == (
+        ckan_server.records
+    )
+
+
+def test_get_bike_data_from_records(ckan_server, ndjson_teardown):
+    """
+    Test case to verify that get_bike_data filters a newline-delimited
+    dataset.
+
+    Parameters:
+        ckan_server (fixture): Local CKAN stand-in.
+        ndjson_teardown (fixture): Fixture removing the newline-delimited
+        test data file.
+
+    Raises:
+        AssertionError: If the result contains anything but bike records.
+    """
+    ckan_server.records = make_records(8)
+    pull_records(TEST_RESOURCE_ID, TEST_NDJSON_NAME, base_url=ckan_server.url)
+
+    bike_data = get_bike_data(TEST_NDJSON_NAME)
+
+    assert list(bike_data["_id"]) == [2, 4, 6, 8]
+    assert bike_data["lat"][0] == ckan_server.records[1]["lat"]
+
+
+def test_ingest_data(ckan_server, ndjson_teardown):
+    """
+    Test case to verify that ingest_data types the columns of a dataset and
+    that get_bike_data reads only the requested columns of the result.
+
+    Parameters:
+        ckan_server (fixture): Local CKAN stand-in.
+        ndjson_teardown (fixture): Fixture removing the newline-delimited
+        test data file.
+
+    Raises:
+        AssertionError: If a column keeps its string type, or the filtered
+        bike data differs from the one read from JSON.
+    """
+    ckan_server.records = make_records(8)
+    pull_records(TEST_RESOURCE_ID, TEST_NDJSON_NAME, base_url=ckan_server.url)
+
+    parquet_name = ingest_data(TEST_NDJSON_NAME)
+    records = load_records(parquet_name)
+    bike_data = get_bike_data(parquet_name, columns=["_id", "lat"])
+
+    assert records["mode_type"].dtype == "category"
+    assert records["lat"].dtype == float
+    assert list(bike_data.columns) == ["index", "_id", "lat", "mode_type"]
+    assert list(bike_data["lat"]) == list(
+        get_bike_data(TEST_NDJSON_NAME)["lat"].astype(float)
+    )
+
+
+def test_ingest_keeps_leading_zeros(ckan_server, ndjson_teardown):
+    """
+    Test case to verify that ingest_data keeps zero-padded identifiers such
+    as ZIP codes as strings while still parsing the numbers.
+
+    Parameters:
+        ckan_server (fixture): Local CKAN stand-in.
+        ndjson_teardown (fixture): Fixture removing the newline-delimited
+        test data file.
+
+    Raises:
+        AssertionError: If a leading zero is lost or a number is not parsed.
+    """
+    ckan_server.records = [
+        {**record, "zip_code": zip_code, "count": count}
+        for record, zip_code, count in zip(
+            make_records(3), ["02115", "02116", "2215"], ["0", "10", "0.5"]
+        )
+    ]
+    pull_records(TEST_RESOURCE_ID, TEST_NDJSON_NAME, base_url=ckan_server.url)
+
+    records = load_records(ingest_data(TEST_NDJSON_NAME))
+
+    assert list(records["zip_code"]) == ["02115", "02116", "2215"]
+    assert list(records["count"]) == [0, 10, 0.5]
+    assert records["lat"].dtype == float
@@ -0,0 +1,128 @@
+"""
+Test module for verifying incremental crash counting.
+
+This module contains test cases for merge_counts and update_lane_counts, run
+against a local CKAN stand-in and a synthetic bike network.
+"""
+
+import pytest
+from accidents_by_lane import organize_by_lane
+from conftest import TEST_RESOURCE_ID
+from incremental import (
+    iter_new_pages,
+    load_state,
+    merge_counts,
+    update_lane_counts,
+)
+
+
+# pylint: disable=W0621
+@pytest.fixture
+def state_path(tmp_path):
+    """
+    Returns the path of a fresh state file.
+    """
+    return str(tmp_path / "state.json")
+
+
+@pytest.fixture
+def update(ckan_server, bike_network_path, bike_lane_table, state_path):
+    """
+    Returns a function running update_lane_counts against the CKAN stand-in
+    and the bike network, with the state in state_path.
+    """
+
+    def run():
+        return update_lane_counts(
+            bike_lane_table,
+            TEST_RESOURCE_ID,
+            state_path,
+            lane_path=bike_network_path,
+            base_url=ckan_server.url,
+        )
+
+    return run
+
+
+def test_merge_counts():
+    """
+    Test case to verify that counts are added key by key, keeping the
+    fractions of crashes split between lane types.
+    """
+    assert merge_counts({"none": 2, "BL": 1}, {"none": 1, "SBL": 3}) == {
+        "none": 3,
+        "BL": 1,
+        "SBL": 3,
+    }
+    merged = merge_counts({"BL": 0.5, "SBL": 1}, {"BL": 0.5, "SBL": 0.25})
+    assert merged == {"BL": 1, "SBL": 1.25}
+    assert isinstance(merged["BL"], int)
+
+
+def test_iter_new_pages(ckan_server):
+    """
+    Test case to verify that pages start after the largest `_id` seen, so
+    gaps in `_id` skip no records.
+    """
+    ckan_server.records = [{"_id": _id} for _id in (1, 2, 5, 9, 10)]
+
+    pages = list(
+        iter_new_pages(
+            TEST_RESOURCE_ID, 1, page_size=2, base_url=ckan_server.url
+        )
+    )
+
+    assert pages == [[{"_id": 2}, {"_id": 5}], [{"_id": 9}, {"_id": 10}]]
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def test_update_lane_counts(
+    update,
+    state_path,
+    ckan_server,
+    bike_network_path,
+    bike_crashes,
+    bike_lane_table,
+):
+    """
+    Test case to verify that an update only fetches the new crashes and ends
+    with the same counts as classifying every crash at once.
+    """
+    records = bike_crashes.to_dict("records")
+    ckan_server.records = records[:3]
+    first = update()
+    ckan_server.records = records
+    ckan_server.requests.clear()
+    second = update()
+
+    assert first == {
+        "intersection": 0,
+        "none": 0,
+        "other": 0,
+        "BL": 1,
+        "SBL": 1,
+    }
+    assert "_id+%3E+3" in ckan_server.requests[0]
+    assert load_state(state_path)["high_water_mark"] == 6
+    assert second == organize_by_lane(
+        bike_crashes, bike_lane_table.copy(), lane_path=bike_network_path
+    )
+    assert update() == second
+
+
+def test_update_after_deletion(
+    update, ckan_server, bike_network_path, bike_crashes, bike_lane_table
+):
+    """
+    Test case to verify that crashes added after others were deleted are
+    still counted, although the high-water mark is then past the end of the
+    table as an offset.
+    """
+    records = bike_crashes.to_dict("records")
+    ckan_server.records = records[:3]
+    update()
+    ckan_server.records = records[:1] + records[3:]
+
+    assert update() == organize_by_lane(
+        bike_crashes, bike_lane_table.copy(), lane_path=bike_network_path
+    )
@@ -0,0 +1,97 @@
+"""
+Test module for verifying the intersection index.
+
+This module contains test cases for build_intersection_index,
+intersection_facilities and the attribution of intersection crashes in
+find_non_street_accidents, on the synthetic two-lane bike network and a
+cross street joining the west ends of both lanes.
+"""
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import LineString
+import accidents_by_lane
+from intersections import (
+    build_intersection_index,
+    intersection_facilities,
+    load_intersection_index,
+)
+
+
+@pytest.fixture
+def street_segments():
+    """
+    Returns street segments of Elm Street, running north from Main Street to
+    Park Avenue and on past Park Avenue.
+    """
+    return gpd.GeoDataFrame(
+        {"ST_NAME": ["Elm Street", "Elm Street"]},
+        geometry=[
+            LineString([(-71.06, 42.35), (-71.06, 42.351)]),
+            LineString([(-71.06, 42.351), (-71.06, 42.352)]),
+        ],
+        crs="EPSG:4326",
+    )
+
+
+# pylint: disable=W0621
+def test_build_intersection_index(bike_network_path, street_segments):
+    """
+    Test case to verify that streets ending at the same node are paired with
+    the lane types there.
+    """
+    lanes = gpd.read_file(bike_network_path)
+
+    index = build_intersection_index(lanes, street_segments, "ST_NAME")
+
+    assert set(index) == {
+        frozenset({"MAIN ST", "ELM ST"}),
+        frozenset({"PARK AVE", "ELM ST"}),
+    }
+    node = index[frozenset({"MAIN ST", "ELM ST"})]
+    assert node.facilities == {"BL"}
+    assert (node.lat, node.lon) == pytest.approx((42.35, -71.06))
+    assert not build_intersection_index(lanes)
+
+
+def test_intersection_facilities(bike_network_path, street_segments):
+    """
+    Test case to verify the lookup by street and either cross street, in
+    any order and spelling.
+    """
+    index = build_intersection_index(
+        gpd.read_file(bike_network_path), street_segments, "ST_NAME"
+    )
+    crash_df = pd.DataFrame(
+        {
+            "street": ["ELM STREET", "Park Avenue", "ELM STREET"],
+            "xstreet1": ["MAIN STREET", None, "OAK STREET"],
+            "xstreet2": [None, "Elm St", None],
+        }
+    )
+
+    facilities = intersection_facilities(crash_df, index)
+
+    assert facilities.tolist() == [{"BL"}, {"SBL"}, set()]
+    assert not load_intersection_index(bike_network_path)
+
+
+def test_find_non_street_accidents(
+    bike_crashes, bike_network_path, street_segments
+):
+    """
+    Test case to verify that intersection crashes at a bike lane move from
+    the intersection count to the lane type.
+    """
+    index = build_intersection_index(
+        gpd.read_file(bike_network_path), street_segments, "ST_NAME"
+    )
+    bike_crashes.loc[4, "xstreet1"] = "ELM STREET"
+    without, with_index = {}, {}
+
+    accidents_by_lane.find_non_street_accidents(without, bike_crashes)
+    accidents_by_lane.find_non_street_accidents(with_index, bike_crashes, index)
+
+    assert without == {"intersection": 1, "other": 1}
+    assert with_index == {"intersection": 0, "other": 1, "BL": 1}
@@ -0,0 +1,79 @@
+"""
+Test module for verifying crash-to-lane matching.
+
+This module contains test cases for build_lane_index, load_lane_index,
+match_crashes and match_crashes_parallel on a synthetic two-lane bike
+network.
+"""
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from lane_index import (
+    LANE_CRS,
+    build_lane_index,
+    load_lane_index,
+    match_crashes,
+    match_crashes_parallel,
+)
+
+
+def test_load_lane_index(bike_network_path):
+    """
+    Test case to verify that a loaded index is projected into meters and kept
+    in memory.
+    """
+    index = load_lane_index(bike_network_path)
+
+    assert index.lanes.crs == LANE_CRS
+    assert len(index.tree) == 2
+    assert load_lane_index(bike_network_path) is index
+
+
+def test_match_crashes(bike_network_path, bike_crashes):
+    """
+    Test case to verify that crashes are matched to the nearest lane within
+    the distance threshold, and that the distance is in meters.
+    """
+    index = build_lane_index(gpd.read_file(bike_network_path))
+
+    matches = match_crashes(bike_crashes, index)
+
+    assert list(matches.index) == [0, 1, 4]
+    assert list(matches["ExisFacil"]) == ["BL", "SBL", "SBL"]
+    assert list(matches["lane"]) == [0, 1, 1]
+    assert 5 < matches["distance"][0] < 6
+    assert 10 < matches["distance"][1] < 12
+
+
+def test_match_crashes_max_distance(bike_network_path, bike_crashes):
+    """
+    Test case to verify that raising the threshold matches the crash between
+    the two lanes.
+    """
+    index = load_lane_index(bike_network_path)
+
+    matches = match_crashes(bike_crashes, index, max_distance=60)
+
+    assert 2 in matches.index
+
+
+def test_match_crashes_parallel(bike_network_path):
+    """
+    Test case to verify that parallel matching over many partitions gives the
+    same result as matching in one process.
+    """
+    rng = np.random.default_rng(0)
+    crash_df = pd.DataFrame(
+        {
+            "lat": 42.3495 + rng.random(500) * 0.002,
+            "long": -71.061 + rng.random(500) * 0.012,
+        }
+    )
+    index = load_lane_index(bike_network_path)
+
+    serial = match_crashes(crash_df, index)
+    parallel = match_crashes_parallel(crash_df, index, workers=2, cell_size=200)
+
+    assert len(serial) > 50
+    pd.testing.assert_frame_equal(parallel, serial)
@@ -0,0 +1,107 @@
+"""
+Test module for verifying the confidence intervals on accidents by lane type.
+
+This module contains test cases for assignment_counts, bootstrap_shares,
+poisson_interval and rate_intervals.
+"""
+
+import numpy as np
+import pytest
+from lane_stats import (
+    assignment_counts,
+    bootstrap_shares,
+    poisson_interval,
+    rate_intervals,
+)
+
+LANE_TYPE_DICT = {"intersection": 60, "none": 30, "other": 6, "BL": 24}
+
+
+def test_assignment_counts():
+    """
+    Test case to verify that an assignment vector is counted by lane type,
+    leaving out crashes without one.
+    """
+    assert assignment_counts(["BL", "SBL", None, "BL"]) == {"BL": 2, "SBL": 1}
+
+
+def test_bootstrap_shares():
+    """
+    Test case to verify that the intervals contain the observed percents,
+    narrow with more crashes and are reproducible from a seed.
+    """
+    shares = bootstrap_shares(LANE_TYPE_DICT, seed=0)
+    more = bootstrap_shares(
+        {key: value * 100 for key, value in LANE_TYPE_DICT.items()}, seed=0
+    )
+
+    assert shares["percent"].to_dict() == pytest.approx(
+        {"intersection": 50, "none": 25, "other": 5, "BL": 20}
+    )
+    assert (shares["low"] <= shares["percent"]).all()
+    assert (shares["percent"] <= shares["high"]).all()
+    assert (
+        (more["high"] - more["low"]) < (shares["high"] - shares["low"])
+    ).all()
+    assert shares.equals(bootstrap_shares(LANE_TYPE_DICT, seed=0))
+
+
+@pytest.mark.parametrize(
+    "lane_type_dict",
+    [{}, {"intersection": 0, "none": 0}, {"BL": 2.5, "none": 1}],
+)
+def test_bootstrap_shares_bad_counts(lane_type_dict):
+    """
+    Test case to verify that counts without crashes and fractional counts
+    are rejected instead of being truncated or divided by zero.
+
+    Parameters:
+        lane_type_dict (dict): The counts to bootstrap.
+    """
+    with pytest.raises(ValueError):
+        bootstrap_shares(lane_type_dict, seed=0)
+
+
+def test_bootstrap_shares_parallel():
+    """
+    Test case to verify that resamples split over processes give close
+    intervals and depend only on the seed and the number of workers.
+    """
+    serial = bootstrap_shares(LANE_TYPE_DICT, seed=0)
+    parallel = bootstrap_shares(LANE_TYPE_DICT, seed=0, workers=2)
+
+    assert np.allclose(
+        parallel[["low", "high"]], serial[["low", "high"]], atol=2
+    )
+    assert parallel.equals(bootstrap_shares(LANE_TYPE_DICT, seed=0, workers=2))
+
+
+def test_poisson_interval():
+    """
+    Test case to verify Byar's interval against exact Poisson limits.
+    """
+    low, high = poisson_interval([0, 10, 100])
+
+    assert low[0] == 0
+    assert high[0] == pytest.approx(3.689, abs=0.05)
+    assert (low[1], high[1]) == pytest.approx((4.795, 18.390), abs=0.02)
+    assert (low[2], high[2]) == pytest.approx((81.36, 121.63), abs=0.05)
+
+
+def test_rate_intervals(bike_lane_table):
+    """
+    Test case to verify accidents per lane-kilometer, including a lane type
+    without accidents.
+    """
+    rates = rate_intervals({"BL": 10}, bike_lane_table)
+
+    # Shape_Leng is in meters, so the 3000.0 BL lane is 3 km long
+    assert rates.loc["BL", "km"] == pytest.approx(3.0)
+    assert rates.loc["BL", "rate"] == pytest.approx(10 / 3)
+    assert rates.loc["SBL", "count"] == 0
+    assert rates.loc["SBL", "low"] == 0
+    assert (
+        rates.loc["BL", "low"]
+        < rates.loc["BL", "rate"]
+        < rates.loc["BL", "high"]
+    )
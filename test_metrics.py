@@ -0,0 +1,89 @@
+"""
+Test module for verifying the safety metrics over time.
+
+This module contains test cases for count_by_period, merge_period_counts and
+accident_rates, using crashes matched against a synthetic bike network.
+"""
+
+import pytest
+from accidents_by_lane import abbreviate_street_names, find_street_accidents
+from lane_index import load_lane_index, match_crashes
+from metrics import (
+    METERS_PER_KILOMETER,
+    accident_rates,
+    count_by_period,
+    merge_period_counts,
+)
+
+
+@pytest.fixture
+def matches(bike_network_path, bike_crashes):
+    """
+    Returns the synthetic crashes matched to the synthetic bike network.
+    """
+    return match_crashes(bike_crashes, load_lane_index(bike_network_path))
+
+
+# pylint: disable=W0621
+def test_count_by_period(bike_crashes, matches):
+    """
+    Test case to verify monthly counts, including a month without crashes.
+    """
+    counts = count_by_period(bike_crashes, matches)
+
+    assert [str(period) for period in counts.index] == [
+        "2023-01",
+        "2023-02",
+        "2023-03",
+    ]
+    assert counts.to_dict("list") == {"BL": [1, 0, 0], "SBL": [1, 0, 1]}
+
+
+def test_merge_period_counts(bike_crashes, matches):
+    """
+    Test case to verify that counting in two batches gives the same counts as
+    counting at once.
+    """
+    first = count_by_period(bike_crashes, matches.iloc[:1])
+    second = count_by_period(bike_crashes, matches.iloc[1:])
+
+    merged = merge_period_counts(first, second)
+
+    assert merged.equals(count_by_period(bike_crashes, matches))
+
+
+def test_accident_rates(bike_crashes, bike_lane_table, matches):
+    """
+    Test case to verify accidents per lane-kilometer, with and without a
+    rolling window.
+    """
+    counts = count_by_period(bike_crashes, matches)
+
+    rates = accident_rates(counts, bike_lane_table)
+    rolling = accident_rates(counts, bike_lane_table, window=3)
+
+    assert rates["BL"].iloc[0] == pytest.approx(METERS_PER_KILOMETER / 3000)
+    assert rolling["SBL"].iloc[-1] == pytest.approx(
+        2 * METERS_PER_KILOMETER / 1500
+    )
+
+
+def test_count_pipeline_matches(
+    bike_crashes, bike_lane_table, bike_network_path
+):
+    """
+    Test case to verify that the matches of find_street_accidents are counted
+    with their own crashes' timestamps when the crash table is not in order.
+    """
+    crashes, lanes = abbreviate_street_names(
+        bike_crashes.iloc[::-1].copy(), bike_lane_table
+    )
+    matches = find_street_accidents(
+        {"none": 0}, crashes, lanes, lane_path=bike_network_path
+    )
+
+    counts = count_by_period(crashes, matches)
+
+    assert sorted(matches.index) == [0, 1]
+    assert [str(period) for period in counts.index] == ["2023-01"]
+    assert counts.to_dict("list") == {"BL": [1], "SBL": [1]}
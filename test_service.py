@@ -0,0 +1,136 @@
+"""
+Test module for verifying the query service.
+
+This module contains test cases for the endpoints of QueryService, its
+result cache and metrics, and one request over a local connection.
+"""
+
+import asyncio
+import json
+import pytest
+import accidents_by_lane
+import service
+
+
+@pytest.fixture
+def query_service(bike_crashes, bike_lane_table, bike_network_path):
+    """
+    Returns a service over the synthetic crashes and bike network.
+    """
+    return service.QueryService.from_data(
+        bike_crashes, bike_lane_table, lane_path=bike_network_path
+    )
+
+
+# pylint: disable=W0621
+def test_counts_match_organize_by_lane(
+    query_service, bike_crashes, bike_lane_table, bike_network_path
+):
+    """
+    Test case to verify that the counts of all crashes are the counts of
+    organize_by_lane.
+    """
+    lane_type_dict = accidents_by_lane.organize_by_lane(
+        bike_crashes.copy(), bike_lane_table.copy(), lane_path=bike_network_path
+    )
+
+    status, counts = query_service.handle("/counts")
+
+    assert status == 200
+    assert counts == {
+        key: value for key, value in lane_type_dict.items() if value
+    }
+
+
+def test_counts_in_bbox_and_range(query_service):
+    """
+    Test case to verify that counts only include crashes in the bbox and
+    time range.
+    """
+    _, counts = query_service.handle(
+        "/counts?bbox=-71.06,42.349,-71.05,42.352&start=2023-01-10"
+        "&end=2023-03-05"
+    )
+
+    assert counts == {
+        "BL": 0,
+        "SBL": 1,
+        "intersection": 1,
+        "none": 0,
+        "other": 0,
+    }
+
+
+def test_nearest_and_heatmap(query_service):
+    """
+    Test case to verify the nearest lane and heat map endpoints.
+    """
+    _, lane = query_service.handle("/nearest?lat=42.35005&lon=-71.055")
+    _, far = query_service.handle("/nearest?lat=42.36&lon=-71.055")
+    _, bins = query_service.handle("/heatmap?start=2023-01-01&end=2023-02-01")
+
+    assert lane["ExisFacil"] == "BL"
+    assert lane["distance"] < 10
+    assert far == {"lane": None}
+    assert len(bins["points"]) == 2
+
+
+def test_cache_metrics_and_errors(query_service):
+    """
+    Test case to verify cache hits in the metrics, the cache bound and the
+    answers to bad requests.
+    """
+    query_service.cache_size = 1
+    query_service.handle("/counts?start=2023-01-01")
+    query_service.handle("/counts?start=2023-01-01")
+    query_service.handle("/counts?start=2023-02-01")
+
+    _, metrics = query_service.handle("/metrics")
+
+    assert metrics["/counts"]["requests"] == 3
+    assert metrics["/counts"]["cache_hits"] == 1
+    assert len(query_service._cache) == 1  # pylint: disable=W0212
+    assert query_service.handle("/lanes")[0] == 404
+    assert query_service.handle("/nearest?lat=42.35")[0] == 400
+    assert query_service.handle("/counts?bbox=1,2")[0] == 400
+
+
+@pytest.mark.parametrize("cell_size", ["0", "-1", "nan", "1e-12", "5"])
+def test_heatmap_bad_cell_size(query_service, cell_size):
+    """
+    Test case to verify that heat map cell sizes out of range are answered
+    with 400.
+    """
+    status, body = query_service.handle(f"/heatmap?cell_size={cell_size}")
+
+    assert status == 400
+    assert "cell_size" in body["error"]
+
+
+def test_http(query_service):
+    """
+    Test case to verify two requests over one local connection.
+    """
+
+    async def request():
+        server = await service.start_server(query_service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        bodies = []
+        for connection in ("keep-alive", "close"):
+            writer.write(
+                b"GET /counts HTTP/1.1\r\n"
+                + f"Connection: {connection}\r\n\r\n".encode()
+            )
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            bodies.append(json.loads(await reader.readexactly(length)))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return head, bodies
+
+    head, bodies = asyncio.run(request())
+
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert bodies[0] == bodies[1]
@@ -0,0 +1,67 @@
+"""
+Test module for verifying street name normalization.
+
+This module contains test cases for canonical_street and canonicalize_streets,
+comparing them against the word-by-word abbreviation the analysis used
+before.
+"""
+
+import pandas as pd
+from streets import ABBREVIATIONS, canonical_street, canonicalize_streets
+
+NAMES = [
+    "Massachusetts Avenue",
+    "  North  Harvard Street ",
+    "Eastern Avenue",
+    "Street. Road",
+    "Commonwealth Avenue",
+    "Massachusetts Avenue",
+]
+
+
+def abbreviate_by_word(name):
+    """
+    Abbreviates a street name one word at a time, as the analysis used to.
+
+    Parameters:
+        name (str): An upper-case street name.
+
+    Returns:
+        str: The abbreviated name.
+    """
+    return " ".join(ABBREVIATIONS.get(word, word) for word in name.split())
+
+
+def test_canonical_street():
+    """
+    Test case to verify that canonical_street only abbreviates whole words.
+    """
+    assert canonical_street("  North  Harvard Street ") == "N HARVARD ST"
+    assert canonical_street("Eastern Avenue") == "EASTERN AVE"
+    assert canonical_street("Street. Road") == "STREET. RD"
+    assert canonical_street("Main Street", upper=False) == "Main Street"
+
+
+def test_canonicalize_streets_matches_word_loop():
+    """
+    Test case to verify that canonicalize_streets gives the same names as the
+    word-by-word abbreviation and keeps the index of its input.
+    """
+    names = pd.Series(NAMES, index=range(10, 16), name="street")
+
+    result = canonicalize_streets(names)
+
+    assert list(result) == [abbreviate_by_word(name.upper()) for name in NAMES]
+    assert list(result.index) == list(names.index)
+    assert result.name == "street"
+
+
+def test_canonicalize_streets_keeps_missing_values():
+    """
+    Test case to verify that missing values come back as None.
+    """
+    names = pd.Series(["WEST ROAD", None, float("nan"), "WEST ROAD"])
+
+    result = canonicalize_streets(names, upper=False)
+
+    assert list(result) == ["W RD", None, None, "W RD"]
@@ -0,0 +1,96 @@
+"""
+Test module for verifying the tiled heat map export.
+
+This module contains test cases for tile_bounds, render_heat_tiles and
+export_tiles.
+"""
+
+import os
+import matplotlib.image
+import numpy as np
+import tiles
+from tiles import WORLD_HALF, export_tiles, render_heat_tiles, tile_bounds
+
+
+def test_tile_bounds():
+    """
+    Test case to verify that tile 0/0/0 covers the world and that tiles are
+    counted from the north-west corner.
+    """
+    assert tile_bounds(0, 0, 0) == (
+        -WORLD_HALF,
+        -WORLD_HALF,
+        WORLD_HALF,
+        WORLD_HALF,
+    )
+    assert tile_bounds(1, 0, 1) == (0, 0, WORLD_HALF, WORLD_HALF)
+
+
+def test_render_heat_tiles(tmp_path):
+    """
+    Test case to verify that heat tiles are written in the XYZ layout, only
+    where there are points.
+    """
+    points = np.array([[42.3601, -71.0589]] * 3)
+
+    written = render_heat_tiles(points, str(tmp_path), zooms=[12])
+    tile = matplotlib.image.imread(tmp_path / "12" / "1239" / "1515.png")
+
+    assert 1 <= written <= 4
+    assert tile.shape == (256, 256, 4)
+    assert tile[..., 3].max() > 0
+
+
+def test_heat_grids_match_one_blur():
+    """
+    Test case to verify that the tiles around a tile corner, stitched
+    together, equal blurring all points on one grid, for sparse tiles and
+    for a tile with more points than pixels along a side.
+    """
+    rng = np.random.default_rng(0)
+    # points within 40 pixels of pixel (2816, 5120), the corner shared by
+    # tiles 10 and 11 across and 19 and 20 down, and a dense spot
+    x = np.concatenate([rng.uniform(2776, 2856, 50), np.full(400, 2810.5)])
+    y = np.concatenate([rng.uniform(5080, 5160, 50), np.full(400, 5110.5)])
+    # one grid over the four tiles with room for the blur around them
+    density = np.zeros((512 + 44, 512 + 44))
+    np.add.at(
+        density,
+        (
+            np.floor(y).astype(int) - 4864 + 22,
+            np.floor(x).astype(int) - 2560 + 22,
+        ),
+        1,
+    )
+    half = int(3 * 22 / 3) + 1
+    kernel = np.exp(-(np.arange(-half, half + 1) ** 2) / (2 * (22 / 3) ** 2))
+    kernel /= kernel.sum()
+    for axis in (0, 1):
+        density = np.apply_along_axis(
+            np.convolve, axis, density, kernel, mode="same"
+        )
+    expected = density[22:-22, 22:-22]
+
+    # pylint: disable=W0212
+    stitched = np.zeros((512, 512))
+    for tile_x, tile_y, grid in tiles._heat_grids(x, y, 15, 7):
+        row, column = (tile_y - 19) * 256, (tile_x - 10) * 256
+        stitched[row : row + 256, column : column + 256] = grid
+
+    assert np.allclose(stitched, expected)
+
+
+def test_export_tiles(bike_crashes, bike_network_path, tmp_path):
+    """
+    Test case to verify that the export writes a page referencing every
+    tile layer.
+    """
+    page = export_tiles(
+        bike_crashes, str(tmp_path), street_path=bike_network_path
+    )
+
+    with open(page, encoding="utf-8") as file:
+        html = file.read()
+    assert '"heat/{z}/{x}/{y}.png"' in html
+    assert '"streets/{z}/{x}/{y}.png"' in html
+    assert os.listdir(tmp_path / "streets" / "15")
@@ -0,0 +1,148 @@
+"""
+Test module for verifying the stage tracer.
+
+This module contains test cases for the stage context manager, the traced
+decorator on the pipeline functions and the JSON and Chrome trace exports.
+"""
+
+import json
+import os
+from types import SimpleNamespace
+import pytest
+import accidents_by_lane
+import helpers
+import tracing
+
+
+@pytest.fixture
+def tracer():
+    """
+    Turns tracing on for one test and forgets the recorded stages after.
+    """
+    tracing.clear()
+    tracing.enable()
+    yield tracing
+    tracing.disable()
+    tracing.clear()
+
+
+def test_disabled_records_nothing():
+    """
+    Test case to verify that nothing is recorded while tracing is off.
+    """
+    tracing.clear()
+    with tracing.stage("load") as record:
+        record.rows = 10
+
+    assert not tracing.events()
+
+
+# pylint: disable=W0621
+def test_stage(tracer):
+    """
+    Test case to verify that a stage records its times and rows.
+    """
+    with tracer.stage("load") as record:
+        sum(range(10000))
+        record.rows = 10
+
+    (event,) = tracer.events()
+    assert event["name"] == "load"
+    assert event["rows"] == 10
+    assert event["wall"] > 0 and event["cpu"] >= 0
+    assert event["peak_rss"] > 0
+
+
+def test_traced_pipeline(
+    tracer, bike_crashes, bike_lane_table, bike_network_path
+):
+    """
+    Test case to verify that the pipeline functions are recorded as nested
+    stages with their row counts.
+    """
+    accidents_by_lane.organize_by_lane(
+        bike_crashes, bike_lane_table, lane_path=bike_network_path
+    )
+
+    recorded = {event["name"]: event for event in tracer.events()}
+    assert list(recorded) == [
+        "accidents_by_lane.abbreviate_street_names",
+        "lane_index.match_crashes",
+        "accidents_by_lane.find_street_accidents",
+        "accidents_by_lane.organize_by_lane",
+    ]
+    assert recorded["accidents_by_lane.abbreviate_street_names"]["rows"] == 6
+    assert recorded["accidents_by_lane.find_street_accidents"]["rows"] == 2
+
+
+def test_export(tracer, tmp_path):
+    """
+    Test case to verify the JSON and Chrome trace exports.
+    """
+    with tracer.stage("render"):
+        pass
+    tracer.export_json(tmp_path / "stages.json")
+    tracer.export_chrome_trace(tmp_path / "trace.json")
+
+    with open(tmp_path / "stages.json", encoding="utf-8") as file:
+        stages = json.load(file)
+    with open(tmp_path / "trace.json", encoding="utf-8") as file:
+        trace = json.load(file)
+    assert stages[0]["name"] == "render"
+    assert trace["traceEvents"][0]["name"] == "render"
+    assert trace["traceEvents"][0]["ph"] == "X"
+
+
+def test_events_are_bounded(tracer):
+    """
+    Test case to verify that only the last MAX_EVENTS stages are kept.
+    """
+    for index in range(tracer.MAX_EVENTS + 5):
+        with tracer.stage("chunk", rows=index):
+            pass
+
+    recorded = tracer.events()
+    assert len(recorded) == tracer.MAX_EVENTS
+    assert recorded[0]["rows"] == 5
+
+
+@pytest.mark.parametrize(
+    "platform,peak", [("linux", 4096 * 1024), ("darwin", 4096)]
+)
+def test_peak_rss_units(monkeypatch, platform, peak):
+    """
+    Test case to verify that the peak memory is reported in bytes, whether
+    the platform gives kilobytes or bytes.
+
+    Parameters:
+        platform (str): The value of sys.platform.
+        peak (int): The expected peak memory in bytes.
+    """
+    monkeypatch.setattr(tracing.sys, "platform", platform)
+    monkeypatch.setattr(
+        tracing.resource,
+        "getrusage",
+        lambda who: SimpleNamespace(ru_maxrss=4096),
+    )
+
+    assert tracing._peak_rss() == peak  # pylint: disable=W0212
+
+
+def test_load_data_rows(tracer):
+    """
+    Test case to verify that load_data reports the number of records, not
+    the number of fields of the CKAN response.
+    """
+    path = "data/test_tracing_response.json"
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(
+            {"result": {"records": [{"_id": 1}, {"_id": 2}, {"_id": 3}]}},
+            file,
+        )
+    try:
+        helpers.load_data("test_tracing_response.json")
+    finally:
+        os.remove(path)
+
+    (event,) = tracer.events()
+    assert event["rows"] == 3
@@ -0,0 +1,452 @@
+"""
+Module for exporting the heat map as pre-rendered map tiles.
+
+Instead of one Folium page with every crash point and every boundary and
+street vertex inlined, the layers are rendered into 256 x 256 PNG tiles in
+the usual XYZ layout (`<layer>/<zoom>/<x>/<y>.png`) on local disk. A small
+Leaflet page then only fetches the tiles in view, so the size of the first
+page load does not grow with the data.
+
+Dependencies:
+    - functools: Module for keeping the blur matrix in memory.
+    - os: Module for file handling.
+    - NumPy: Library for array operations.
+    - Matplotlib: Library used to colorize and draw the tiles (Agg backend).
+    - Shapely: Library for geometric objects.
+    - artifacts: Module for loading GeoJSON layers simplified per zoom.
+    - heatmap: Module for extracting the heat map points.
+
+Functions:
+    - tile_bounds(x, y, zoom): Returns the Web Mercator bounds of a tile.
+    - render_heat_tiles(points, out_dir, zooms=HEAT_ZOOMS, radius=15,
+    blur=7): Renders crash points into heat map tiles.
+    - render_vector_tiles(layer, out_dir, zooms=VECTOR_ZOOMS,
+    style=None): Draws the features of a GeoDataFrame into tiles.
+    - write_tile_page(out_dir, layers, lat, lon, zoom): Writes a Leaflet page
+    which loads the tile layers lazily.
+    - export_tiles(data, out_dir, boundary_path=None, street_path=None,
+    view=MAP_VIEW): Renders every layer of the heat map and writes the page.
+"""
+
+import functools
+import os
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+import matplotlib.image
+from shapely.geometry import box
+import artifacts
+import heatmap
+
+TILE_SIZE = 256
+# half the width of the Web Mercator world in meters
+WORLD_HALF = 20037508.342789244
+HEAT_ZOOMS = range(11, 17)
+VECTOR_ZOOMS = range(11, 16)
+# the same colors as the Folium heat map in heatmap.get_heat_map
+HEAT_COLORMAP = LinearSegmentedColormap.from_list(
+    "heat", [(0, "blue"), (0.4, "blue"), (0.65, "lime"), (1, "red")]
+)
+HEAT_OPACITY = 0.6
+# the center and zoom of the page, as in the README
+MAP_VIEW = (42.3601, -71.0589, 12)
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<link rel="stylesheet"
+ href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css">
+<script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js">
+</script>
+<style>html, body, #map {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map("map").setView([{lat}, {lon}], {zoom});
+L.tileLayer(
+  "https://{{s}}.basemaps.cartocdn.com/light_all/{{z}}/{{x}}/{{y}}.png",
+  {{attribution: "&copy; OpenStreetMap contributors &copy; CARTO"}}
+).addTo(map);
+var overlays = {{}};
+{layers}
+L.control.layers(null, overlays).addTo(map);
+</script>
+</body>
+</html>
+"""
+LAYER_TEMPLATE = """overlays["{name}"] = L.tileLayer(
+  "{name}/{{z}}/{{x}}/{{y}}.png",
+  {{minZoom: {min_zoom}, maxNativeZoom: {max_zoom}}}).addTo(map);"""
+
+
+def _to_world_pixels(lat, lon, zoom):
+    """
+    Converts coordinates into pixel positions on the Web Mercator world map
+    at a zoom level.
+
+    Parameters:
+        lat (numpy.ndarray): Latitudes in degrees.
+        lon (numpy.ndarray): Longitudes in degrees.
+        zoom (int): The zoom level.
+
+    Returns:
+        Tuple (x, y): Pixel positions, y growing southwards.
+    """
+    scale = TILE_SIZE * 2**zoom
+    x = (lon + 180) / 360 * scale
+    lat_radians = np.radians(lat)
+    y = (1 - np.arcsinh(np.tan(lat_radians)) / np.pi) / 2 * scale
+    return x, y
+
+
+def tile_bounds(x, y, zoom):
+    """
+    Returns the Web Mercator (EPSG:3857) bounds of a tile.
+
+    Parameters:
+        x (int): The column of the tile.
+        y (int): The row of the tile, counted from the north.
+        zoom (int): The zoom level.
+
+    Returns:
+        Tuple (minx, miny, maxx, maxy): The bounds in meters.
+    """
+    size = 2 * WORLD_HALF / 2**zoom
+    return (
+        -WORLD_HALF + x * size,
+        WORLD_HALF - (y + 1) * size,
+        -WORLD_HALF + (x + 1) * size,
+        WORLD_HALF - y * size,
+    )
+
+
+def _tile_path(out_dir, zoom, x, y):
+    """
+    Returns the path of a tile, creating its directory.
+
+    Parameters:
+        out_dir (str): The directory of the tile layer.
+        zoom (int): The zoom level.
+        x (int): The column of the tile.
+        y (int): The row of the tile.
+
+    Returns:
+        str: The path of the PNG file.
+    """
+    tile_dir = os.path.join(out_dir, str(zoom), str(x))
+    os.makedirs(tile_dir, exist_ok=True)
+    return os.path.join(tile_dir, f"{y}.png")
+
+
+@functools.lru_cache(maxsize=8)
+def _blur_matrix(size, sigma):
+    """
+    Returns the matrix that blurs a column of a grid with a Gaussian kernel,
+    like np.convolve with mode="same" and a kernel cut off at 3 sigma.
+
+    Parameters:
+        size (int): The length of the column.
+        sigma (float): The standard deviation of the kernel in cells.
+
+    Returns:
+        numpy.ndarray: A (size, size) matrix, multiplied from the left.
+    """
+    half = int(3 * sigma) + 1
+    offsets = np.arange(size)[None, :] - np.arange(size)[:, None]
+    matrix = np.exp(-(offsets**2) / (2 * sigma**2))
+    matrix[np.abs(offsets) > half] = 0
+    kernel = np.exp(-(np.arange(-half, half + 1) ** 2) / (2 * sigma**2))
+    return matrix / kernel.sum()
+
+
+def _tile_points(x, y, margin):
+    """
+    Pairs every point with each tile it reaches, including the margin
+    around the tile, and groups the pairs by tile.
+
+    Parameters:
+        x (numpy.ndarray): World pixel columns of the points.
+        y (numpy.ndarray): World pixel rows of the points.
+        margin (int): How far a point reaches in pixels, less than TILE_SIZE.
+
+    Returns:
+    Tuple (tiles, local, starts):
+        tiles (numpy.ndarray): An (m, 2) array of the [x, y] tile of each
+        pair, sorted by tile.
+        local (numpy.ndarray): An (m, 2) array of the [x, y] pixel of the
+        point inside its tile padded by the margin.
+        starts (numpy.ndarray): The position of the first pair of each tile.
+    """
+    first_x, last_x = ((x + shift) // TILE_SIZE for shift in (-margin, margin))
+    first_y, last_y = ((y + shift) // TILE_SIZE for shift in (-margin, margin))
+    # a point reaches at most two tiles along each axis
+    new_x, new_y = last_x != first_x, last_y != first_y
+    pairs = np.concatenate(
+        [
+            np.column_stack([tile_x[keep], tile_y[keep], x[keep], y[keep]])
+            for tile_x, tile_y, keep in (
+                (first_x, first_y, np.ones(len(x), dtype=bool)),
+                (last_x, first_y, new_x),
+                (first_x, last_y, new_y),
+                (last_x, last_y, new_x & new_y),
+            )
+        ]
+    )
+    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+    tiles = pairs[:, :2].astype(np.int64)
+    local = np.floor(pairs[:, 2:] - tiles * TILE_SIZE + margin).astype(np.int64)
+    changes = (np.diff(tiles, axis=0) != 0).any(axis=1)
+    return tiles, local, np.flatnonzero(np.concatenate([[True], changes]))
+
+
+def _tile_density(local, rows):
+    """
+    Blurs the points of one tile.
+
+    Parameters:
+        local (numpy.ndarray): An (m, 2) array of the [x, y] pixels of the
+        points inside the tile padded by the margin.
+        rows (numpy.ndarray): The rows of the blur matrix inside the tile.
+
+    Returns:
+        numpy.ndarray: The TILE_SIZE x TILE_SIZE density grid.
+    """
+    size = rows.shape[1]
+    if len(local) < size:
+        # the blur of a few points is the sum of their kernels
+        return rows[:, local[:, 1]] @ rows[:, local[:, 0]].T
+    density = np.bincount(
+        local[:, 1] * size + local[:, 0], minlength=size * size
+    ).reshape(size, size)
+    return rows @ density @ rows.T
+
+
+def _heat_grids(x, y, radius, blur):
+    """
+    Yields the blurred point density of every tile near a point. The points
+    are grouped by tile once, so each tile only looks at its own points, and
+    the separable Gaussian blur is applied as one matrix product per axis.
+
+    Parameters:
+        x (numpy.ndarray): World pixel columns of the points.
+        y (numpy.ndarray): World pixel rows of the points.
+        radius (int): The radius of a point in pixels.
+        blur (int): Extra blur in pixels.
+
+    Yields:
+        Tuple (tile_x, tile_y, grid): A tile and its TILE_SIZE x TILE_SIZE
+        density grid.
+    """
+    if x.size == 0:
+        return
+    sigma = (radius + blur) / 3
+    # as far as the blur reaches, so neighboring tiles match at their edges
+    margin = int(3 * sigma) + 1
+    size = TILE_SIZE + 2 * margin
+    # the rows of the separable blur that land inside the tile
+    rows = _blur_matrix(size, sigma)[margin:-margin]
+    tiles, local, starts = _tile_points(x, y, margin)
+    for start, end in zip(starts, np.append(starts[1:], len(tiles))):
+        yield (*tiles[start], _tile_density(local[start:end], rows))
+
+
+def _zoom_grids(points, zoom, radius, blur):
+    """
+    Computes the heat map grid of every tile of a zoom level once, keeping
+    each as float32 relative to its own maximum until the densest spot of
+    the zoom level is known.
+
+    Parameters:
+        points (numpy.ndarray): An (n, 2) array of [lat, long] rows.
+        zoom (int): The zoom level.
+        radius (int): The radius of a point in pixels.
+        blur (int): Extra blur in pixels.
+
+    Returns:
+        list: (tile_x, tile_y, tile_peak, grid) tuples of the tiles with any
+        density.
+    """
+    x, y = _to_world_pixels(points[:, 0], points[:, 1], zoom)
+    grids = []
+    for tile_x, tile_y, grid in _heat_grids(x, y, radius, blur):
+        tile_peak = grid.max()
+        if tile_peak > 0:
+            grids.append(
+                (
+                    tile_x,
+                    tile_y,
+                    tile_peak,
+                    (grid / tile_peak).astype(np.float32),
+                )
+            )
+    return grids
+
+
+def render_heat_tiles(points, out_dir, zooms=HEAT_ZOOMS, radius=15, blur=7):
+    """
+    Renders crash points into heat map tiles. Colors are scaled per zoom
+    level, so the densest spot of the map is red at every zoom.
+
+    Parameters:
+        points (numpy.ndarray): An (n, 2) array of [lat, long] rows, see
+        heatmap.heat_points.
+        out_dir (str): The directory of the tile layer.
+        zooms (iterable): The zoom levels to render.
+        radius (int): The radius of a point in pixels.
+        blur (int): Extra blur in pixels.
+
+    Returns:
+        int: The number of tiles written.
+    """
+    written = 0
+    for zoom in zooms:
+        grids = _zoom_grids(points, zoom, radius, blur)
+        peak = max((tile_peak for _, _, tile_peak, _ in grids), default=0)
+        for tile_x, tile_y, tile_peak, grid in grids:
+            if tile_peak / peak < 0.01:
+                continue
+            intensity = np.clip(grid.astype(float) * (tile_peak / peak), 0, 1)
+            rgba = HEAT_COLORMAP(intensity)
+            rgba[..., 3] = np.clip(intensity * 4, 0, 1) * HEAT_OPACITY
+            matplotlib.image.imsave(
+                _tile_path(out_dir, zoom, tile_x, tile_y), rgba
+            )
+            written += 1
+    return written
+
+
+def _covering_tiles(bounds, zoom):
+    """
+    Yields the tiles covering an area.
+
+    Parameters:
+        bounds (tuple): (minx, miny, maxx, maxy) in Web Mercator meters.
+        zoom (int): The zoom level.
+
+    Yields:
+        Tuple (x, y): The column and row of each tile.
+    """
+    minx, miny, maxx, maxy = bounds
+    size = 2 * WORLD_HALF / 2**zoom
+    for tile_x in range(
+        int((minx + WORLD_HALF) // size), int((maxx + WORLD_HALF) // size) + 1
+    ):
+        for tile_y in range(
+            int((WORLD_HALF - maxy) // size),
+            int((WORLD_HALF - miny) // size) + 1,
+        ):
+            yield tile_x, tile_y
+
+
+def render_vector_tiles(layer, out_dir, zooms=VECTOR_ZOOMS, style=None):
+    """
+    Draws the features of a GeoDataFrame into tiles, skipping tiles without
+    features. Polygons are drawn as outlines. One figure is reused for every
+    tile.
+
+    Parameters:
+        layer (geopandas.GeoDataFrame): The features to draw.
+        out_dir (str): The directory of the tile layer.
+        zooms (iterable): The zoom levels to render.
+        style (dict): Keyword arguments for GeoDataFrame.plot, defaults to
+        thin blue lines.
+
+    Returns:
+        int: The number of tiles written.
+    """
+    style = style or {"color": "blue", "linewidth": 1, "alpha": 0.6}
+    layer = layer.to_crs("EPSG:3857")
+    layer = layer.set_geometry(
+        layer.geometry.where(
+            ~layer.geom_type.str.endswith("Polygon"), layer.boundary
+        )
+    )
+    figure = Figure(figsize=(1, 1), dpi=TILE_SIZE)
+    FigureCanvasAgg(figure)
+    axes = figure.add_axes([0, 0, 1, 1])
+    written = 0
+    for zoom in zooms:
+        for tile_x, tile_y in _covering_tiles(layer.total_bounds, zoom):
+            bounds = tile_bounds(tile_x, tile_y, zoom)
+            features = layer.iloc[
+                layer.sindex.query(box(*bounds), predicate="intersects")
+            ]
+            if features.empty:
+                continue
+            axes.clear()
+            axes.set_axis_off()
+            features.plot(ax=axes, **style)
+            axes.set_xlim(bounds[0], bounds[2])
+            axes.set_ylim(bounds[1], bounds[3])
+            figure.savefig(
+                _tile_path(out_dir, zoom, tile_x, tile_y),
+                dpi=TILE_SIZE,
+                transparent=True,
+            )
+            written += 1
+    return written
+
+
+def write_tile_page(out_dir, layers, lat, lon, zoom):
+    """
+    Writes a Leaflet page which loads the tile layers lazily.
+
+    Parameters:
+        out_dir (str): The directory holding the tile layers.
+        layers (dict): The zoom levels of each tile layer by its directory
+        name, e.g. {"heat": range(11, 17)}.
+        lat (float): Latitude coordinate for the center of the map.
+        lon (float): Longitude coordinate for the center of the map.
+        zoom (int): The initial zoom level.
+
+    Returns:
+        str: The path of the page.
+    """
+    layer_lines = "\n".join(
+        LAYER_TEMPLATE.format(
+            name=name, min_zoom=min(zooms), max_zoom=max(zooms)
+        )
+        for name, zooms in layers.items()
+    )
+    path = os.path.join(out_dir, "index.html")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(
+            PAGE_TEMPLATE.format(
+                lat=lat, lon=lon, zoom=zoom, layers=layer_lines
+            )
+        )
+    return path
+
+
+def export_tiles(
+    data, out_dir, boundary_path=None, street_path=None, view=MAP_VIEW
+):
+    """
+    Renders the heat map and its optional boundary and street layers into
+    tiles and writes a page showing them.
+
+    Parameters:
+        data (pd.DataFrame): A pandas DataFrame containing latitude and
+        longitude coordinates.
+        out_dir (str): The directory to write the tiles and page to.
+        boundary_path (str): The GeoJSON file of the city boundary.
+        street_path (str): The GeoJSON file of the street segments.
+        view (tuple): The (lat, lon, zoom) the page opens at.
+
+    Returns:
+        str: The path of the page.
+    """
+    layers = {"heat": HEAT_ZOOMS}
+    render_heat_tiles(heatmap.heat_points(data), os.path.join(out_dir, "heat"))
+    for name, path in (("boston", boundary_path), ("streets", street_path)):
+        if path is not None:
+            for zoom in VECTOR_ZOOMS:
+                render_vector_tiles(
+                    artifacts.prepare_layer(path, zoom),
+                    os.path.join(out_dir, name),
+                    zooms=[zoom],
+                )
+            layers[name] = VECTOR_ZOOMS
+    return write_tile_page(out_dir, layers, *view)
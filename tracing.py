@@ -0,0 +1,251 @@
+"""
+Module for timing the stages of the pipeline.
+
+A stage is any block of code wrapped in the stage context manager or any
+function wrapped in the traced decorator. For each stage run the tracer
+records its wall time, CPU time, the peak resident memory of the process
+when it finished and, if known, the number of rows it handled. Tracing is
+off unless BOSTON_BIKE_TRACE=1 is set or enable() is called; while it is
+off a stage costs one flag check. Only the last MAX_EVENTS stages are kept,
+so a long-running process does not grow without bound. The recorded stages
+can be written as a JSON list or in the Chrome trace format, which
+chrome://tracing and Perfetto open as a timeline.
+
+Dependencies:
+    - collections.deque: Bounded queue holding the recorded stages.
+    - functools: Module for wrapping traced functions.
+    - json: Module for writing the recorded stages.
+    - os: Module for the process id and the environment.
+    - resource: Module for the peak resident memory, on Unix only.
+    - sys: Module for the platform, which sets the unit of the peak memory.
+    - threading: Module for the thread id of each stage.
+    - time: Module for wall and CPU clocks.
+
+Functions:
+    - enable(): Turns tracing on.
+    - disable(): Turns tracing off.
+    - clear(): Forgets the recorded stages.
+    - events(): Returns the recorded stages.
+    - stage(name, rows=None): Returns a context manager which records a
+    stage.
+    - traced(func=None, name=None, rows=None): Decorates a function so each
+    call is recorded as a stage.
+    - export_json(path): Writes the recorded stages as a JSON list.
+    - export_chrome_trace(path): Writes the recorded stages in the Chrome
+    trace format.
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENABLED = os.environ.get("BOSTON_BIKE_TRACE", "") == "1"
+# the oldest stages are dropped once this many are recorded
+MAX_EVENTS = 10000
+_events = deque(maxlen=MAX_EVENTS)
+
+
+def enable():
+    """
+    Turns tracing on.
+    """
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = True
+
+
+def disable():
+    """
+    Turns tracing off. Stages already recorded are kept.
+    """
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = False
+
+
+def clear():
+    """
+    Forgets the recorded stages.
+    """
+    _events.clear()
+
+
+def events():
+    """
+    Returns the recorded stages.
+
+    Returns:
+        list: One dict per finished stage, in the order they finished and
+        at most MAX_EVENTS, with the name, start (seconds since the epoch),
+        wall and cpu (seconds), peak_rss (bytes, None where unknown), rows
+        (None where unknown) and the pid and tid it ran on.
+    """
+    return list(_events)
+
+
+def _peak_rss():
+    """
+    Returns the peak resident memory of the process so far.
+
+    Returns:
+        int: The peak resident memory in bytes, or None where unknown.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+class Stage:
+    """
+    Context manager which records one run of a stage. Set rows inside the
+    block when the row count is only known once the stage ran.
+    """
+
+    __slots__ = ("name", "rows", "_start", "_wall", "_cpu")
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self._start = self._wall = self._cpu = None
+
+    def __enter__(self):
+        self._start = time.time()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        _events.append(
+            {
+                "name": self.name,
+                "start": self._start,
+                "wall": wall,
+                "cpu": cpu,
+                "peak_rss": _peak_rss(),
+                "rows": self.rows,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+        )
+
+
+class _NoStage:
+    """
+    Context manager which records nothing, used while tracing is off.
+    """
+
+    __slots__ = ()
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name, rows=None):
+    """
+    Returns a context manager which records a stage.
+
+    Parameters:
+        name (str): The name of the stage.
+        rows (int): The number of rows the stage handles, if known.
+
+    Returns:
+        Stage: The stage, or a context manager doing nothing while tracing
+        is off.
+    """
+    if not ENABLED:
+        return _NO_STAGE
+    return Stage(name, rows)
+
+
+def traced(func=None, name=None, rows=None):
+    """
+    Decorates a function so each call is recorded as a stage. Use it as
+    @traced or @traced(name=..., rows=...).
+
+    Parameters:
+        func (function): The function to trace.
+        name (str): The name of the stage, the module and function name if
+        not given.
+        rows (function): Returns the number of rows handled from the
+        function's result, e.g. len.
+
+    Returns:
+        function: The traced function, or a decorator if func is not given.
+    """
+    if func is None:
+        return functools.partial(traced, name=name, rows=rows)
+    stage_name = name or f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        with Stage(stage_name) as record:
+            result = func(*args, **kwargs)
+            if rows is not None:
+                record.rows = rows(result)
+        return result
+
+    return wrapper
+
+
+def export_json(path):
+    """
+    Writes the recorded stages as a JSON list.
+
+    Parameters:
+        path (str): The path of the JSON file.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(events(), file, indent=2)
+
+
+def export_chrome_trace(path):
+    """
+    Writes the recorded stages in the Chrome trace format, as complete
+    events with times in microseconds.
+
+    Parameters:
+        path (str): The path of the trace file.
+    """
+    trace_events = [
+        {
+            "name": event["name"],
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["wall"] * 1e6,
+            "pid": event["pid"],
+            "tid": event["tid"],
+            "args": {
+                "cpu_ms": event["cpu"] * 1e3,
+                "peak_rss": event["peak_rss"],
+                "rows": event["rows"],
+            },
+        }
+        for event in _events
+    ]
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": trace_events}, file)